@@ -1,31 +1,64 @@
 #!/usr/bin/python3
 
 from .schema import Database
-from .inspectors import (PostgresInspector, SqliteInspector, MySqlInspector,
-                         OracleInspector)
-from .errors import FathomError
+from .inspectors import (PostgresInspector, PostgresCatalogInspector,
+                         SqliteInspector, MySqlInspector, OracleInspector)
+from .sqlitefile import SqliteFileInspector
+from .shards import SqliteShardsInspector
+from .errors import FathomError, FathomTimeoutError
 
-def get_sqlite3_database(path):
-    return Database(name=path, inspector=SqliteInspector(path))
+def get_sqlite3_database(path, include=None, exclude=None, timeout=None,
+                         governor=None):
+    return Database(name=path, inspector=SqliteInspector(path),
+                    include=include, exclude=exclude, timeout=timeout,
+                    governor=governor)
+
+def get_sqlite3_file_database(path, include=None, exclude=None):
+    # reads the schema from the file itself, without a connection
+    return Database(name=path, inspector=SqliteFileInspector(path),
+                    include=include, exclude=exclude)
+
+def get_sqlite3_shard_databases(paths, include=None, exclude=None,
+                                timeout=None, governor=None):
+    # returns dictionary mapping paths to databases, all shards are read
+    # through one connection
+    inspector = SqliteShardsInspector(*paths)
+    if include or exclude:
+        inspector = inspector.filtered(include, exclude)
+    if timeout is not None:
+        inspector = inspector.with_timeout(timeout)
+    if governor is not None:
+        inspector = inspector.with_governor(governor)
+    return inspector.get_databases()
     
-def get_postgresql_database(args):
-    return Database(name=args, inspector=PostgresInspector(args))
+def get_postgresql_database(args, catalog=False, include=None, exclude=None,
+                            timeout=None, governor=None):
+    # catalog mode reads pg_catalog directly instead of information_schema
+    Inspector = PostgresCatalogInspector if catalog else PostgresInspector
+    return Database(name=args, inspector=Inspector(args), include=include,
+                    exclude=exclude, timeout=timeout, governor=governor)
 
-def get_mysql_database(**kwargs):
+def get_mysql_database(include=None, exclude=None, timeout=None, 
+                       governor=None, **kwargs):
     try:
         kwargs['port'] = int(kwargs['port'])
     except KeyError:
         pass
     except ValueError:
         raise FathomError('Port argument must be a number!')
-    return Database(name=kwargs['db'], inspector=MySqlInspector(**kwargs))
+    return Database(name=kwargs['db'], inspector=MySqlInspector(**kwargs),
+                    include=include, exclude=exclude, timeout=timeout,
+                    governor=governor)
     
-def get_oracle_database(*args, **kwargs):
+def get_oracle_database(*args, include=None, exclude=None, timeout=None,
+                        governor=None, **kwargs):
     user = kwargs.get('user', None) or args[0]
     dsn = kwargs.get('dsn', None)
     dsn = args[2] if (dsn is None and len(args) > 2) else None
     name = (user + '/' + dsn) if dsn is not None else user
-    return Database(name=name, inspector=OracleInspector(*args, **kwargs))
+    return Database(name=name, inspector=OracleInspector(*args, **kwargs),
+                    include=include, exclude=exclude, timeout=timeout,
+                    governor=governor)
 
 TYPE_TO_FUNCTION = {
     'Sqlite3': get_sqlite3_database,
@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+
+'''Finds redundant indices, that slow down writes without helping reads, and
+foreign keys without supporting index, that slow down reads and deletes.
+Only indices with the same access method and predicate are compared.'''
+
+
+class Advice(object):
+
+    '''Single problem found by the advisor. Advices of kinds that cost more
+    have higher weight and are reported first.'''
+
+    DUPLICATE, SHADOWED, LEFT_PREFIX, MISSING_FOREIGN_KEY_INDEX = range(4)
+
+    WEIGHTS = {DUPLICATE: 4, SHADOWED: 3, LEFT_PREFIX: 2,
+               MISSING_FOREIGN_KEY_INDEX: 1}
+
+    DESCRIPTIONS = {
+        DUPLICATE: 'index %(index)s on %(table)s (%(columns)s) duplicates '
+                   '%(covered_by)s',
+        SHADOWED: 'unique index %(index)s on %(table)s (%(columns)s) is '
+                  'shadowed by primary key %(covered_by)s',
+        LEFT_PREFIX: 'index %(index)s on %(table)s (%(columns)s) is a left '
+                     'prefix of %(covered_by)s',
+        MISSING_FOREIGN_KEY_INDEX: 'foreign key on %(table)s (%(columns)s) '
+                                   'referencing %(referenced_table)s has no '
+                                   'leading index'
+    }
+
+    def __init__(self, kind, table, columns, index=None, covered_by=None,
+                 foreign_key=None):
+        self.kind = kind
+        self.table = table
+        self.columns = tuple(columns)
+        self.index = index
+        self.covered_by = covered_by
+        self.foreign_key = foreign_key
+
+    def _get_weight(self):
+        return self.WEIGHTS[self.kind]
+    weight = property(_get_weight)
+
+    def __str__(self):
+        referenced_table = (self.foreign_key.referenced_table
+                            if self.foreign_key is not None else None)
+        return self.DESCRIPTIONS[self.kind] % {
+            'index': self.index.name if self.index is not None else None,
+            'table': self.table, 'columns': ', '.join(self.columns),
+            'covered_by': (self.covered_by.name
+                           if self.covered_by is not None else None),
+            'referenced_table': referenced_table}
+
+
+def advise(database):
+    '''Return advices for given database, most important first. Index columns
+    and foreign keys are loaded in bulk, so the whole analysis needs a constant
+    number of queries.'''
+    database.load_index_columns()
+    database.load_foreign_keys()
+    indices = {}
+    for index in database.indices.values():
+        indices.setdefault(database.case(index.table), []).append(index)
+    advices = []
+    for table in database.tables.values():
+        table_indices = indices.get(database.case(table.name), [])
+        advices.extend(_advise_indices(table.name, table_indices))
+        advices.extend(_advise_foreign_keys(table, table_indices))
+    advices.sort(key=lambda advice: (-advice.weight, -len(advice.columns),
+                                     advice.table, str(advice)))
+    return advices
+
+
+def report(database):
+    '''Return text report with ranked advices for given database.'''
+    return '\n'.join('%d. %s' % (position, advice) for position, advice
+                     in enumerate(advise(database), 1))
+
+# protected:
+
+def _rank(index):
+    # index that should be kept when several of them cover the same columns
+    return (not index.is_primary, not index.is_unique, index.name)
+
+def _variant(index):
+    return (index.method, index.predicate)
+
+def _advise_indices(table, indices):
+    advices = []
+    for variant in sorted(set(map(_variant, indices)), key=repr):
+        advices.extend(_advise_variant(table, [
+            index for index in indices if _variant(index) == variant]))
+    return advices
+
+def _advise_variant(table, indices):
+    # indices of the same access method and predicate
+    advices = []
+    remaining = sorted(indices, key=_rank)
+    primary = [index for index in remaining if index.is_primary]
+    if primary:
+        primary = primary[0]
+        for index in list(remaining):
+            if (index.is_unique and not index.is_primary and
+                set(primary.columns) <= set(index.columns)):
+                advices.append(Advice(Advice.SHADOWED, table, index.columns,
+                                      index=index, covered_by=primary))
+                remaining.remove(index)
+    kept = {}
+    for index in list(remaining):
+        if index.columns in kept:
+            advices.append(Advice(Advice.DUPLICATE, table, index.columns,
+                                  index=index, covered_by=kept[index.columns]))
+            remaining.remove(index)
+        else:
+            kept[index.columns] = index
+    for index in remaining:
+        if index.is_unique or index.is_primary:
+            continue
+        length = len(index.columns)
+        for other in remaining:
+            if (len(other.columns) > length and
+                other.columns[:length] == index.columns):
+                advices.append(Advice(Advice.LEFT_PREFIX, table, index.columns,
+                                      index=index, covered_by=other))
+                break
+    return advices
+
+def _advise_foreign_keys(table, indices):
+    advices = []
+    for fk in table.foreign_keys:
+        columns = set(fk.columns)
+        # partial indices do not cover all rows
+        if not any(set(index.columns[:len(columns)]) == columns
+                   for index in indices if index.predicate is None):
+            advices.append(Advice(Advice.MISSING_FOREIGN_KEY_INDEX, 
+                                  table.name, fk.columns, foreign_key=fk))
+    return advices
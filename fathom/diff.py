@@ -0,0 +1,194 @@
+#!/usr/bin/python3
+
+'''Compares two databases, either inspected live or built by hand, and reports
+objects that were added, removed or changed between them.
+
+Every object is first reduced to a hashed signature, so comparing two schemas
+is linear in their size; details are compared only for objects whose
+signatures differ.'''
+
+from .fingerprints import (signature, column_data, foreign_key_data, 
+                           table_data, view_data, index_data, trigger_data,
+                           procedure_data)
+
+KINDS = ('tables', 'views', 'indices', 'triggers', 'procedures')
+
+
+class Changes(object):
+
+    '''Objects added, removed and changed between two collections; added and
+    removed map names to objects, changed maps names to ObjectChange.'''
+
+    def __init__(self):
+        self.added = {}
+        self.removed = {}
+        self.changed = {}
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+
+class ObjectChange(object):
+
+    '''Object present in both databases with different definition. Changed
+    scalar attributes are kept in attributes as pairs of old and new value;
+    tables and views also describe changes of their columns and foreign
+    keys.'''
+
+    def __init__(self, name, old, new):
+        self.name = name
+        self.old = old
+        self.new = new
+        self.attributes = {}
+        self.columns = Changes()
+        self.foreign_keys = Changes()
+
+
+class SchemaDiff(object):
+
+    def __init__(self):
+        for kind in KINDS:
+            setattr(self, kind, Changes())
+
+    def __bool__(self):
+        return any(getattr(self, kind) for kind in KINDS)
+
+    def __str__(self):
+        lines = []
+        for kind in KINDS:
+            changes = getattr(self, kind)
+            for name in sorted(changes.added):
+                lines.append('+ %s %s' % (kind, name))
+            for name in sorted(changes.removed):
+                lines.append('- %s %s' % (kind, name))
+            for name in sorted(changes.changed):
+                lines.append('~ %s %s' % (kind, name))
+                lines.extend('    %s' % line for line
+                             in _describe(changes.changed[name]))
+        return '\n'.join(lines)
+
+
+def diff(old, new):
+    '''Return SchemaDiff describing how new database differs from old one.'''
+    for database in (old, new):
+        database.load_columns()
+        database.load_foreign_keys()
+        database.load_index_columns()
+        database.load_triggers()
+    # arguments are compared only for procedures present in both databases,
+    # they are loaded for all of them at once instead of one by one
+    common = set(old.procedures or ()) & set(new.procedures or ())
+    for database in (old, new):
+        database.load_arguments(common)
+    result = SchemaDiff()
+    for kind in KINDS:
+        setattr(result, kind, _diff_objects(getattr(old, kind),
+                                            getattr(new, kind),
+                                            SIGNATURE_DATA[kind], DIFFS[kind],
+                                            UNSIGNED.get(kind)))
+    return result
+
+
+SIGNATURE_DATA = {'tables': table_data, 'views': view_data,
+                  'indices': index_data, 'triggers': trigger_data,
+                  'procedures': procedure_data}
+
+# protected:
+
+def _diff_objects(old, new, data, diff_object, unsigned=None):
+    # unsigned compares parts of objects left out of their signatures, for
+    # objects with equal signatures
+    changes = Changes()
+    for name, obj in new.items():
+        if name not in old:
+            changes.added[name] = obj
+    for name, obj in old.items():
+        if name not in new:
+            changes.removed[name] = obj
+        elif signature(data(obj)) != signature(data(new[name])):
+            change = ObjectChange(name, obj, new[name])
+            diff_object(change)
+            changes.changed[name] = change
+        elif unsigned is not None:
+            change = ObjectChange(name, obj, new[name])
+            unsigned(change)
+            if change.attributes:
+                changes.changed[name] = change
+    return changes
+
+def _diff_attributes(change, *names):
+    for name in names:
+        old, new = getattr(change.old, name), getattr(change.new, name)
+        if old != new:
+            change.attributes[name] = (old, new)
+
+def _diff_columns(change):
+    old, new = change.old.columns, change.new.columns
+    changes = change.columns
+    for name, column in new.items():
+        if name not in old:
+            changes.added[name] = column
+    for name, column in old.items():
+        if name not in new:
+            changes.removed[name] = column
+        elif column_data(column) != column_data(new[name]):
+            column_change = ObjectChange(name, column, new[name])
+            _diff_attributes(column_change, 'type', 'not_null', 'default')
+            changes.changed[name] = column_change
+
+def _diff_table(change):
+    _diff_columns(change)
+    old = dict((foreign_key_data(fk), fk) for fk in change.old.foreign_keys)
+    new = dict((foreign_key_data(fk), fk) for fk in change.new.foreign_keys)
+    change.foreign_keys.added = dict((key, fk) for key, fk in new.items()
+                                     if key not in old)
+    change.foreign_keys.removed = dict((key, fk) for key, fk in old.items()
+                                       if key not in new)
+
+def _diff_index(change):
+    _diff_attributes(change, 'table', 'columns', 'is_unique')
+
+def _diff_trigger(change):
+    _diff_attributes(change, 'table', 'when', 'event')
+
+def _diff_procedure(change):
+    _diff_attributes(change, 'returns')
+    old_sql = getattr(change.old, 'sql', None)
+    new_sql = getattr(change.new, 'sql', None)
+    if old_sql != new_sql:
+        change.attributes['sql'] = (old_sql, new_sql)
+    _diff_arguments(change)
+
+def _diff_arguments(change):
+    old = [(argument.name, argument.type)
+           for argument in change.old.arguments.values()]
+    new = [(argument.name, argument.type)
+           for argument in change.new.arguments.values()]
+    if old != new:
+        change.attributes['arguments'] = (old, new)
+
+DIFFS = {'tables': _diff_table, 'views': _diff_columns,
+         'indices': _diff_index, 'triggers': _diff_trigger,
+         'procedures': _diff_procedure}
+
+# arguments are not in signatures of procedures, procedures with the same
+# name may still differ by them
+UNSIGNED = {'procedures': _diff_arguments}
+
+def _describe(change):
+    lines = ['%s: %r -> %r' % (name, old, new)
+             for name, (old, new) in sorted(change.attributes.items())]
+    for name in sorted(change.columns.added):
+        lines.append('+ column %s' % name)
+    for name in sorted(change.columns.removed):
+        lines.append('- column %s' % name)
+    for name in sorted(change.columns.changed):
+        for attribute, (old, new) in sorted(
+                change.columns.changed[name].attributes.items()):
+            lines.append('~ column %s %s: %r -> %r' % (name, attribute,
+                                                       old, new))
+    for key in sorted(change.foreign_keys.added):
+        lines.append('+ foreign key %s -> %s%s' % (key[0], key[1], key[2]))
+    for key in sorted(change.foreign_keys.removed):
+        lines.append('- foreign key %s -> %s%s' % (key[0], key[1], key[2]))
+    return lines
@@ -3,6 +3,9 @@
 class FathomError(Exception):
     pass
 
+class FathomTimeoutError(FathomError):
+    '''Raised when inspection does not finish within its time budget.'''
+
 class FathomParsingError(FathomError):
     
     def __init__(self, msg, sql=None):
@@ -0,0 +1,191 @@
+#!/usr/bin/python3
+
+'''Stable content hashes of schema objects, rolled up Merkle-style into one
+hash per database.
+
+Every table gets a hash of its columns, foreign keys, indices and triggers;
+views and procedures get hashes of their own definitions. Hashes of objects
+are grouped into buckets by name and the root hash is computed from bucket
+hashes, so two databases are compared by their roots first and only
+mismatching buckets have to be walked.'''
+
+from hashlib import sha1
+
+KINDS = ('tables', 'views', 'procedures')
+
+
+def signature(data):
+    '''Return stable hash of given signature data.'''
+    return sha1(repr(data).encode('utf-8')).hexdigest()
+
+# signature data of schema objects; they use only information, that is
+# available after bulk loading
+
+def column_data(column):
+    return (column.name, column.type, column.not_null, repr(column.default))
+
+def foreign_key_data(fk):
+    return (tuple(fk.columns), fk.referenced_table,
+            tuple(fk.referenced_columns))
+
+def table_data(table):
+    columns = sorted(column_data(column) for column in table.columns.values())
+    foreign_keys = sorted(foreign_key_data(fk) for fk in table.foreign_keys)
+    return (tuple(columns), tuple(foreign_keys))
+
+def view_data(view):
+    return tuple(sorted(column_data(column)
+                        for column in view.columns.values()))
+
+def index_data(index):
+    return (index.table, tuple(index.columns), bool(index.is_unique))
+
+def trigger_data(trigger):
+    return (trigger.table, trigger.when, trigger.event)
+
+def procedure_data(procedure):
+    # arguments are not part of the signature, because they must be loaded
+    # separately for every procedure; diff compares them on its own
+    return (procedure.returns, getattr(procedure, 'sql', None))
+
+
+class Fingerprints(object):
+
+    '''Hash tree of a database: object hashes per kind, bucket hashes per kind
+    and a root hash.'''
+
+    BUCKETS = 256
+
+    def __init__(self):
+        self.objects = dict((kind, {}) for kind in KINDS)
+        self.buckets = dict((kind, {}) for kind in KINDS)
+        # names of objects in every bucket
+        self._members = dict((kind, {}) for kind in KINDS)
+        # indices and triggers grouped by name of their table
+        self._context = None
+        self.root = None
+
+    @classmethod
+    def compute(Class, database):
+        '''Compute fingerprints of the whole database using bulk loaders.'''
+        fingerprints = Class()
+        for kind in KINDS:
+            fingerprints.update(database, kind)
+        return fingerprints
+
+    def update(self, database, kind='tables', names=None):
+        '''Recompute hashes of given objects (all objects of given kind by
+        default) and hashes of buckets above them. Objects, that are no
+        longer in the database, are removed.'''
+        _load(database)
+        objects = getattr(database, kind)
+        hashes, members = self.objects[kind], self._members[kind]
+        context = None
+        if kind == 'tables':
+            # indices and triggers of other tables are kept from last update
+            if names is None or self._context is None:
+                self._context = _table_context(database)
+            else:
+                _update_table_context(self._context, database, names)
+            context = self._context
+        if names is None:
+            names = set(hashes) | set(objects)
+        compute = getattr(self, '_%s_hash' % kind)
+        buckets = set()
+        for name in names:
+            bucket = self.bucket(name)
+            if name in objects:
+                hashes[name] = compute(objects[name], database, context)
+                members.setdefault(bucket, set()).add(name)
+            else:
+                hashes.pop(name, None)
+                members.get(bucket, set()).discard(name)
+            buckets.add(bucket)
+        for bucket in buckets:
+            if members.get(bucket):
+                self.buckets[kind][bucket] = signature(sorted(
+                    (name, hashes[name]) for name in members[bucket]))
+            else:
+                members.pop(bucket, None)
+                self.buckets[kind].pop(bucket, None)
+        self.root = signature(tuple(tuple(sorted(self.buckets[kind].items()))
+                                    for kind in KINDS))
+
+    def bucket(self, name):
+        return int(sha1(name.encode('utf-8')).hexdigest()[:8], 16) % \
+               self.BUCKETS
+
+    def differences(self, other):
+        '''Return names of objects, that differ between two fingerprints,
+        as a dictionary keyed by kind; only mismatching buckets are
+        compared.'''
+        result = dict((kind, set()) for kind in KINDS)
+        if self.root == other.root:
+            return result
+        for kind in KINDS:
+            mine, theirs = self.buckets[kind], other.buckets[kind]
+            for bucket in set(mine) | set(theirs):
+                if mine.get(bucket) == theirs.get(bucket):
+                    continue
+                names = (self._members[kind].get(bucket, set()) | 
+                         other._members[kind].get(bucket, set()))
+                for name in names:
+                    if (self.objects[kind].get(name) !=
+                        other.objects[kind].get(name)):
+                        result[kind].add(name)
+        return result
+
+    # protected:
+
+    def _tables_hash(self, table, database, context):
+        indices, triggers = context
+        name = database.case(table.name)
+        return signature((table_data(table),
+                          sorted(index_data(index)
+                                 for index in indices.get(name, ())),
+                          sorted(trigger_data(trigger)
+                                 for trigger in triggers.get(name, ()))))
+
+    def _views_hash(self, view, database, context):
+        return signature(view_data(view))
+
+    def _procedures_hash(self, procedure, database, context):
+        return signature(procedure_data(procedure))
+
+
+def fingerprint(database):
+    '''Return root hash of the database.'''
+    return Fingerprints.compute(database).root
+
+# protected:
+
+def _load(database):
+    database.load_columns()
+    database.load_foreign_keys()
+    database.load_index_columns()
+    database.load_triggers()
+
+def _table_context(database):
+    # indices and triggers grouped by name of their table
+    indices, triggers = {}, {}
+    for index in database.indices.values():
+        indices.setdefault(database.case(index.table), []).append(index)
+    for trigger in database.triggers.values():
+        triggers.setdefault(database.case(trigger.table), []).append(trigger)
+    return indices, triggers
+
+def _update_table_context(context, database, names):
+    # only indices and triggers of given tables are grouped again
+    names = set(database.case(name) for name in names)
+    indices, triggers = context
+    for name in names:
+        indices.pop(name, None)
+        triggers.pop(name, None)
+    for index in database.indices.values():
+        table = database.case(index.table)
+        if table in names:
+            indices.setdefault(table, []).append(index)
+    for trigger in database.triggers.values():
+        table = database.case(trigger.table)
+        if table in names:
+            triggers.setdefault(table, []).append(trigger)
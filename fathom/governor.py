@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+
+'''Limits of load, that inspection puts on a database.
+
+Governor bounds number of concurrently running catalog queries and rate of
+queries per second with a token bucket. It is shared by all threads using
+it and, with a path, by all processes on the machine using the same path,
+which coordinate through lock files:
+
+    governor = Governor(concurrency=2, rate=10, path='/tmp/fathom-primary')
+    db = Database('primary', inspector=PostgresInspector(dsn),
+                  governor=governor)
+
+Inspectors acquire the governor for every query, from opening the
+connection until it is closed.'''
+
+from threading import BoundedSemaphore, Lock
+from time import sleep, time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .errors import FathomError, FathomTimeoutError
+
+
+class Governor(object):
+
+    '''Allows at most concurrency queries at once and rate queries per
+    second on average, with bursts of up to burst queries. Limits left as
+    None are not enforced. With path, concurrency is enforced by locks of
+    files path.0, path.1, ... and the token bucket is kept in file
+    path.rate.'''
+
+    # how long to wait before trying lock files of busy slots again
+    POLL_INTERVAL = 0.01
+
+    def __init__(self, concurrency=None, rate=None, burst=1, path=None):
+        if path is not None and fcntl is None:
+            raise FathomError('Lock files need fcntl module, which is not '
+                              'available on this system.')
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.path = path
+        self._slots = (BoundedSemaphore(concurrency)
+                       if concurrency is not None else None)
+        self._lock = Lock()
+        # token bucket of this process, used without path
+        self._bucket = (burst, time())
+
+    def acquire(self, deadline=None):
+        '''Wait for a token and a free slot and return the slot, that must
+        be given back with release. Raise FathomTimeoutError, when they are
+        not available before deadline.'''
+        self._take_token(deadline)
+        return self._take_slot(deadline)
+
+    def release(self, slot):
+        if self._slots is None:
+            return
+        if slot is not None:
+            fcntl.flock(slot, fcntl.LOCK_UN)
+            slot.close()
+        self._slots.release()
+
+    # protected:
+
+    def _take_slot(self, deadline):
+        if self._slots is None:
+            return None
+        timeout = None if deadline is None else max(0, deadline - time())
+        if not self._slots.acquire(timeout=timeout):
+            raise FathomTimeoutError('No free slot for a query before the '
+                                     'deadline.')
+        if self.path is None:
+            return None
+        try:
+            while True:
+                for slot in range(self.concurrency):
+                    file = open('%s.%d' % (self.path, slot), 'a')
+                    try:
+                        fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        file.close()
+                        continue
+                    return file
+                if (deadline is not None and
+                    time() + self.POLL_INTERVAL > deadline):
+                    raise FathomTimeoutError('No free slot for a query '
+                                             'before the deadline.')
+                sleep(self.POLL_INTERVAL)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _take_token(self, deadline):
+        if self.rate is None:
+            return
+        if self.path is None:
+            with self._lock:
+                self._bucket, wait = self._reserve(self._bucket, deadline)
+        else:
+            with open(self.path + '.rate', 'a+') as file:
+                fcntl.flock(file, fcntl.LOCK_EX)
+                try:
+                    file.seek(0)
+                    state = file.read().split()
+                    bucket = ((float(state[0]), float(state[1])) if state
+                              else (self.burst, time()))
+                    bucket, wait = self._reserve(bucket, deadline)
+                    file.seek(0)
+                    file.truncate()
+                    file.write('%r %r' % bucket)
+                    file.flush()
+                finally:
+                    fcntl.flock(file, fcntl.LOCK_UN)
+        if wait > 0:
+            sleep(wait)
+
+    def _reserve(self, bucket, deadline):
+        '''Take a token from the bucket given as a pair of token count and
+        time of its last update; tokens may be borrowed from the future,
+        the returned time to wait pays them back.'''
+        now = time()
+        tokens, updated = bucket
+        tokens = min(self.burst, tokens + (now - updated) * self.rate) - 1
+        wait = -tokens / self.rate if tokens < 0 else 0
+        if deadline is not None and now + wait > deadline:
+            raise FathomTimeoutError('Query rate does not allow another '
+                                     'query before the deadline.')
+        return (tokens, now), wait
@@ -0,0 +1,202 @@
+#!/usr/bin/python3
+
+'''Versioned history of database schemas kept in a SQLite file.
+
+Every object of a recorded database is stored as a compressed blob named by
+the hash of its snapshot, so an object, that did not change, is stored only
+once however many versions contain it. A version is a manifest mapping keys
+of objects to hashes of their blobs; manifests are blobs too, so recording an
+unchanged schema adds just one row:
+
+    store = HistoryStore('history.db3')
+    store.record(database)
+    old = store.restore(store.version_at(yesterday, database.name))
+    print(store.changes(first, last))
+
+Comparing two versions reads both manifests and only blobs of objects, whose
+hashes differ. Statistics are not recorded, they change all the time.'''
+
+import pickle
+import sqlite3
+import zlib
+from hashlib import sha1
+from time import time
+
+from .diff import diff, KINDS
+from .errors import FathomError
+from .schema import Database, SNAPSHOTS, _restore_database
+
+
+class HistoryStore(object):
+
+    '''Store of schema versions of any number of databases, told apart by
+    name.'''
+
+    # protocol is fixed, so that equal snapshots always get equal hashes
+    PROTOCOL = 4
+
+    _SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versions (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    recorded REAL NOT NULL,
+    manifest TEXT NOT NULL REFERENCES blobs (hash)
+);
+CREATE INDEX IF NOT EXISTS versions_name_recorded
+    ON versions (name, recorded);"""
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(self._SCHEMA_SQL)
+        # manifests of latest versions of databases tell, which blobs need
+        # not be written again
+        self._latest = {}
+
+    def record(self, database, name=None, recorded=None):
+        '''Record current schema of the database, loading what is missing,
+        and return identifier of the new version.'''
+        name = name if name is not None else database.name
+        recorded = recorded if recorded is not None else time()
+        database._materialize(set(KINDS))
+        manifest, blobs = {}, {}
+        for kind in KINDS:
+            objects = getattr(database, '_' + kind)
+            if objects is None:
+                continue
+            snapshot = SNAPSHOTS[kind]
+            manifest[kind] = keys = {}
+            for key, obj in objects.items():
+                keys[key] = self._hash(snapshot(obj, False), blobs)
+        manifest_hash = self._hash(manifest, blobs)
+        known = self._latest_blobs(name)
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO blobs (hash, data) VALUES (?, ?)',
+                ((blob_hash, zlib.compress(data))
+                 for blob_hash, data in blobs.items()
+                 if blob_hash not in known))
+            cursor = self._connection.execute(
+                'INSERT INTO versions (name, recorded, manifest) '
+                'VALUES (?, ?, ?)', (name, recorded, manifest_hash))
+        self._latest[name] = (manifest_hash, set(blobs))
+        return cursor.lastrowid
+
+    def versions(self, name=None):
+        '''Return list of (identifier, name, time) of recorded versions
+        ordered by time, optionally only those of the named database.'''
+        sql = 'SELECT id, name, recorded FROM versions'
+        if name is not None:
+            return self._connection.execute(
+                sql + ' WHERE name = ? ORDER BY recorded, id',
+                (name,)).fetchall()
+        return self._connection.execute(
+            sql + ' ORDER BY recorded, id').fetchall()
+
+    def version_at(self, recorded, name):
+        '''Return identifier of the version of the named database, that was
+        current at given time.'''
+        row = self._connection.execute(
+            'SELECT id FROM versions WHERE name = ? AND recorded <= ? '
+            'ORDER BY recorded DESC, id DESC LIMIT 1',
+            (name, recorded)).fetchone()
+        if row is None:
+            raise FathomError('No version of %s was recorded before %s.' %
+                              (name, recorded))
+        return row[0]
+
+    def restore(self, version):
+        '''Return detached database as it was in given version.'''
+        name, manifest = self._manifest(version)
+        snapshots = self._load(set(blob_hash for keys in manifest.values()
+                                   for blob_hash in keys.values()))
+        return _restore_database(Database, (name, dict(
+            (kind, tuple((key, snapshots[blob_hash])
+                         for key, blob_hash in keys.items()))
+            for kind, keys in manifest.items())))
+
+    def changes(self, old, new):
+        '''Return SchemaDiff describing how schema of version new differs
+        from version old; only objects with different hashes are loaded.'''
+        old_name, old_manifest = self._manifest(old)
+        new_name, new_manifest = self._manifest(new)
+        differing = {}
+        for kind in KINDS:
+            old_keys = old_manifest.get(kind, {})
+            new_keys = new_manifest.get(kind, {})
+            differing[kind] = [
+                (key, old_keys.get(key), new_keys.get(key))
+                for key in set(old_keys) | set(new_keys)
+                if old_keys.get(key) != new_keys.get(key)]
+        snapshots = self._load(set(
+            blob_hash for keys in differing.values()
+            for key, old_hash, new_hash in keys
+            for blob_hash in (old_hash, new_hash) if blob_hash is not None))
+        # databases of just the differing objects give the same differences
+        # as whole ones
+        return diff(*(
+            _restore_database(Database, (name, dict(
+                (kind, tuple((row[0], snapshots[row[side]]) for row in rows
+                             if row[side] is not None))
+                for kind, rows in differing.items())))
+            for side, name in ((1, old_name), (2, new_name))))
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # protected:
+
+    def _hash(self, value, blobs):
+        data = pickle.dumps(value, self.PROTOCOL)
+        blob_hash = sha1(data).hexdigest()
+        blobs[blob_hash] = data
+        return blob_hash
+
+    def _latest_blobs(self, name):
+        # hashes of blobs of the latest version of the database, read from
+        # the store when not recorded by this instance
+        row = self._connection.execute(
+            'SELECT manifest FROM versions WHERE name = ? '
+            'ORDER BY recorded DESC, id DESC LIMIT 1', (name,)).fetchone()
+        if row is None:
+            return set()
+        manifest_hash, known = self._latest.get(name, (None, None))
+        if manifest_hash != row[0]:
+            manifest = self._load({row[0]})[row[0]]
+            known = set(blob_hash for keys in manifest.values()
+                        for blob_hash in keys.values())
+            known.add(row[0])
+        return known
+
+    def _manifest(self, version):
+        row = self._connection.execute(
+            'SELECT name, manifest FROM versions WHERE id = ?',
+            (version,)).fetchone()
+        if row is None:
+            raise FathomError('Version %s does not exist.' % version)
+        return row[0], self._load({row[1]})[row[1]]
+
+    def _load(self, hashes):
+        # blobs are read in chunks, that fit into limit of SQL variables
+        hashes, snapshots = list(hashes), {}
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            rows = self._connection.execute(
+                'SELECT hash, data FROM blobs WHERE hash IN (%s)' %
+                ', '.join('?' * len(chunk)), chunk)
+            for blob_hash, data in rows:
+                snapshots[blob_hash] = pickle.loads(zlib.decompress(data))
+        if len(snapshots) != len(hashes):
+            raise FathomError('History store %s is missing blobs.' %
+                              self.path)
+        return snapshots
@@ -1,55 +1,133 @@
 #!/usr/bin/python3
 
 from abc import ABCMeta, abstractmethod
-
-from .errors import FathomError, FathomParsingError
-from .schema import (Database, Table, Column, View, Index, Procedure, Argument,
-                     Trigger, ForeignKey)
+import re
+from copy import copy
+from fnmatch import fnmatchcase
+from itertools import chain
+from math import ceil
+from time import time
+
+from .errors import FathomError, FathomParsingError, FathomTimeoutError
+from .schema import (Database, Schema, Table, PartitionedTable, Partition,
+                     Column, View, Index, Procedure, Argument, Trigger,
+                     ForeignKey, Statistics)
 from . import constants
 
 TRIGGER_WHEN_NAMES = {'AFTER': Trigger.AFTER, 'BEFORE': Trigger.BEFORE}
 TRIGGER_EVENT_NAMES = {'INSERT': Trigger.INSERT, 'UPDATE': Trigger.UPDATE,
                        'DELETE': Trigger.DELETE}
 
+class _QueryParameters(dict):
+    
+    # parameters of a query, that render %(filter <column>)s placeholders as
+    # name filter predicates on given column
+    
+    def __init__(self, inspector, parameters):
+        super(_QueryParameters, self).__init__(parameters)
+        self.inspector = inspector
+        
+    def __missing__(self, key):
+        if not key.startswith('filter '):
+            raise KeyError(key)
+        return self.inspector._name_predicate(key[len('filter '):])
+
+
 class DatabaseInspector(metaclass=ABCMeta):
     
-    '''Abstract base class for database system inspectors.'''
+    '''Abstract base class for database system inspectors. Subclasses take
+    connection arguments of their DB-API driver and optionally the driver
+    module itself as api, which allows using stand-ins of real drivers.'''
 
     # in most databases aaa, AaA and aAa is turned into "aaa" and you can
     # get case sensitive names by quoting, so "AaA" keeps capital letters    
     CASE_SENSITIVITY = constants.CASE_SENSITIVE_QUOTED
+    
+    # shell style patterns of names of tables and views, that are inspected;
+    # indices, triggers and details of tables are filtered by table name
+    _include = ()
+    _exclude = ()
+    
+    # number of rows fetched from the server at once; streamed queries keep
+    # only this many rows of the result in memory
+    fetch_size = 1000
+    
+    # time by which all queries must finish, see with_timeout
+    _deadline = None
+    
+    # limits of concurrency and rate of queries, see with_governor
+    _governor = None
         
     def __init__(self, *args, **kwargs):
         self._args = args
         self._kwargs = kwargs
         
+    def filtered(self, include=None, exclude=None):
+        '''Return inspector, that sees only objects with names matching any
+        of include patterns and none of exclude patterns. Patterns may use * 
+        and ? wildcards and are turned into predicates of catalog queries.'''
+        inspector = copy(self)
+        inspector._include = tuple(include or ())
+        inspector._exclude = tuple(exclude or ())
+        return inspector
+
+    def with_timeout(self, timeout):
+        '''Return inspector, whose queries must all finish within timeout
+        seconds from now. Remaining time is set as statement and lock
+        timeout of every session; queries over the budget raise
+        FathomTimeoutError.'''
+        inspector = copy(self)
+        inspector._deadline = time() + timeout
+        return inspector
+
+    def with_governor(self, governor):
+        '''Return inspector, whose queries are limited by given Governor.'''
+        inspector = copy(self)
+        inspector._governor = governor
+        return inspector
+        
     def get_tables(self):
         '''Return names of all tables in the database.'''
+        sql = self._format(self._TABLE_NAMES_SQL)
         return {self.case(row[0]): Table(self.case(row[0]), inspector=self)
-                for row in self._select(self._TABLE_NAMES_SQL)}
+                for row in self._select(sql)}
         
     def get_views(self):
         '''Return names of all views in the database.'''
-        return dict((row[0], View(row[0], inspector=self)) 
-                    for row in self._select(self._VIEW_NAMES_SQL))
+        sql = self._format(self._VIEW_NAMES_SQL)
+        return dict(self.prepare_view(row) for row in self._select(sql))
+
+    def prepare_view(self, row):
+        view = View(row[0], inspector=self)
+        view.sql = row[1]
+        return row[0], view
                                 
     def get_indices(self):
         '''Return names of all indices in the database.'''
-        return dict(self.prepare_index(row)
-                    for row in self._select(self._INDEX_NAMES_SQL))
+        sql = self._format(self._INDEX_NAMES_SQL)
+        return dict(self.prepare_index(row) for row in self._select(sql))
         
     def get_procedures(self): 
         '''Return names of all stored procedures in the database.'''
         
     def get_triggers(self):
         '''Returns names of all triggers in the database.'''
+        sql = self._format(self._TRIGGER_NAMES_SQL)
         return dict((row[0], Trigger(row[0], inspector=self))
-                    for row in self._select(self._TRIGGER_NAMES_SQL))
+                    for row in self._select(sql))
 
     def get_procedures(self):
         return dict(self.prepare_procedure(row)
                     for row in self._select(self._PROCEDURE_NAMES_SQL))
 
+    def get_schemas(self):
+        '''Return schemas of the database, for systems that support more than
+        one schema per database.'''
+        return {}
+
+    def build_schemas(self, schemas):
+        '''Load objects of all given schemas at once.'''
+
     def get_index_columns(self, index):
         sql = self._INDEX_COLUMNS_SQL % index.base_name
         return tuple(row[0] for row in self._select(sql))        
@@ -62,6 +140,151 @@ class DatabaseInspector(metaclass=ABCMeta):
             name = (row[0] if case_sensitve else row[0].lower())
             columns[name] = self.prepare_column(row)
         schema_object.columns = columns
+
+    # bulk loaders fetch details of many objects with a single query; their
+    # queries return name of the owning table in the first column
+    
+    def build_all_columns(self, schema_objects):
+        '''Load columns of all given tables and views at once.'''
+        # rows are streamed and turned into columns right away, so raw rows
+        # of the whole catalog are never held in memory
+        sql = self._bulk_sql(self._ALL_COLUMNS_SQL)
+        columns = {}
+        for row in self._select(sql, stream=True):
+            column = self.prepare_column(row[1:])
+            columns.setdefault(self.case(row[0]), {})[column.name] = column
+        for schema_object in schema_objects:
+            schema_object.columns = columns.get(self.case(schema_object.name),
+                                                {})
+
+    def build_all_foreign_keys(self, tables):
+        '''Load foreign keys of all given tables at once.'''
+        sql = self._bulk_sql(self._ALL_FOREIGN_KEYS_SQL)
+        rows = self._select_grouped(sql)
+        for table in tables:
+            table.foreign_keys = self._prepare_foreign_keys(
+                rows.get(self.case(table.name), ()))
+
+    def build_all_stats(self, tables, indices):
+        '''Load size and usage statistics of all given tables and indices
+        at once; objects unknown to the statistics get empty ones.'''
+        stats = {}
+        sql = self._bulk_sql(self._STATS_SQL)
+        for row in self._select(sql, stream=True):
+            # row contains object kind, table name, object name and then
+            # values in order of Statistics arguments
+            if row[0] == 'table':
+                stats[self.case(row[2])] = Statistics(*row[3:])
+            else:
+                stats[(row[1], row[2])] = Statistics(*row[3:])
+        for table in tables:
+            table.stats = stats.get(self.case(table.name), Statistics())
+        for index in indices:
+            index.stats = stats.get((index.table, index.base_name), 
+                                    Statistics())
+
+    def get_table(self, name, database=None):
+        '''Return table with given name, that has its columns, indices, 
+        foreign keys and triggers loaded with a single query.'''
+        rows = self._table_bundle_rows(Table(name))
+        table = self._bundle_table(name, rows['table'][0])
+        table.database = database
+        self._build_table(table, rows)
+        return table
+
+    def build_table(self, table):
+        '''Load columns, indices, foreign keys and triggers of the table with
+        a single query.'''
+        self._build_table(table, self._table_bundle_rows(table))
+
+    def _table_bundle_rows(self, table):
+        # the query returns one row per object, kind of the object is in the
+        # first column and _TABLE_BUNDLE_LAYOUT says where its data is
+        rows = dict((kind, []) for kind in self._TABLE_BUNDLE_LAYOUT)
+        for row in self._select(self._table_bundle_sql(table)):
+            start, stop = self._TABLE_BUNDLE_LAYOUT[row[0]]
+            rows[row[0]].append(row[start:stop])
+        if not rows['table']:
+            raise FathomError('Table %s does not exist.' % table.name)
+        return rows
+
+    def _bundle_table(self, name, row):
+        return Table(name, inspector=self)
+
+    def _build_table(self, table, rows):
+        columns = [self.prepare_column(row) for row in rows['column']]
+        table.columns = dict((column.name, column) for column in columns)
+        # index columns and foreign keys keep their position in the last 
+        # value of the row
+        index_columns = {}
+        for row in sorted(rows['index_column'], key=lambda row: row[-1]):
+            index_columns.setdefault(row[0], []).append(row[1])
+        indices = dict(self.prepare_index(row) for row in rows['index'])
+        for index in indices.values():
+            index.columns = tuple(index_columns.get(index.base_name, ()))
+            index.database = table.database
+        table.indices = indices
+        table.foreign_keys = self._prepare_foreign_keys(
+            sorted(rows['foreign_key'], key=lambda row: (row[0], row[-1])))
+        triggers = dict(self.prepare_trigger(row) for row in rows['trigger'])
+        for trigger in triggers.values():
+            trigger.database = table.database
+        table.triggers = triggers
+
+    def _table_bundle_sql(self, table):
+        return self._TABLE_BUNDLE_SQL % {'table': table.name}
+
+    def build_all_triggers(self, triggers):
+        '''Load details of all given triggers.'''
+        for trigger in triggers:
+            self.build_trigger(trigger)
+
+    def build_all_arguments(self, procedures):
+        '''Load arguments of all given procedures.'''
+        for procedure in procedures:
+            self.build_procedure(procedure)
+
+    def get_schema_version(self):
+        '''Return value, that changes whenever definition of any inspected
+        object changes; it is read with a single query returning one row, 
+        that is cheap on SQLite, PostgreSQL and Oracle, while on MySQL it 
+        scans information_schema as get_change_markers does.'''
+        return tuple(self._select(self._bulk_sql(self._SCHEMA_VERSION_SQL))[0])
+
+    def get_change_markers(self):
+        '''Return markers of tables and views as a dictionary with keys
+        'tables' and 'views', that map object names to markers. Marker of 
+        a table changes when the table, its columns, indices, triggers or
+        foreign keys change.'''
+        return self._prepare_change_markers(self._select(
+            self._bulk_sql(self._CHANGE_MARKERS_SQL), stream=True))
+
+    def _prepare_change_markers(self, rows):
+        # rows contain kind of the object, its name, name of the table or
+        # view it belongs to and its own marker
+        owned = {}
+        markers = {'tables': {}, 'views': {}}
+        for row in rows:
+            owned.setdefault(self.case(row[2]), []).append(tuple(row))
+            if row[0] == 'table':
+                markers['tables'][self.case(row[1])] = None
+            elif row[0] == 'view':
+                markers['views'][row[1]] = None
+        for kind in markers:
+            for name in markers[kind]:
+                rows = owned[self.case(name)]
+                markers[kind][name] = tuple(sorted(rows, key=repr))
+        return markers
+
+    def build_all_index_columns(self, indices):
+        '''Load columns of all given indices at once.'''
+        columns = {}
+        sql = self._bulk_sql(self._ALL_INDEX_COLUMNS_SQL)
+        for row in self._select(sql, stream=True):
+            columns.setdefault((row[0], row[1]), []).append(row[2])
+        for index in indices:
+            index.columns = tuple(columns.get((index.table, index.base_name), 
+                                              ()))
                              
     def prepare_default(self, data_type, value):
         if data_type in self.INTEGER_TYPES:
@@ -82,23 +305,157 @@ class DatabaseInspector(metaclass=ABCMeta):
     def supports_routine_parametres(self):
         return True
                     
-    def _select(self, sql):
+    def _select(self, sql, stream=False):
+        '''Return rows of the query. Streamed rows are returned as an
+        iterator fetching them in batches of fetch_size, with server side 
+        cursor where the system has one; the connection is closed when
+        the iterator is exhausted or discarded.'''
+        rows = self._fetch(sql, stream)
+        return rows if stream else list(rows)
+
+    def _fetch(self, sql, stream):
+        # governor is held from connecting until the connection is closed
+        if self._governor is None:
+            yield from self._fetch_rows(sql, stream)
+            return
+        self._remaining()
+        slot = self._governor.acquire(self._deadline)
+        try:
+            yield from self._fetch_rows(sql, stream)
+        finally:
+            self._governor.release(slot)
+
+    def _fetch_rows(self, sql, stream):
+        remaining = self._remaining()
         try:
             connection = self._api.connect(*self._args, **self._kwargs)
-            cursor = connection.cursor()
-            cursor.execute(sql)
         except Exception as e: # TODO: properly catch exceptions here
-            raise FathomError(str(e))
-        rows = list(cursor)
-        connection.close()
-        return rows
+            raise self._error(e)
+        try:
+            try:
+                if remaining is not None:
+                    self._set_timeout(connection, self._remaining())
+                cursor = self._cursor(connection, stream)
+                cursor.arraysize = self.fetch_size
+                cursor.execute(sql)
+            except Exception as e:
+                raise self._error(e)
+            while True:
+                try:
+                    rows = cursor.fetchmany(self.fetch_size)
+                    if remaining is not None:
+                        self._remaining()
+                except Exception as e:
+                    raise self._error(e)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            connection.close()
+
+    def _cursor(self, connection, stream):
+        return connection.cursor()
+
+    def _remaining(self):
+        '''Return seconds left until the deadline, None without one.'''
+        if self._deadline is None:
+            return None
+        remaining = self._deadline - time()
+        if remaining <= 0:
+            raise FathomTimeoutError('Inspection exceeded its time budget.')
+        return remaining
+
+    def _set_timeout(self, connection, seconds):
+        '''Bound time of queries run on the connection, including time spent
+        waiting for locks.'''
+
+    def _timed_out(self, error):
+        '''Tell whether driver error was caused by timeouts set by
+        _set_timeout.'''
+        return False
+
+    def _error(self, error):
+        if isinstance(error, FathomError):
+            return error
+        if self._timed_out(error):
+            return FathomTimeoutError(str(error))
+        return FathomError(str(error))
+
+    def _prepare_foreign_keys(self, rows):
+        # row contains constraint identifier, referenced table, column and
+        # referenced column, ordered by position in the constraint
+        foreign_keys = {}
+        for row in rows:
+            fk = foreign_keys.get(row[0])
+            if fk is None:
+                fk = foreign_keys[row[0]] = ForeignKey()
+                fk.referenced_table = row[1]
+            fk.columns.append(row[2])
+            fk.referenced_columns.append(row[3])
+        return list(foreign_keys.values())
+
+    def _select_grouped(self, sql):
+        '''Return rows of the query grouped by object name kept in the first
+        column; the name itself is stripped from rows.'''
+        groups = {}
+        for row in self._select(sql, stream=True):
+            groups.setdefault(self.case(row[0]), []).append(row[1:])
+        return groups
+
+    def _bulk_sql(self, sql):
+        return self._format(sql)
+
+    def _format(self, sql, **parameters):
+        '''Fill parameters of a query, that enumerates objects; placeholder
+        %(filter <column>)s is replaced with predicate matching values of the
+        column against name filters of the inspector.'''
+        return sql % _QueryParameters(self, parameters)
+
+    def _name_predicate(self, column):
+        if self.CASE_SENSITIVITY == constants.CASE_INSENSITIVE:
+            column = 'lower(%s)' % column
+        predicates = []
+        if self._include:
+            predicates.append('(%s)' % self._match(column, self._include))
+        if self._exclude:
+            predicates.append('NOT (%s)' % self._match(column, self._exclude))
+        return ' AND '.join(predicates) or '1 = 1'
+
+    def _name_matches(self, name):
+        '''Tell whether name passes name filters of the inspector; this is
+        the predicate of _name_predicate evaluated in Python.'''
+        name = self.case(name)
+        # only * and ? are wildcards in SQL, so [ is matched literally
+        matches = lambda pattern: fnmatchcase(
+            name, self.case(pattern).replace('[', '[[]'))
+        return ((not self._include or any(map(matches, self._include))) and
+                not any(map(matches, self._exclude)))
+
+    def _match(self, column, patterns):
+        quote = lambda string: "'%s'" % string.replace("'", "''")
+        names = [quote(self.case(pattern)) for pattern in patterns
+                 if '*' not in pattern and '?' not in pattern]
+        conditions = ['%s IN (%s)' % (column, ', '.join(names))] if names else []
+        for pattern in patterns:
+            if '*' in pattern or '?' in pattern:
+                # ! escapes LIKE wildcards, that are common in names, like _
+                pattern = self.case(pattern)
+                for char in '!%_':
+                    pattern = pattern.replace(char, '!' + char)
+                pattern = pattern.replace('*', '%').replace('?', '_')
+                conditions.append("%s LIKE %s ESCAPE '!'" % (column,
+                                                            quote(pattern)))
+        return ' OR '.join(conditions)
         
     def drop_table(self, table):
         connection = self._api.connect(*self._args, **self._kwargs)
-        cursor = connection.cursor()
-        cursor.execute('DROP TABLE %s' % table.name)
-        connection.commit()
-        connection.close()
+        try:
+            cursor = connection.cursor()
+            cursor.execute('DROP TABLE %s' % table.name)
+            connection.commit()
+        finally:
+            connection.close()
         
     def case(self, string):
         if self.CASE_SENSITIVITY != constants.CASE_INSENSITIVE:
@@ -114,25 +471,21 @@ class SqliteInspector(DatabaseInspector):
 
     _TABLE_NAMES_SQL = """SELECT name 
                           FROM sqlite_master
-                          WHERE type = 'table'"""
+                          WHERE type = 'table' AND %(filter name)s"""
                           
-    _VIEW_NAMES_SQL = """SELECT name
+    _VIEW_NAMES_SQL = """SELECT name, sql
                          FROM sqlite_master
-                         WHERE type= 'view'"""
+                         WHERE type= 'view' AND %(filter name)s"""
                          
     _TRIGGER_NAMES_SQL = """
 SELECT name
 FROM sqlite_master
-WHERE type = 'trigger'"""
+WHERE type = 'trigger' AND %(filter tbl_name)s"""
 
     _INDEX_NAMES_SQL = """
-SELECT name, tbl_name
-FROM sqlite_master
-WHERE type = 'index'
-"""
-
-    _INDEX_UNIQUENESS_SQL = """
-pragma index_list(%s)
+SELECT m.name, m.tbl_name, l."unique", l.origin = 'pk'
+FROM sqlite_master m JOIN pragma_index_list(m.tbl_name) l ON l.name = m.name
+WHERE m.type = 'index' AND %(filter m.tbl_name)s
 """
     
     _COLUMN_NAMES_SQL = """
@@ -148,18 +501,96 @@ pragma index_info(%s)
     _TRIGGER_SQL = """
 SELECT sql FROM sqlite_master 
 WHERE type='trigger' AND name = '%s'"""
+
+    _TABLE_BUNDLE_SQL = """
+SELECT 'table', name, NULL, NULL, NULL, NULL, NULL
+FROM sqlite_master
+WHERE type = 'table' AND name = '%(table)s' COLLATE NOCASE
+UNION ALL
+SELECT 'column', cid, name, type, "notnull", dflt_value, pk
+FROM pragma_table_info('%(table)s')
+UNION ALL
+SELECT 'index', l.name, m.tbl_name, l."unique", l.origin = 'pk', NULL, NULL
+FROM pragma_index_list('%(table)s') l JOIN sqlite_master m ON m.name = l.name
+UNION ALL
+SELECT 'index_column', l.name, i.name, i.seqno, NULL, NULL, NULL
+FROM pragma_index_list('%(table)s') l JOIN pragma_index_info(l.name) i
+UNION ALL
+SELECT 'foreign_key', id, "table", "from", "to", seq, NULL
+FROM pragma_foreign_key_list('%(table)s')
+UNION ALL
+SELECT 'trigger', name, sql, NULL, NULL, NULL, NULL
+FROM sqlite_master
+WHERE type = 'trigger' AND tbl_name = '%(table)s' COLLATE NOCASE"""
+
+    _TABLE_BUNDLE_LAYOUT = {'table': (1, 2), 'column': (1, 7), 
+                            'index': (1, 5), 'index_column': (1, 4),
+                            'foreign_key': (1, 6), 'trigger': (1, 3)}
+
+    _ALL_TRIGGERS_SQL = """
+SELECT name, sql FROM sqlite_master
+WHERE type = 'trigger'"""
+
+    _ALL_COLUMNS_SQL = """
+SELECT m.name, p.*
+FROM sqlite_master m JOIN pragma_table_info(m.name) p
+WHERE m.type IN ('table', 'view') AND %(filter m.name)s
+ORDER BY m.name, p.cid"""
+
+    _ALL_FOREIGN_KEYS_SQL = """
+SELECT m.name, p.id, p."table", p."from", p."to"
+FROM sqlite_master m JOIN pragma_foreign_key_list(m.name) p
+WHERE m.type = 'table' AND %(filter m.name)s
+ORDER BY m.name, p.id, p.seq"""
+
+    _ALL_INDEX_COLUMNS_SQL = """
+SELECT m.tbl_name, m.name, p.name
+FROM sqlite_master m JOIN pragma_index_info(m.name) p
+WHERE m.type = 'index' AND %(filter m.tbl_name)s
+ORDER BY m.name, p.seqno"""
+
+    _SCHEMA_VERSION_SQL = """PRAGMA schema_version"""
+
+    # definitions of objects change whenever they are altered
+    _CHANGE_MARKERS_SQL = """
+SELECT type, name, tbl_name, sql
+FROM sqlite_master
+WHERE type IN ('table', 'view', 'index', 'trigger') AND %(filter tbl_name)s"""
+
+    # requires sqlite compiled with SQLITE_ENABLE_DBSTAT_VTAB
+    _STATS_SQL = """
+SELECT m.type, m.tbl_name, m.name, 
+       sum(CASE WHEN m.type = 'table' AND s.pagetype = 'leaf' 
+                THEN s.ncell END),
+       count(*), sum(s.pgsize), NULL, NULL
+FROM sqlite_master m JOIN dbstat s ON s.name = m.name
+WHERE m.type IN ('table', 'index') AND %(filter m.tbl_name)s
+GROUP BY m.name"""
     
     INTEGER_TYPES = ('integer', 'smallint')
     FLOAT_TYPES = ('float',)
 
-    def __init__(self, *db_params):
+    def __init__(self, *db_params, api=None):
         DatabaseInspector.__init__(self, *db_params)
-        import sqlite3
-        self._api = sqlite3
+        if api is None:
+            import sqlite3 as api
+        self._api = api
 
     def supports_stored_procedures(self):
         return False
 
+    def _set_timeout(self, connection, seconds):
+        # sqlite has no statement timeout, a progress handler interrupts
+        # queries running past the deadline instead
+        connection.cursor().execute('PRAGMA busy_timeout = %d' % 
+                                    max(1, int(seconds * 1000)))
+        if hasattr(connection, 'set_progress_handler'):
+            deadline = self._deadline
+            connection.set_progress_handler(lambda: time() > deadline, 1000)
+
+    def _timed_out(self, error):
+        return str(error) in ('interrupted', 'database is locked')
+
     def supports_routine_parametres(self):
         return False
 
@@ -168,10 +599,8 @@ WHERE type='trigger' AND name = '%s'"""
 
     def prepare_index(self, row):
         index = Index(row[0], row[1], inspector=self)
-        for index_row in self._select(self._INDEX_UNIQUENESS_SQL % row[1]):
-            if index_row[1] == row[0]:
-                index.is_unique = (index_row[2] == 1)
-                break
+        index.is_unique = (row[2] == 1)
+        index.is_primary = bool(row[3])
         return row[0], index    
         
     def build_columns(self, schema_object):
@@ -179,17 +608,38 @@ WHERE type='trigger' AND name = '%s'"""
         schema_object.columns = dict((row[1].lower(), self.prepare_column(row)) 
                                      for row in self._select(sql))
 
+    def build_all_stats(self, tables, indices):
+        try:
+            DatabaseInspector.build_all_stats(self, tables, indices)
+        except FathomError:
+            # dbstat virtual table is not available, statistics stay empty
+            for obj in chain(tables, indices):
+                obj.stats = Statistics()
+
     def build_trigger(self, trigger):
         sql = self._TRIGGER_SQL % trigger.name
-        source_sql = self._select(sql)[0][0]
+        self._parse_trigger(trigger, self._select(sql)[0][0])
+
+    def prepare_trigger(self, row):
+        trigger = Trigger(row[0], inspector=self)
+        self._parse_trigger(trigger, row[1])
+        return row[0], trigger
+
+    def build_all_triggers(self, triggers):
+        sqls = dict(self._select(self._ALL_TRIGGERS_SQL))
+        for trigger in triggers:
+            self._parse_trigger(trigger, sqls[trigger.name])
+
+    def _parse_trigger(self, trigger, source_sql):
         sql = source_sql.replace('\n', ' ').replace('\r', ' ').split(' ')
         sql = [part for part in sql if part]
         index = sql.index('ON')
         if index == -1 or index + 1 == len(sql):
             raise FathomParsingError('CREATE TRIGGER statement', source_sql)
-        trigger.table = sql[index + 1]
         self._build_trigger_event(trigger, sql[:index], source_sql)
         self._build_trigger_when(trigger, sql[:index], source_sql)
+        # table is set last, because it marks the trigger as loaded
+        trigger.table = sql[index + 1]
         
     def _build_trigger_event(self, trigger, sql, source_sql):
         for part in sql:
@@ -234,90 +684,373 @@ class PostgresInspector(DatabaseInspector):
     
     CASE_SENSITIVITY = constants.CASE_SENSITIVE_QUOTED
     
+    # queries enumerating schema objects take a list of schemas and return
+    # schema name in the last column, so objects from several schemas can be
+    # fetched in one pass
+
+    # underscore is a wildcard of LIKE, so system schemas are matched by
+    # prefix, which keeps user schemas like pgbouncer
+    _SCHEMA_NAMES_SQL = """
+SELECT nspname
+FROM pg_catalog.pg_namespace
+WHERE left(nspname, 3) <> 'pg_' AND nspname != 'information_schema'"""
+
+    # predicate skipping relation with given oid, when it is a partition
+    _NOT_PARTITION_SQL = """NOT EXISTS (SELECT 1
+                  FROM pg_catalog.pg_inherits inh
+                  JOIN pg_catalog.pg_class parent ON parent.oid = inh.inhparent
+                  WHERE inh.inhrelid = %s AND parent.relkind = 'p')"""
+
+    # partitions are not listed as tables, they are available through their
+    # partitioned parent
     _TABLE_NAMES_SQL = """
-SELECT table_name 
-FROM information_schema.tables 
-WHERE table_schema = 'public' AND table_type = 'BASE TABLE'"""
+SELECT t.table_name, c.relkind = 'p', t.table_schema
+FROM information_schema.tables t
+JOIN pg_catalog.pg_namespace n ON n.nspname = t.table_schema
+JOIN pg_catalog.pg_class c ON c.relnamespace = n.oid AND 
+                              c.relname = t.table_name
+WHERE t.table_schema IN (%(schemas)s) AND t.table_type = 'BASE TABLE' AND
+      %(filter t.table_name)s AND
+      """ + _NOT_PARTITION_SQL % 'c.oid'
                           
     _VIEW_NAMES_SQL = """
-SELECT viewname
+SELECT viewname, definition, schemaname
 FROM pg_views
-WHERE schemaname = 'public'"""
+WHERE schemaname IN (%(schemas)s) AND %(filter viewname)s"""
 
     _TRIGGER_NAMES_SQL = """
-SELECT tgname, class.relname, tgrelid, tgtype
-FROM pg_catalog.pg_trigger, pg_catalog.pg_class class
+SELECT tgname, class.relname, tgrelid, tgtype, n.nspname
+FROM pg_catalog.pg_trigger, pg_catalog.pg_class class,
+     pg_catalog.pg_namespace n
 WHERE tgname NOT IN ('pg_sync_pg_database', 'pg_sync_pg_authid', 
                      'pg_sync_pg_auth_members') AND
-      tgname NOT LIKE 'RI_ConstraintTrigger_%' AND
-      class.oid = tgrelid
-"""
+      tgname NOT LIKE 'RI_ConstraintTrigger_%%' AND
+      class.oid = tgrelid AND n.oid = class.relnamespace AND
+      n.nspname IN (%(schemas)s) AND %(filter class.relname)s AND
+      """ + _NOT_PARTITION_SQL % 'class.oid'
                           
     _COLUMN_NAMES_SQL = """
 SELECT column_name, data_type, character_maximum_length, is_nullable,
        column_default
 FROM information_schema.columns
-WHERE table_name = '%s'"""
+WHERE table_name = '%s' AND table_schema = '%s'"""
                            
     _INDEX_NAMES_SQL = """
 SELECT i.relname AS indexname, c.relname AS tablename, x.indisunique,  
-       pg_get_indexdef(i.oid) AS indexdef
+       pg_get_indexdef(i.oid) AS indexdef, x.indisprimary, n.nspname
 FROM pg_index x
 JOIN pg_class c ON c.oid = x.indrelid
 JOIN pg_class i ON i.oid = x.indexrelid
 LEFT JOIN pg_namespace n ON n.oid = c.relnamespace
 LEFT JOIN pg_tablespace t ON t.oid = i.reltablespace
-WHERE c.relkind = 'r'::"char" AND i.relkind = 'i'::"char" AND 
-      n.nspname = 'public';
-"""
+WHERE c.relkind IN ('r'::"char", 'p'::"char") AND 
+      i.relkind IN ('i'::"char", 'I'::"char") AND 
+      n.nspname IN (%(schemas)s) AND %(filter c.relname)s AND
+      """ + _NOT_PARTITION_SQL % 'c.oid'
 
     _PROCEDURE_NAMES_SQL = """
-SELECT proname, proargtypes, prosrc, prorettype
+SELECT proname, proargtypes, prosrc, prorettype, n.nspname
 FROM pg_proc JOIN pg_language ON pg_proc.prolang = pg_language.oid
-WHERE pg_language.lanname = 'plpgsql'
+             JOIN pg_namespace n ON pg_proc.pronamespace = n.oid
+WHERE pg_language.lanname = 'plpgsql' AND n.nspname IN (%(schemas)s)
 """
 
     _PROCEDURE_ARGUMENTS_SQL = """
 SELECT proargnames, proargtypes, proargmodes
 FROM pg_proc JOIN pg_language ON pg_proc.prolang = pg_language.oid
-WHERE pg_language.lanname = 'plpgsql' AND proname = '%s' AND proargtypes='%s'
+             JOIN pg_namespace n ON pg_proc.pronamespace = n.oid
+WHERE pg_language.lanname = 'plpgsql' AND proname = '%s' AND
+      proargtypes='%s' AND n.nspname = '%s'
 """
 
-    _TYPE_SQL = """
-SELECT typname
+    _ALL_PROCEDURE_ARGUMENTS_SQL = """
+SELECT proname, proargtypes, proargnames
+FROM pg_proc JOIN pg_language ON pg_proc.prolang = pg_language.oid
+             JOIN pg_namespace n ON pg_proc.pronamespace = n.oid
+WHERE pg_language.lanname = 'plpgsql' AND n.nspname = '%(schema)s'
+"""
+
+    _TYPES_SQL = """
+SELECT oid, typname
 FROM pg_type
-WHERE oid = %s;
+WHERE oid IN (%s)
 """
 
+    # only key columns of indices are read, not their INCLUDE columns
     _INDEX_COLUMNS_SQL = """
 SELECT attname 
-FROM pg_catalog.pg_class, pg_catalog.pg_attribute 
-WHERE relname='%s' AND attrelid=oid;
+FROM pg_catalog.pg_class, pg_catalog.pg_attribute, pg_catalog.pg_namespace n,
+     pg_catalog.pg_index x
+WHERE relname='%s' AND attrelid=pg_class.oid AND n.oid = relnamespace AND
+      n.nspname = '%s' AND x.indexrelid = pg_class.oid AND 
+      attnum <= x.indnkeyatts
+ORDER BY attnum;
 """
 
     _FOREIGN_KEYS_SQL = """
-SELECT ref.relname, conkey, confkey
-FROM pg_catalog.pg_constraint, pg_catalog.pg_class tab, 
-     pg_catalog.pg_class ref
-WHERE contype = 'f' AND confrelid = ref.oid AND conrelid = tab.oid AND 
-      tab.relname = '%s'"""
-      
-    _COLUMNS_FROM_POSITIONS_SQL = """
-SELECT column_name
+SELECT ref.relname,
+       ARRAY(SELECT a.attname::text
+             FROM unnest(con.conkey) WITH ORDINALITY AS k(attnum, position)
+             JOIN pg_catalog.pg_attribute a ON a.attrelid = con.conrelid AND
+                                               a.attnum = k.attnum
+             ORDER BY k.position),
+       ARRAY(SELECT a.attname::text
+             FROM unnest(con.confkey) WITH ORDINALITY AS k(attnum, position)
+             JOIN pg_catalog.pg_attribute a ON a.attrelid = con.confrelid AND
+                                               a.attnum = k.attnum
+             ORDER BY k.position)
+FROM pg_catalog.pg_constraint con
+JOIN pg_catalog.pg_class tab ON tab.oid = con.conrelid
+JOIN pg_catalog.pg_class ref ON ref.oid = con.confrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = tab.relnamespace
+WHERE con.contype = 'f' AND tab.relname = '%s' AND n.nspname = '%s'"""
+
+    # bulk queries skip partitions like the queries enumerating tables, so
+    # their cost depends on the number of tables, not partitions
+    _ALL_COLUMNS_SQL = """
+SELECT t.table_name, t.column_name, t.data_type, t.character_maximum_length, 
+       t.is_nullable, t.column_default
+FROM information_schema.columns t
+JOIN pg_catalog.pg_namespace n ON n.nspname = t.table_schema
+JOIN pg_catalog.pg_class c ON c.relnamespace = n.oid AND 
+                              c.relname = t.table_name
+WHERE t.table_schema = '%(schema)s' AND %(filter t.table_name)s AND
+      """ + _NOT_PARTITION_SQL % 'c.oid' + """
+ORDER BY t.table_name, t.ordinal_position"""
+
+    _ALL_FOREIGN_KEYS_SQL = """
+SELECT tab.relname, con.conname, ref.relname, a.attname, ra.attname
+FROM pg_catalog.pg_constraint con
+JOIN pg_catalog.pg_class tab ON tab.oid = con.conrelid
+JOIN pg_catalog.pg_class ref ON ref.oid = con.confrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = tab.relnamespace
+CROSS JOIN unnest(con.conkey, con.confkey) 
+           WITH ORDINALITY AS k(attnum, refnum, position)
+JOIN pg_catalog.pg_attribute a ON a.attrelid = con.conrelid AND 
+                                  a.attnum = k.attnum
+JOIN pg_catalog.pg_attribute ra ON ra.attrelid = con.confrelid AND 
+                                   ra.attnum = k.refnum
+WHERE con.contype = 'f' AND n.nspname = '%(schema)s' AND 
+      %(filter tab.relname)s AND
+      """ + _NOT_PARTITION_SQL % 'tab.oid' + """
+ORDER BY tab.relname, con.conname, k.position"""
+
+    _ALL_INDEX_COLUMNS_SQL = """
+SELECT c.relname, i.relname, a.attname
+FROM pg_catalog.pg_index x
+JOIN pg_catalog.pg_class c ON c.oid = x.indrelid
+JOIN pg_catalog.pg_class i ON i.oid = x.indexrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_catalog.pg_attribute a ON a.attrelid = i.oid AND 
+                                  a.attnum <= x.indnkeyatts
+WHERE n.nspname = '%(schema)s' AND %(filter c.relname)s AND
+      """ + _NOT_PARTITION_SQL % 'c.oid' + """
+ORDER BY i.relname, a.attnum"""
+
+    # every change of a catalog row gives it new xmin, so xmin of rows
+    # describing an object serve as its marker; partitions and their
+    # objects have no markers, attaching or detaching a partition changes
+    # the marker of its parent
+    _CHANGE_MARKERS_SQL = """
+SELECT CASE WHEN c.relkind = 'v' THEN 'view' ELSE 'table' END AS kind, 
+       c.relname AS name, c.relname AS owner, 
+       c.xmin::text || '/' || 
+       (SELECT max(a.xmin::text::bigint) FROM pg_catalog.pg_attribute a
+        WHERE a.attrelid = c.oid)::text || '/' ||
+       (SELECT count(*)::text || ':' || 
+               coalesce(max(inh.xmin::text::bigint), 0)::text
+        FROM pg_catalog.pg_inherits inh
+        WHERE inh.inhparent = c.oid) AS marker
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = '%(schema)s' AND c.relkind IN ('r', 'p', 'v') AND
+      %(filter c.relname)s AND
+      """ + _NOT_PARTITION_SQL % 'c.oid' + """
+UNION ALL
+SELECT 'index', i.relname, c.relname, i.xmin::text || '/' || x.xmin::text
+FROM pg_catalog.pg_index x
+JOIN pg_catalog.pg_class i ON i.oid = x.indexrelid
+JOIN pg_catalog.pg_class c ON c.oid = x.indrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = '%(schema)s' AND %(filter c.relname)s AND
+      """ + _NOT_PARTITION_SQL % 'c.oid' + """
+UNION ALL
+SELECT 'trigger', t.tgname, c.relname, t.xmin::text
+FROM pg_catalog.pg_trigger t
+JOIN pg_catalog.pg_class c ON c.oid = t.tgrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE NOT t.tgisinternal AND n.nspname = '%(schema)s' AND 
+      %(filter c.relname)s AND
+      """ + _NOT_PARTITION_SQL % 'c.oid' + """
+UNION ALL
+SELECT 'constraint', con.conname, c.relname, con.xmin::text
+FROM pg_catalog.pg_constraint con
+JOIN pg_catalog.pg_class c ON c.oid = con.conrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = '%(schema)s' AND %(filter c.relname)s AND
+      """ + _NOT_PARTITION_SQL % 'c.oid'
+
+    # catalog change signature, a digest of all markers
+    _SCHEMA_VERSION_SQL = """
+SELECT md5(string_agg(concat_ws(':', kind, name, owner, marker), ','
+                      ORDER BY kind, name, owner, marker))
+FROM (%s) markers""" % _CHANGE_MARKERS_SQL
+
+    _STATS_SQL = """
+SELECT 'table', c.relname, c.relname, 
+       CASE WHEN c.reltuples >= 0 THEN c.reltuples::bigint END, c.relpages,
+       pg_catalog.pg_total_relation_size(c.oid), 
+       pg_catalog.pg_indexes_size(c.oid), st.seq_scan
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_catalog.pg_stat_user_tables st ON st.relid = c.oid
+WHERE n.nspname = '%(schema)s' AND c.relkind IN ('r', 'p') AND
+      %(filter c.relname)s AND
+      """ + _NOT_PARTITION_SQL % 'c.oid' + """
+UNION ALL
+SELECT 'index', si.relname, si.indexrelname, 
+       CASE WHEN i.reltuples >= 0 THEN i.reltuples::bigint END, i.relpages,
+       pg_catalog.pg_relation_size(i.oid), NULL, si.idx_scan
+FROM pg_catalog.pg_stat_user_indexes si
+JOIN pg_catalog.pg_class i ON i.oid = si.indexrelid
+WHERE si.schemaname = '%(schema)s' AND %(filter si.relname)s AND
+      """ + _NOT_PARTITION_SQL % 'si.relid'
+
+    # index and trigger queries match ones enumerating all objects; NULLs in
+    # the first row are typed, so all rows of the union have the same types
+    _TABLE_BUNDLE_SQL = """
+SELECT 'table', c.relname::text, 
+       CASE WHEN c.relkind = 'p' THEN 'p' END, 
+       NULL::text, NULL::int, NULL::text, NULL::text,
+       NULL::text, NULL::text, NULL::bool, NULL::text, NULL::bool,
+       NULL::text, NULL::text, NULL::int,
+       NULL::text, NULL::text, NULL::text, NULL::text, NULL::int,
+       NULL::text, NULL::text, NULL::oid, NULL::int2
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relname = '%(table)s' AND n.nspname = '%(schema)s' AND 
+      c.relkind IN ('r', 'p')
+UNION ALL
+%(columns)s
+UNION ALL
+SELECT 'index', NULL, 
+       NULL, NULL, NULL, NULL, NULL,
+       i.relname, c.relname, x.indisunique, pg_get_indexdef(i.oid),
+       x.indisprimary,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL
+FROM pg_catalog.pg_index x
+JOIN pg_catalog.pg_class c ON c.oid = x.indrelid
+JOIN pg_catalog.pg_class i ON i.oid = x.indexrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE c.relname = '%(table)s' AND n.nspname = '%(schema)s' AND 
+      i.relkind IN ('i'::"char", 'I'::"char")
+UNION ALL
+SELECT 'index_column', NULL, 
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       i.relname, a.attname, a.attnum,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL
+FROM pg_catalog.pg_index x
+JOIN pg_catalog.pg_class c ON c.oid = x.indrelid
+JOIN pg_catalog.pg_class i ON i.oid = x.indexrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+JOIN pg_catalog.pg_attribute a ON a.attrelid = i.oid AND 
+                                  a.attnum <= x.indnkeyatts
+WHERE c.relname = '%(table)s' AND n.nspname = '%(schema)s'
+UNION ALL
+SELECT 'foreign_key', NULL, 
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       con.conname, ref.relname, a.attname, ra.attname, k.position,
+       NULL, NULL, NULL, NULL
+FROM pg_catalog.pg_constraint con
+JOIN pg_catalog.pg_class tab ON tab.oid = con.conrelid
+JOIN pg_catalog.pg_class ref ON ref.oid = con.confrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = tab.relnamespace
+CROSS JOIN unnest(con.conkey, con.confkey) 
+           WITH ORDINALITY AS k(attnum, refnum, position)
+JOIN pg_catalog.pg_attribute a ON a.attrelid = con.conrelid AND 
+                                  a.attnum = k.attnum
+JOIN pg_catalog.pg_attribute ra ON ra.attrelid = con.confrelid AND 
+                                   ra.attnum = k.refnum
+WHERE con.contype = 'f' AND tab.relname = '%(table)s' AND 
+      n.nspname = '%(schema)s'
+UNION ALL
+SELECT 'trigger', NULL, 
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       tgname, class.relname, tgrelid, tgtype
+FROM pg_catalog.pg_trigger
+JOIN pg_catalog.pg_class class ON class.oid = tgrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = class.relnamespace
+WHERE tgname NOT IN ('pg_sync_pg_database', 'pg_sync_pg_authid', 
+                     'pg_sync_pg_auth_members') AND
+      tgname NOT LIKE 'RI_ConstraintTrigger_%%' AND
+      class.relname = '%(table)s' AND n.nspname = '%(schema)s'"""
+
+    _TABLE_BUNDLE_COLUMNS_SQL = """
+SELECT 'column', NULL, 
+       column_name::text, data_type::text, character_maximum_length::int, 
+       is_nullable::text, column_default::text,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL
 FROM information_schema.columns
-WHERE table_name = '%s' AND ordinal_position IN ('%s')"""
+WHERE table_name = '%(table)s' AND table_schema = '%(schema)s'"""
+
+    # table row tells whether the table is partitioned
+    _TABLE_BUNDLE_LAYOUT = {'table': (1, 3), 'column': (2, 7), 
+                            'index': (7, 12), 'index_column': (12, 15),
+                            'foreign_key': (15, 20), 'trigger': (20, 24)}
+
+    _PARTITIONS_SQL = """
+SELECT child.relname, pg_catalog.pg_get_expr(child.relpartbound, child.oid),
+       ts.spcname, child.relkind = 'p'
+FROM pg_catalog.pg_inherits inh
+JOIN pg_catalog.pg_class child ON child.oid = inh.inhrelid
+JOIN pg_catalog.pg_class parent ON parent.oid = inh.inhparent
+JOIN pg_catalog.pg_namespace n ON n.oid = parent.relnamespace
+LEFT JOIN pg_catalog.pg_tablespace ts ON ts.oid = child.reltablespace
+WHERE parent.relname = '%s' AND n.nspname = '%s'
+ORDER BY child.relname"""
 
     _VERSION_SQL = """
 SELECT version()
 """
 
+    # access method and predicate are taken from pg_get_indexdef
+    _INDEX_DEFINITION = re.compile(r' USING (\w+) .*?(?: WHERE (.*))?$', re.S)
+
     _BEFORE_BIT = 2
     _INSERT_BIT, _DELETE_BIT, _UPDATE_BIT = 4, 8, 16
     
-    def __init__(self, *db_params):
+    # schema objects, that are loaded per schema: attribute name of the
+    # database, query enumerating them and method preparing them from a row
+    _SCHEMA_OBJECTS = (('tables', '_TABLE_NAMES_SQL', 'prepare_table'),
+                       ('views', '_VIEW_NAMES_SQL', 'prepare_view'),
+                       ('indices', '_INDEX_NAMES_SQL', 'prepare_index'),
+                       ('triggers', '_TRIGGER_NAMES_SQL', 'prepare_trigger'),
+                       ('procedures', '_PROCEDURE_NAMES_SQL',
+                        'prepare_procedure'))
+
+    def __init__(self, *db_params, api=None):
         DatabaseInspector.__init__(self, *db_params)
-        import psycopg2
-        self._api = psycopg2
+        if api is None:
+            import psycopg2 as api
+        self._api = api
+        # inspector of the database itself uses public schema and plain
+        # names; inspectors of particular schemas qualify object keys
+        self.schema = 'public'
+        self._qualified = False
+        # type names by oid, shared with inspectors of schemas
+        self._types = {}
         self.set_version()
 
     def set_version(self):
@@ -329,43 +1062,116 @@ SELECT version()
             print('Warning: failed to obtain MySQL version; assuming 8.4.0')
             version = (8, 4, 0)
                              
+    def for_schema(self, schema):
+        '''Return inspector working on given schema, sharing connection
+        parameters with this one.'''
+        inspector = copy(self)
+        inspector.schema = schema
+        inspector._qualified = True
+        return inspector
+
+    def get_schemas(self):
+        '''Return all schemas in the database; their objects are not loaded
+        until they are accessed or build_schemas is called.'''
+        return dict((row[0], Schema(row[0], inspector=self.for_schema(row[0])))
+                    for row in self._select(self._SCHEMA_NAMES_SQL))
+
+    def build_schemas(self, schemas):
+        '''Load objects of all given schemas using one query per object
+        type.'''
+        schemas = list(schemas)
+        if not schemas:
+            return
+        for name, sql, prepare in self._SCHEMA_OBJECTS:
+            rows = self._select_in_schemas(getattr(self, sql),
+                                           [schema.name for schema in schemas])
+            for schema in schemas:
+                objects = schema.inspector._prepare_schema_objects(
+                    prepare, rows[schema.name])
+                for obj in objects.values():
+                    obj.database = schema
+                setattr(schema, '_' + name, objects)
+
+    def get_tables(self):
+        return self._get_schema_objects('_TABLE_NAMES_SQL', 'prepare_table')
+
+    def get_views(self):
+        return self._get_schema_objects('_VIEW_NAMES_SQL', 'prepare_view')
+
+    def get_indices(self):
+        return self._get_schema_objects('_INDEX_NAMES_SQL', 'prepare_index')
+
+    def get_triggers(self):
+        '''Returns names of all triggers in the database.'''
+        return self._get_schema_objects('_TRIGGER_NAMES_SQL',
+                                        'prepare_trigger')
+
+    def get_procedures(self):
+        return self._get_schema_objects('_PROCEDURE_NAMES_SQL',
+                                        'prepare_procedure')
+
+    def get_index_columns(self, index):
+        sql = self._INDEX_COLUMNS_SQL % (index.base_name, self.schema)
+        return tuple(row[0] for row in self._select(sql))
+
+    def build_columns(self, schema_object):
+        sql = self._COLUMN_NAMES_SQL % (schema_object.name, self.schema)
+        schema_object.columns = dict((row[0], self.prepare_column(row))
+                                     for row in self._select(sql))
+
     def build_procedure(self, procedure):
         arg_type_oids = procedure._private['arg_type_oids']
         name = procedure.name.split('(')[0]
-        sql = self._PROCEDURE_ARGUMENTS_SQL % (name, arg_type_oids)
+        sql = self._PROCEDURE_ARGUMENTS_SQL % (name, arg_type_oids,
+                                               self.schema)
         result = self._select(sql)[0]
-        names, oids = result[0], result[1].split(' ')
-        if oids != ['']:
-            types = self.types_from_oids(oids)
-            procedure.arguments = dict((name, Argument(name, type)) 
-                                       for name, type in zip(result[0], types))
-        else:
-            procedure.arguments = {}
+        procedure.arguments = self._prepare_arguments(result[0], result[1])
+
+    def build_all_arguments(self, procedures):
+        '''Load arguments of all given procedures with one query.'''
+        sql = self._bulk_sql(self._ALL_PROCEDURE_ARGUMENTS_SQL)
+        # procedures are told apart by name and types of arguments
+        names = dict(((row[0], row[1]), row[2]) for row in self._select(sql))
+        for procedure in procedures:
+            oids = procedure._private['arg_type_oids']
+            procedure.arguments = self._prepare_arguments(
+                names.get((procedure.name.split('(')[0], oids)), oids)
+
+    def _prepare_arguments(self, names, oids):
+        oids = oids.split(' ')
+        if oids == ['']:
+            return {}
+        types = self.types_from_oids(oids)
+        return dict((name, Argument(name, type)) 
+                    for name, type in zip(names or (), types))
 
     def build_foreign_keys(self, table):
-        sql = self._FOREIGN_KEYS_SQL % table.name
-        rows = self._select(sql)
+        # column names are resolved by the query itself, in constraint order
+        sql = self._FOREIGN_KEYS_SQL % (table.name, self.schema)
         foreign_keys = []
-        for row in rows:
+        for row in self._select(sql):
             fk = ForeignKey()
             fk.referenced_table = row[0]
-            fk.columns = self.get_table_columns(table.name, row[1])
-            fk.referenced_columns = self.get_table_columns(row[0], row[2])
+            fk.columns = list(row[1])
+            fk.referenced_columns = list(row[2])
             foreign_keys.append(fk)
         table.foreign_keys = foreign_keys
-
-    def get_triggers(self):
-        '''Returns names of all triggers in the database.'''
-        triggers = {}
-        for row in self._select(self._TRIGGER_NAMES_SQL):
-            name = '%s(%s)' % (row[0], row[1])
-            trigger = Trigger(row[0], inspector=self)
-            trigger.table = row[1]
-            self._build_trigger_event(trigger, row[3])
-            self._build_trigger_when(trigger, row[3])
-            triggers[name] = trigger
-        return triggers
         
+    def _table_bundle_sql(self, table):
+        parameters = {'table': table.name, 'schema': self.schema}
+        parameters['columns'] = self._TABLE_BUNDLE_COLUMNS_SQL % parameters
+        return self._TABLE_BUNDLE_SQL % parameters
+
+    def _bundle_table(self, name, row):
+        if row[1]:
+            return PartitionedTable(name, inspector=self)
+        return Table(name, inspector=self)
+
+    def build_partitions(self, table):
+        sql = self._PARTITIONS_SQL % (table.name, self.schema)
+        table.partitions = dict((row[0], self.prepare_partition(table, row))
+                                for row in self._select(sql))
+
     def _build_trigger_event(self, trigger, bitmask):
         if bitmask & self._INSERT_BIT:
             trigger.event = Trigger.INSERT
@@ -382,6 +1188,25 @@ SELECT version()
             trigger.when = Trigger.BEFORE
         else:
             trigger.when = Trigger.AFTER
+
+    def prepare_table(self, row):
+        if row[1]:
+            return row[0], PartitionedTable(row[0], inspector=self)
+        return row[0], Table(row[0], inspector=self)
+
+    def prepare_partition(self, table, row):
+        partition = Partition(row[0], table, bound=row[1], tablespace=row[2])
+        partition.is_partitioned = row[3]
+        return partition
+
+    def prepare_trigger(self, row):
+        # postgres identifies a trigger by a pair <trigger_name>, <table>
+        name = '%s(%s)' % (row[0], row[1])
+        trigger = Trigger(row[0], inspector=self)
+        trigger.table = row[1]
+        self._build_trigger_event(trigger, row[3])
+        self._build_trigger_when(trigger, row[3])
+        return name, trigger
             
     def prepare_column(self, row):
         # because PostgreSQL keeps varchar type as character varying, we need
@@ -417,15 +1242,136 @@ SELECT version()
         name = '%s: %s' % (row[1], row[0])
         index = Index(name, row[1], base_name=row[0], inspector=self)
         index.is_unique = row[2]
+        index.is_primary = row[4]
+        match = self._INDEX_DEFINITION.search(row[3] or '')
+        if match is not None:
+            index.method, index.predicate = match.groups()
         return name, index        
         
     def types_from_oids(self, oids):
-        return [self._select(self._TYPE_SQL % oid)[0][0] for oid in oids]
-    
-    def get_table_columns(self, table, positions):
-        positions = ', '.join([str(position) for position in positions])
-        sql = self._COLUMNS_FROM_POSITIONS_SQL % (table, positions)
-        return [row[0] for row in self._select(sql)]
+        # names of all unknown types are fetched with one query and cached
+        oids = [str(oid) for oid in oids]
+        unknown = sorted(set(oid for oid in oids if oid not in self._types))
+        if unknown:
+            sql = self._TYPES_SQL % ', '.join(unknown)
+            self._types.update((str(row[0]), row[1])
+                               for row in self._select(sql))
+        return [self._types[oid] for oid in oids]
+
+    def _bulk_sql(self, sql):
+        return self._format(sql, schema=self.schema)
+
+    def _cursor(self, connection, stream):
+        if stream:
+            # named cursor keeps the result on the server, fetchmany gets
+            # it in batches
+            return connection.cursor('fathom_stream')
+        return connection.cursor()
+
+    def _set_timeout(self, connection, seconds):
+        milliseconds = max(1, int(seconds * 1000))
+        connection.cursor().execute(
+            'SET statement_timeout = %d; SET lock_timeout = %d' % 
+            (milliseconds, milliseconds))
+
+    def _timed_out(self, error):
+        # query_canceled and lock_not_available
+        return getattr(error, 'pgcode', None) in ('57014', '55P03')
+
+    def _get_schema_objects(self, sql, prepare):
+        rows = self._select_in_schemas(getattr(self, sql), [self.schema])
+        return self._prepare_schema_objects(prepare, rows[self.schema])
+
+    def _select_in_schemas(self, sql, schemas):
+        '''Run query enumerating objects for given schemas and return its rows
+        grouped by schema name.'''
+        rows = dict((schema, []) for schema in schemas)
+        names = ', '.join("'%s'" % schema for schema in schemas)
+        for row in self._select(self._format(sql, schemas=names)):
+            rows[row[-1]].append(row)
+        return rows
+
+    def _prepare_schema_objects(self, prepare, rows):
+        if prepare == 'prepare_procedure':
+            # types of arguments and results of all procedures are resolved
+            # at once rather than procedure by procedure
+            self.types_from_oids([oid for row in rows
+                                  for oid in (row[1].split() + [row[3]])
+                                  if oid])
+        objects = {}
+        for row in rows:
+            name, obj = getattr(self, prepare)(row)
+            if self._qualified:
+                name = '%s.%s' % (self.schema, name)
+            objects[name] = obj
+        return objects
+
+
+class PostgresCatalogInspector(PostgresInspector):
+
+    '''PostgreSQL inspector reading pg_catalog directly instead of going
+    through information_schema views, which are slow on large catalogs because
+    of privilege checks and joins. Types are taken from format_type(), so
+    arrays and user defined types are reported by their real names rather than
+    'ARRAY' and 'USER-DEFINED'.'''
+
+    _TABLE_NAMES_SQL = """
+SELECT c.relname, c.relkind = 'p', n.nspname
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname IN (%(schemas)s) AND c.relkind IN ('r', 'p') AND
+      %(filter c.relname)s AND
+      """ + PostgresInspector._NOT_PARTITION_SQL % 'c.oid'
+
+    _COLUMN_NAMES_SQL = """
+SELECT a.attname, pg_catalog.format_type(a.atttypid, NULL),
+       CASE WHEN a.atttypid IN (1042, 1043) AND a.atttypmod > 0
+            THEN a.atttypmod - 4 END,
+       CASE WHEN a.attnotnull THEN 'NO' ELSE 'YES' END,
+       pg_catalog.pg_get_expr(d.adbin, d.adrelid)
+FROM pg_catalog.pg_attribute a
+JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_catalog.pg_attrdef d ON d.adrelid = a.attrelid AND 
+                                     d.adnum = a.attnum
+WHERE c.relname = '%s' AND n.nspname = '%s' AND a.attnum > 0 AND
+      NOT a.attisdropped
+ORDER BY a.attnum"""
+
+    _ALL_COLUMNS_SQL = """
+SELECT c.relname, a.attname, pg_catalog.format_type(a.atttypid, NULL),
+       CASE WHEN a.atttypid IN (1042, 1043) AND a.atttypmod > 0
+            THEN a.atttypmod - 4 END,
+       CASE WHEN a.attnotnull THEN 'NO' ELSE 'YES' END,
+       pg_catalog.pg_get_expr(d.adbin, d.adrelid)
+FROM pg_catalog.pg_attribute a
+JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_catalog.pg_attrdef d ON d.adrelid = a.attrelid AND
+                                     d.adnum = a.attnum
+WHERE n.nspname = '%(schema)s' AND c.relkind IN ('r', 'p', 'v', 'm', 'f') AND 
+      a.attnum > 0 AND NOT a.attisdropped AND %(filter c.relname)s AND
+      """ + PostgresInspector._NOT_PARTITION_SQL % 'c.oid' + """
+ORDER BY c.relname, a.attnum"""
+
+    _TABLE_BUNDLE_COLUMNS_SQL = """
+SELECT 'column', NULL, 
+       a.attname::text, pg_catalog.format_type(a.atttypid, NULL),
+       CASE WHEN a.atttypid IN (1042, 1043) AND a.atttypmod > 0
+            THEN a.atttypmod - 4 END,
+       CASE WHEN a.attnotnull THEN 'NO' ELSE 'YES' END,
+       pg_catalog.pg_get_expr(d.adbin, d.adrelid),
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL
+FROM pg_catalog.pg_attribute a
+JOIN pg_catalog.pg_class c ON c.oid = a.attrelid
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+LEFT JOIN pg_catalog.pg_attrdef d ON d.adrelid = a.attrelid AND
+                                     d.adnum = a.attnum
+WHERE c.relname = '%(table)s' AND n.nspname = '%(schema)s' AND 
+      a.attnum > 0 AND NOT a.attisdropped"""
 
 
 class MySqlInspector(DatabaseInspector):
@@ -438,12 +1384,13 @@ class MySqlInspector(DatabaseInspector):
     _TABLE_NAMES_SQL = """
 SELECT TABLE_NAME
 FROM information_schema.tables
-WHERE TABLE_TYPE = 'BASE TABLE';
+WHERE TABLE_TYPE = 'BASE TABLE' AND %(filter TABLE_NAME)s;
 """
 
     _VIEW_NAMES_SQL = """
-SELECT TABLE_NAME 
-FROM information_schema.views"""
+SELECT TABLE_NAME, VIEW_DEFINITION
+FROM information_schema.views
+WHERE %(filter TABLE_NAME)s"""
 
     _PROCEDURE_NAMES_SQL = """
 SELECT routine_name, dtd_identifier, routine_definition
@@ -454,11 +1401,19 @@ FROM information_schema.routines
 SELECT parameter_name, data_type, character_maximum_length, parameter_mode
 FROM information_schema.parameters
 WHERE specific_name = '%s' AND parameter_name IS NOT NULL
+"""
+
+    _ALL_PROCEDURE_ARGUMENTS_SQL = """
+SELECT specific_name, parameter_name, data_type
+FROM information_schema.parameters
+WHERE parameter_name IS NOT NULL
+ORDER BY specific_name, ordinal_position
 """
 
     _TRIGGER_NAMES_SQL = """
 SELECT trigger_name, event_object_table, event_manipulation, action_timing
 FROM information_schema.triggers
+WHERE %(filter event_object_table)s
 """
 
     _COLUMN_NAMES_SQL = """
@@ -471,7 +1426,7 @@ WHERE table_name = '%s' AND table_schema = '%s'
     _INDEX_NAMES_SQL = """
 SELECT index_name, table_name, non_unique
 FROM information_schema.statistics
-WHERE table_schema = '%s'
+WHERE table_schema = '%(schema)s' AND %(filter table_name)s
 """
 
     _INDEX_COLUMNS_SQL = """
@@ -489,21 +1444,164 @@ SELECT constraint_name, column_name, referenced_table_name,
        referenced_column_name
 FROM information_schema.key_column_usage
 WHERE table_name = '%s'
+"""
+
+    _ALL_COLUMNS_SQL = """
+SELECT table_name, column_name, data_type, character_maximum_length, 
+       is_nullable, column_default
+FROM information_schema.columns
+WHERE table_schema = '%(schema)s' AND %(filter table_name)s
+ORDER BY table_name, ordinal_position
+"""
+
+    _ALL_FOREIGN_KEYS_SQL = """
+SELECT table_name, constraint_name, referenced_table_name, column_name,
+       referenced_column_name
+FROM information_schema.key_column_usage
+WHERE table_schema = '%(schema)s' AND referenced_table_name IS NOT NULL AND
+      %(filter table_name)s
+ORDER BY table_name, constraint_name, ordinal_position
+"""
+
+    _ALL_INDEX_COLUMNS_SQL = """
+SELECT table_name, index_name, column_name
+FROM information_schema.statistics
+WHERE table_schema = '%(schema)s' AND %(filter table_name)s
+ORDER BY table_name, index_name, seq_in_index
+"""
+
+    # update_time of tables tracks changes of data rather than definitions
+    # and create_time is kept by in place alterations, so markers are made 
+    # of the definitions themselves
+    _CHANGE_MARKERS_SQL = """
+SELECT CASE table_type WHEN 'VIEW' THEN 'view' ELSE 'table' END AS kind,
+       table_name AS name, table_name AS owner, 
+       CAST(create_time AS CHAR) AS marker
+FROM information_schema.tables
+WHERE table_schema = '%(schema)s' AND %(filter table_name)s
+UNION ALL
+SELECT 'column', column_name, table_name, 
+       CONCAT_WS(':', ordinal_position, column_type, is_nullable, 
+                 column_default)
+FROM information_schema.columns
+WHERE table_schema = '%(schema)s' AND %(filter table_name)s
+UNION ALL
+SELECT 'index', index_name, table_name, 
+       CONCAT_WS(':', seq_in_index, column_name, non_unique)
+FROM information_schema.statistics
+WHERE table_schema = '%(schema)s' AND %(filter table_name)s
+UNION ALL
+SELECT 'trigger', trigger_name, event_object_table, 
+       CONCAT_WS(':', action_timing, event_manipulation, created)
+FROM information_schema.triggers
+WHERE trigger_schema = '%(schema)s' AND %(filter event_object_table)s
+UNION ALL
+SELECT 'constraint', constraint_name, table_name, 
+       CONCAT_WS(':', ordinal_position, column_name, referenced_table_name,
+                 referenced_column_name)
+FROM information_schema.key_column_usage
+WHERE table_schema = '%(schema)s' AND referenced_table_name IS NOT NULL AND
+      %(filter table_name)s
+"""
+
+    # digest of all markers, that does not depend on their order; no
+    # bounded query over tables can replace it, since in place alterations
+    # change none of their columns, so the version reads all markers and
+    # costs about as much as get_change_markers, it only saves sending them
+    _SCHEMA_VERSION_SQL = """
+SELECT COUNT(*), 
+       BIT_XOR(CRC32(CONCAT_WS(':', kind, name, owner, marker)))
+FROM (%s) markers""" % _CHANGE_MARKERS_SQL
+
+    _TABLE_BUNDLE_SQL = """
+SELECT 'table', table_name, 
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL
+FROM information_schema.tables
+WHERE table_name = '%(table)s' AND table_schema = '%(schema)s' AND 
+      table_type = 'BASE TABLE'
+UNION ALL
+SELECT 'column', NULL,
+       column_name, data_type, character_maximum_length, is_nullable,
+       column_default,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL
+FROM information_schema.columns
+WHERE table_name = '%(table)s' AND table_schema = '%(schema)s'
+UNION ALL
+SELECT DISTINCT 'index', NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       index_name, table_name, non_unique,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL
+FROM information_schema.statistics
+WHERE table_name = '%(table)s' AND table_schema = '%(schema)s'
+UNION ALL
+SELECT 'index_column', NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       index_name, column_name, seq_in_index,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL
+FROM information_schema.statistics
+WHERE table_name = '%(table)s' AND table_schema = '%(schema)s'
+UNION ALL
+SELECT 'foreign_key', NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       constraint_name, referenced_table_name, column_name, 
+       referenced_column_name, ordinal_position,
+       NULL, NULL, NULL, NULL
+FROM information_schema.key_column_usage
+WHERE table_name = '%(table)s' AND table_schema = '%(schema)s' AND 
+      referenced_table_name IS NOT NULL
+UNION ALL
+SELECT 'trigger', NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       trigger_name, event_object_table, event_manipulation, action_timing
+FROM information_schema.triggers
+WHERE event_object_table = '%(table)s' AND 
+      event_object_schema = '%(schema)s'
+"""
+
+    _TABLE_BUNDLE_LAYOUT = {'table': (1, 2), 'column': (2, 7), 
+                            'index': (7, 10), 'index_column': (10, 13),
+                            'foreign_key': (13, 18), 'trigger': (18, 22)}
+
+    _STATS_SQL = """
+SELECT 'table', table_name, table_name, table_rows, NULL, 
+       data_length + index_length, index_length, NULL
+FROM information_schema.tables
+WHERE table_schema = '%(schema)s' AND table_type = 'BASE TABLE' AND
+      %(filter table_name)s
 """
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, api=None, **kwargs):
         DatabaseInspector.__init__(self, *args, **kwargs)
         self._db_name = kwargs['db']
-        try:
-            import MySQLdb
-            self._api = MySQLdb
-        except ImportError:
+        if api is not None:
+            self._api = api
+        else:
             try:
-                import pymysql
-                self._api = pymysql
+                import MySQLdb
+                self._api = MySQLdb
             except ImportError:
-                raise FathomError('Either MySQLdb or pymsql package is '
-                                  'required to access MySQL database.')
+                try:
+                    import pymysql
+                    self._api = pymysql
+                except ImportError:
+                    raise FathomError('Either MySQLdb or pymsql package is '
+                                      'required to access MySQL database.')
         self.set_version()
         
     def set_version(self):
@@ -516,7 +1614,7 @@ WHERE table_name = '%s'
 
     def get_indices(self):
         '''Return names of all indices in the database.'''
-        sql = self._INDEX_NAMES_SQL % self._db_name
+        sql = self._format(self._INDEX_NAMES_SQL, schema=self._db_name)
         return dict(self.prepare_index(row)
                     for row in self._select(sql))
 
@@ -550,26 +1648,39 @@ WHERE table_name = '%s'
         name = '%s: %s' % (row[1], row[0])
         index = Index(name, row[1], base_name=row[0], inspector=self)
         index.is_unique = not row[2]
+        index.is_primary = (row[0] == 'PRIMARY')
         return name, index
         
     def get_triggers(self):
         '''Returns names of all triggers in the database.'''
-        triggers = {}
-        for row in self._select(self._TRIGGER_NAMES_SQL):
-            trigger = Trigger(row[0], inspector=self)
-            trigger.when = TRIGGER_WHEN_NAMES[row[3].upper()]
-            trigger.event = TRIGGER_EVENT_NAMES[row[2].upper()]
-            trigger.table = row[1]
-            triggers[row[0]] = trigger
-        return triggers
+        sql = self._format(self._TRIGGER_NAMES_SQL)
+        return dict(self.prepare_trigger(row) for row in self._select(sql))
+
+    def prepare_trigger(self, row):
+        trigger = Trigger(row[0], inspector=self)
+        trigger.when = TRIGGER_WHEN_NAMES[row[3].upper()]
+        trigger.event = TRIGGER_EVENT_NAMES[row[2].upper()]
+        trigger.table = row[1]
+        return row[0], trigger
         
     def build_procedure(self, procedure):
-        procedure.arguments = {}
+        arguments = {}
         if self.supports_routine_parametres():
             # needs mysql 5.5 for this
             sql = self._PROCEDURE_ARGUMENTS_SQL % procedure.name
             for row in self._select(sql):
-                procedure.arguments[row[0]] = Argument(row[0], row[1])
+                arguments[row[0]] = Argument(row[0], row[1])
+        procedure.arguments = arguments
+
+    def build_all_arguments(self, procedures):
+        '''Load arguments of all given procedures with one query.'''
+        rows = {}
+        if self.supports_routine_parametres():
+            rows = self._select_grouped(self._ALL_PROCEDURE_ARGUMENTS_SQL)
+        for procedure in procedures:
+            procedure.arguments = dict(
+                (row[0], Argument(row[0], row[1])) 
+                for row in rows.get(self.case(procedure.name), ()))
 
     def build_foreign_keys(self, table):
         sql = self._FOREIGN_KEYS_SQL % table.name
@@ -594,6 +1705,34 @@ WHERE table_name = '%s'
     def supports_routine_parametres(self):
         return self.version >= (5, 5)
 
+    def _bulk_sql(self, sql):
+        return self._format(sql, schema=self._db_name)
+
+    def _cursor(self, connection, stream):
+        cursors = getattr(self._api, 'cursors', None)
+        if stream and cursors is not None:
+            # unbuffered cursor reads rows from the connection as they are
+            # fetched instead of storing the whole result on the client
+            return connection.cursor(cursors.SSCursor)
+        return connection.cursor()
+
+    def _set_timeout(self, connection, seconds):
+        # max_execution_time applies to selects only, which is all that
+        # inspection runs; lock_wait_timeout is set in whole seconds
+        connection.cursor().execute(
+            'SET SESSION max_execution_time = %d, '
+            'SESSION lock_wait_timeout = %d' % 
+            (max(1, int(seconds * 1000)), max(1, ceil(seconds))))
+
+    def _timed_out(self, error):
+        # lock wait timeout and maximum statement execution time exceeded
+        args = getattr(error, 'args', ())
+        return bool(args) and args[0] in (1205, 3024)
+
+    def _table_bundle_sql(self, table):
+        return self._TABLE_BUNDLE_SQL % {'table': table.name, 
+                                         'schema': self._db_name}
+
 
 class OracleInspector(DatabaseInspector):
 
@@ -603,19 +1742,20 @@ class OracleInspector(DatabaseInspector):
     _TABLE_NAMES_SQL = """
 SELECT object_name
 FROM user_objects 
-WHERE object_type = 'TABLE' AND object_name NOT LIKE 'BIN%'
+WHERE object_type = 'TABLE' AND object_name NOT LIKE 'BIN%%' AND
+      %(filter object_name)s
 """
     
     _VIEW_NAMES_SQL = """
-SELECT object_name
-FROM user_objects
-WHERE object_type = 'VIEW'
+SELECT view_name, text
+FROM user_views
+WHERE %(filter view_name)s
 """
 
     _TRIGGER_NAMES_SQL = """
-SELECT object_name
-FROM user_objects
-WHERE object_type = 'TRIGGER'
+SELECT trigger_name
+FROM user_triggers
+WHERE %(filter table_name)s
 """
 
     _PROCEDURE_NAMES_SQL = """
@@ -636,6 +1776,13 @@ WHERE objects.object_type = 'FUNCTION' AND
 SELECT argument_name, data_type
 FROM user_arguments
 WHERE argument_name IS NOT NULL AND object_name = upper('%s')
+"""
+
+    _ALL_ARGUMENTS_SQL = """
+SELECT object_name, argument_name, data_type
+FROM user_arguments
+WHERE argument_name IS NOT NULL
+ORDER BY object_name, position
 """
     
     _COLUMN_NAMES_SQL = """
@@ -646,8 +1793,12 @@ WHERE table_name = '%s'
 """
    
     _INDEX_NAMES_SQL = """
-SELECT index_name, table_name, uniqueness
-FROM user_indexes
+SELECT index_name, table_name, uniqueness,
+       (SELECT COUNT(*) 
+        FROM user_constraints c 
+        WHERE c.index_name = i.index_name AND c.constraint_type = 'P')
+FROM user_indexes i
+WHERE %(filter table_name)s
 """
 
     _INDEX_COLUMNS_SQL = """
@@ -662,25 +1813,184 @@ FROM user_triggers
 WHERE trigger_name = upper('%s')
 """
     
-    _FOREIGN_KEY_NAMES_SQL = """
-SELECT first.constraint_name, first.r_constraint_name, second.table_name
-FROM user_constraints first, user_constraints second
-WHERE first.constraint_type = 'R' AND 
-      first.r_constraint_name = second.constraint_name AND
-      first.table_name = upper('%s')
+    # data_default is a LONG column, that cannot be used in a union, so its
+    # varchar version is used; it requires Oracle 12.2
+    _TABLE_BUNDLE_SQL = """
+SELECT 'table', table_name, 
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL
+FROM user_tables
+WHERE table_name = '%(table)s'
+UNION ALL
+SELECT 'column', NULL,
+       column_name, data_type, data_length, data_default_vc, upper(nullable),
+       NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL
+FROM user_tab_columns
+WHERE table_name = '%(table)s'
+UNION ALL
+SELECT 'index', NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       i.index_name, i.table_name, i.uniqueness,
+       (SELECT COUNT(*) 
+        FROM user_constraints c 
+        WHERE c.index_name = i.index_name AND c.constraint_type = 'P'),
+       NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL
+FROM user_indexes i
+WHERE i.table_name = '%(table)s'
+UNION ALL
+SELECT 'index_column', NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL,
+       index_name, column_name, column_position,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL
+FROM user_ind_columns
+WHERE table_name = '%(table)s'
+UNION ALL
+SELECT 'foreign_key', NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       fk.constraint_name, ref.table_name, fk_column.column_name, 
+       ref_column.column_name, fk_column.position,
+       NULL, NULL, NULL, NULL
+FROM user_constraints fk
+JOIN user_constraints ref ON ref.constraint_name = fk.r_constraint_name
+JOIN user_cons_columns fk_column 
+     ON fk_column.constraint_name = fk.constraint_name
+JOIN user_cons_columns ref_column 
+     ON ref_column.constraint_name = ref.constraint_name AND
+        ref_column.position = fk_column.position
+WHERE fk.constraint_type = 'R' AND fk.table_name = '%(table)s'
+UNION ALL
+SELECT 'trigger', NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL,
+       NULL, NULL, NULL,
+       NULL, NULL, NULL, NULL, NULL,
+       trigger_name, table_name, trigger_type, triggering_event
+FROM user_triggers
+WHERE table_name = '%(table)s'
+"""
+
+    _TABLE_BUNDLE_LAYOUT = {'table': (1, 2), 'column': (2, 7), 
+                            'index': (7, 11), 'index_column': (11, 14),
+                            'foreign_key': (14, 19), 'trigger': (19, 23)}
+
+    # last_ddl_time changes with every alteration of the object, including 
+    # added columns and constraints of tables
+    _CHANGE_MARKERS_SQL = """
+SELECT lower(object_type) AS kind, object_name AS name, 
+       object_name AS owner, 
+       TO_CHAR(last_ddl_time, 'YYYY-MM-DD HH24:MI:SS') AS marker
+FROM user_objects
+WHERE object_type IN ('TABLE', 'VIEW') AND %(filter object_name)s
+UNION ALL
+SELECT 'index', i.index_name, i.table_name, 
+       TO_CHAR(o.last_ddl_time, 'YYYY-MM-DD HH24:MI:SS')
+FROM user_indexes i
+JOIN user_objects o ON o.object_name = i.index_name AND 
+                       o.object_type = 'INDEX'
+WHERE %(filter i.table_name)s
+UNION ALL
+SELECT 'trigger', t.trigger_name, t.table_name, 
+       TO_CHAR(o.last_ddl_time, 'YYYY-MM-DD HH24:MI:SS')
+FROM user_triggers t
+JOIN user_objects o ON o.object_name = t.trigger_name AND 
+                       o.object_type = 'TRIGGER'
+WHERE %(filter t.table_name)s
+"""
+
+    # digest of all markers, that does not depend on their order
+    _SCHEMA_VERSION_SQL = """
+SELECT COUNT(*), SUM(ORA_HASH(kind || ':' || name || ':' || owner || ':' || 
+                              marker))
+FROM (%s) markers""" % _CHANGE_MARKERS_SQL
+
+    _ALL_TRIGGERS_INFO_SQL = """
+SELECT trigger_name, table_name, trigger_type, triggering_event
+FROM user_triggers
 """
     
-    _FOREIGN_KEY_SQL = """
-SELECT column_name
-FROM all_cons_columns
-WHERE constraint_name = upper('%s')
-ORDER BY position
+    _FOREIGN_KEYS_SQL = """
+SELECT fk.constraint_name, ref.table_name, fk_column.column_name, 
+       ref_column.column_name
+FROM user_constraints fk
+JOIN user_constraints ref ON ref.constraint_name = fk.r_constraint_name
+JOIN user_cons_columns fk_column 
+     ON fk_column.constraint_name = fk.constraint_name
+JOIN user_cons_columns ref_column 
+     ON ref_column.constraint_name = ref.constraint_name AND
+        ref_column.position = fk_column.position
+WHERE fk.constraint_type = 'R' AND fk.table_name = upper('%s')
+ORDER BY fk.constraint_name, fk_column.position
 """
 
-    def __init__(self, *args, **kwargs):
+    _ALL_COLUMNS_SQL = """
+SELECT table_name, column_name, data_type, data_length, data_default, 
+       upper(nullable)
+FROM user_tab_columns
+WHERE %(filter table_name)s
+ORDER BY table_name, column_id
+"""
+
+    _ALL_FOREIGN_KEYS_SQL = """
+SELECT fk.table_name, fk.constraint_name, ref.table_name, 
+       fk_column.column_name, ref_column.column_name
+FROM user_constraints fk
+JOIN user_constraints ref ON ref.constraint_name = fk.r_constraint_name
+JOIN user_cons_columns fk_column 
+     ON fk_column.constraint_name = fk.constraint_name
+JOIN user_cons_columns ref_column 
+     ON ref_column.constraint_name = ref.constraint_name AND
+        ref_column.position = fk_column.position
+WHERE fk.constraint_type = 'R' AND %(filter fk.table_name)s
+ORDER BY fk.table_name, fk.constraint_name, fk_column.position
+"""
+
+    _ALL_INDEX_COLUMNS_SQL = """
+SELECT table_name, index_name, column_name
+FROM user_ind_columns
+WHERE %(filter table_name)s
+ORDER BY index_name, column_position
+"""
+
+    _STATS_SQL = """
+SELECT 'table', t.table_name, t.table_name, t.num_rows, t.blocks, s.bytes,
+       NULL, NULL
+FROM user_tables t
+LEFT JOIN user_segments s ON s.segment_name = t.table_name AND 
+                             s.segment_type = 'TABLE'
+WHERE %(filter t.table_name)s
+UNION ALL
+SELECT 'index', i.table_name, i.index_name, i.num_rows, i.leaf_blocks, 
+       s.bytes, NULL, NULL
+FROM user_indexes i
+LEFT JOIN user_segments s ON s.segment_name = i.index_name AND 
+                             s.segment_type = 'INDEX'
+WHERE %(filter i.table_name)s
+"""
+
+    def __init__(self, *args, api=None, **kwargs):
         DatabaseInspector.__init__(self, *args, **kwargs)
-        import cx_Oracle
-        self._api = cx_Oracle
+        if api is None:
+            import cx_Oracle as api
+        self._api = api
+
+    def _set_timeout(self, connection, seconds):
+        # round trips of the connection are cancelled after call_timeout
+        connection.call_timeout = max(1, int(seconds * 1000))
+
+    def _timed_out(self, error):
+        return 'DPI-1067' in str(error) or 'ORA-03156' in str(error)
         
     def prepare_column(self, row):
         if row[1].startswith('VARCHAR'):
@@ -708,36 +2018,45 @@ ORDER BY position
         sql = self._ARGUMENTS_SQL % procedure.name
         procedure.arguments = {row[0]: Argument(row[0], row[1]) 
                                for row in self._select(sql)}
+
+    def build_all_arguments(self, procedures):
+        '''Load arguments of all given procedures with one query.'''
+        rows = self._select_grouped(self._ALL_ARGUMENTS_SQL)
+        for procedure in procedures:
+            procedure.arguments = {
+                row[0]: Argument(row[0], row[1]) 
+                for row in rows.get(procedure.name.upper(), ())}
                                
     def prepare_index(self, row):
         name = '%s: %s' % (row[1], row[0])
         index = Index(name, row[1], base_name=row[0], inspector=self)
         index.is_unique = (row[2] == 'UNIQUE')
+        index.is_primary = bool(row[3])
         return name, index                               
                 
-    def build_foreign_keys(self, table):
-        table.foreign_keys = []
-        
     def build_trigger(self, trigger):
         sql = self._TRIGGER_INFO_SQL % trigger.name
-        row = self._select(sql)[0]
-        trigger.table = row[0]
+        self._prepare_trigger_info(trigger, self._select(sql)[0])
+
+    def build_all_triggers(self, triggers):
+        rows = dict((row[0], row[1:]) 
+                    for row in self._select(self._ALL_TRIGGERS_INFO_SQL))
+        for trigger in triggers:
+            self._prepare_trigger_info(trigger, rows[trigger.name])
+
+    def prepare_trigger(self, row):
+        trigger = Trigger(row[0], inspector=self)
+        self._prepare_trigger_info(trigger, row[1:])
+        return row[0], trigger
+
+    def _prepare_trigger_info(self, trigger, row):
         # should return something like BEFORE EACH ROW, we need first word
         when = row[1].split(' ')[0]
         trigger.when = TRIGGER_WHEN_NAMES[when]
         trigger.event = TRIGGER_EVENT_NAMES[row[2]]
+        # table is set last, because it marks the trigger as loaded
+        trigger.table = row[0]
 
     def build_foreign_keys(self, table):
-        sql = self._FOREIGN_KEY_NAMES_SQL % table.name
-        rows = self._select(sql)
-        foreign_keys = {}
-        for row in rows:
-            fk = foreign_keys.setdefault(row[0], ForeignKey())
-            sql = self._FOREIGN_KEY_SQL % row[0]
-            for column_row in self._select(sql):
-                fk.columns.append(column_row[0])
-            sql = self._FOREIGN_KEY_SQL % row[1]
-            for column_row in self._select(sql):
-                fk.referenced_columns.append(column_row[0])
-            fk.referenced_table = row[2]
-        table.foreign_keys = list(foreign_keys.values())
+        sql = self._FOREIGN_KEYS_SQL % table.name
+        table.foreign_keys = self._prepare_foreign_keys(self._select(sql))
@@ -0,0 +1,249 @@
+#!/usr/bin/python3
+
+'''Join paths between tables along foreign keys.
+
+JoinGraph is built once from foreign keys of all tables of a database,
+loaded in one pass, and keeps them as compact adjacency arrays. Tables can
+be joined along a foreign key in both directions, so the graph is
+undirected and the cheapest path is the one with fewest joins:
+
+    graph = JoinGraph(database)
+    graph.path('orders', 'countries')
+    graph.paths('orders', 'countries', k=3)
+
+Paths are cached. distances() computes distances between all pairs of
+tables at once, breadth first from all tables together with sets of tables
+kept as bits of integers.'''
+
+from array import array
+from heapq import heappush, heappop
+from itertools import count
+
+from .errors import FathomError
+
+
+class Join(object):
+
+    '''Join of table with joined table along foreign_key, that belongs to
+    the referencing table, which is one of them.'''
+
+    def __init__(self, table, joined, foreign_key, referencing):
+        self.table = table
+        self.joined = joined
+        self.foreign_key = foreign_key
+        self.referencing = referencing
+
+    def condition(self):
+        '''Return SQL condition of the join.'''
+        fk = self.foreign_key
+        referenced = (self.joined if self.referencing == self.table
+                      else self.table)
+        return ' AND '.join('%s.%s = %s.%s' % (self.referencing, column,
+                                               referenced, referenced_column)
+                            for column, referenced_column
+                            in zip(fk.columns, fk.referenced_columns))
+
+    def __str__(self):
+        return 'JOIN %s ON %s' % (self.joined, self.condition())
+
+    def __repr__(self):
+        return '<Join %s>' % self
+
+
+class JoinGraph(object):
+
+    '''Graph of tables of the database joined by foreign keys; it is not
+    updated when the database changes. Foreign keys referencing tables
+    outside of the database and those of tables referencing themselves are
+    left out.'''
+
+    # distances are kept in bytes, one more than the distance, zero means
+    # the table cannot be reached
+    MAX_DISTANCE = 254
+
+    def __init__(self, database):
+        database.load_foreign_keys()
+        self.database = database
+        self.names = sorted(database.tables)
+        self._numbers = dict((name, number)
+                             for number, name in enumerate(self.names))
+        # every foreign key is an edge, that gives two half edges, one in
+        # each direction
+        self._foreign_keys = []
+        neighbours = [[] for name in self.names]
+        for name in self.names:
+            for fk in database.tables[name].foreign_keys:
+                referenced = self._numbers.get(
+                    database.case(fk.referenced_table))
+                number = self._numbers[name]
+                if referenced is None or referenced == number:
+                    continue
+                edge = len(self._foreign_keys)
+                self._foreign_keys.append((name, fk))
+                neighbours[number].append((referenced, edge))
+                neighbours[referenced].append((number, edge))
+        # half edges of table n are those from offsets[n] to offsets[n + 1],
+        # origins, targets and edges give their tables and foreign keys
+        self._offsets = array('I', [0])
+        self._origins, self._targets = array('I'), array('I')
+        self._edges = array('I')
+        for number, table_neighbours in enumerate(neighbours):
+            for target, edge in table_neighbours:
+                self._origins.append(number)
+                self._targets.append(target)
+                self._edges.append(edge)
+            self._offsets.append(len(self._targets))
+        self._paths = {}
+        self._distances = None
+
+    def path(self, source, target):
+        '''Return list of joins of the shortest path from source table to
+        target table, None when they are not connected.'''
+        paths = self.paths(source, target, 1)
+        return paths[0] if paths else None
+
+    def paths(self, source, target, k=1):
+        '''Return at most k shortest paths without repeated tables from
+        source table to target table, shortest first.'''
+        key = (self._number(source), self._number(target), k)
+        if key not in self._paths:
+            self._paths[key] = [self._joins(key[0], path)
+                                for path in self._shortest(*key)]
+        return self._paths[key]
+
+    def distance(self, source, target):
+        '''Return number of joins of the shortest path between tables, None
+        when they are not connected.'''
+        source, target = self._number(source), self._number(target)
+        if self._distances is not None:
+            distance = self._distances[target][source]
+            if distance:
+                return distance - 1
+            if self._complete:
+                return None
+        path = self._search(source, target)
+        return len(path) if path is not None else None
+
+    def distances(self):
+        '''Compute distances between all pairs of tables, so that distance
+        does not search the graph; return list of rows of distances from
+        every table, ordered as names, with None for unconnected tables.'''
+        if self._distances is None:
+            self._compute_distances()
+        return [[distance - 1 if distance else None for distance in row]
+                for row in self._distances]
+
+    # protected:
+
+    def _number(self, name):
+        number = self._numbers.get(self.database.case(name))
+        if number is None:
+            raise FathomError('Table %s does not exist.' % name)
+        return number
+
+    def _joins(self, source, path):
+        joins = []
+        for half_edge in path:
+            target = self._targets[half_edge]
+            referencing, fk = self._foreign_keys[self._edges[half_edge]]
+            joins.append(Join(self.names[source], self.names[target], fk,
+                              referencing))
+            source = target
+        return joins
+
+    def _search(self, source, target, banned_tables=(), banned_edges=()):
+        # breadth first search returning half edges of the shortest path
+        if source == target:
+            return ()
+        offsets, targets, edges = self._offsets, self._targets, self._edges
+        # half edge, that led to every reached table
+        previous = {source: None}
+        frontier = [source]
+        while frontier:
+            next_frontier = []
+            for table in frontier:
+                for half_edge in range(offsets[table], offsets[table + 1]):
+                    neighbour = targets[half_edge]
+                    if (neighbour in previous or neighbour in banned_tables
+                            or edges[half_edge] in banned_edges):
+                        continue
+                    previous[neighbour] = half_edge
+                    if neighbour == target:
+                        return self._trace(previous, target)
+                    next_frontier.append(neighbour)
+            frontier = next_frontier
+        return None
+
+    def _trace(self, previous, table):
+        path = []
+        while previous[table] is not None:
+            half_edge = previous[table]
+            path.append(half_edge)
+            table = self._origins[half_edge]
+        path.reverse()
+        return tuple(path)
+
+    def _shortest(self, source, target, k):
+        # Yen's algorithm; paths are tuples of half edges
+        first = self._search(source, target)
+        if first is None:
+            return []
+        found, candidates, seen = [first], [], {first}
+        order = count()
+        while len(found) < k:
+            last = found[-1]
+            tables = [source] + [self._targets[half_edge]
+                                 for half_edge in last]
+            for spur in range(len(last)):
+                root = last[:spur]
+                # edges leaving the spur table along found paths with the
+                # same root are banned, as are tables of the root
+                banned_edges = set(self._edges[path[spur]] for path in found
+                                   if len(path) > spur
+                                   and path[:spur] == root)
+                spur_path = self._search(tables[spur], target,
+                                         set(tables[:spur]), banned_edges)
+                if spur_path is None:
+                    continue
+                path = root + spur_path
+                if path not in seen:
+                    seen.add(path)
+                    heappush(candidates, (len(path), next(order), path))
+            if not candidates:
+                break
+            found.append(heappop(candidates)[2])
+        return found
+
+    def _compute_distances(self):
+        # all tables are searched at once: reached[table] has bits of
+        # tables, that reached the table, frontier[table] those reaching it
+        # in the last step
+        size = len(self.names)
+        offsets, targets = self._offsets, self._targets
+        frontier = [1 << table for table in range(size)]
+        reached = list(frontier)
+        rows = [0] * size
+        level = 0
+        while any(frontier) and level <= self.MAX_DISTANCE:
+            # bits of tables reached in this step become bytes holding the
+            # distance plus one; tables reached in different steps differ,
+            # so adding the bytes as integers never carries
+            digits = {ord('0'): '\0', ord('1'): chr(level + 1)}
+            for table, bits in enumerate(frontier):
+                if bits:
+                    rows[table] += int.from_bytes(
+                        format(bits, 'b')[::-1].translate(digits).encode(
+                            'latin-1'), 'little')
+            next_frontier = []
+            for table in range(size):
+                bits = 0
+                for half_edge in range(offsets[table], offsets[table + 1]):
+                    bits |= frontier[targets[half_edge]]
+                bits &= ~reached[table]
+                reached[table] |= bits
+                next_frontier.append(bits)
+            frontier = next_frontier
+            level += 1
+        # longer paths are left to searches
+        self._complete = not any(frontier)
+        self._distances = [row.to_bytes(size, 'little') for row in rows]
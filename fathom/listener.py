@@ -0,0 +1,263 @@
+#!/usr/bin/python3
+
+'''Push based refreshing of cached PostgreSQL databases.
+
+install_notifier creates event triggers, that send a notification with
+identity of every created, altered or dropped object to a channel; Listener
+consumes these notifications and reloads only affected tables and views of
+a cached database, so it stays fresh without polling the catalog:
+
+    install_notifier(database)
+    listener = Listener(database)
+    listener.listen(print)
+
+Event triggers can be created only by superusers.'''
+
+import json
+from select import select
+from threading import Event as Flag
+
+from .watcher import refresh_objects
+
+CHANNEL = 'fathom_ddl'
+
+# both functions send JSON with kind, oid and schema of the object, its name,
+# name of the table it belongs to and whether it was dropped; sql_drop runs after
+# dropped objects are removed from the catalog, so they are described by
+# their address only and table of a dropped index is not known; objects of
+# partitions belong to the root partitioned table, when it still exists
+
+_NOTIFIER_SQL = """
+CREATE OR REPLACE FUNCTION fathom_ddl_table(relation oid) RETURNS text
+LANGUAGE sql STABLE AS $$
+    WITH RECURSIVE ancestors (oid, relname, depth) AS (
+        SELECT oid, relname, 0 FROM pg_catalog.pg_class WHERE oid = relation
+        UNION ALL
+        SELECT parent.oid, parent.relname, a.depth + 1
+        FROM ancestors a
+        JOIN pg_catalog.pg_inherits inh ON inh.inhrelid = a.oid
+        JOIN pg_catalog.pg_class parent ON parent.oid = inh.inhparent AND
+                                           parent.relkind = 'p')
+    SELECT relname::text FROM ancestors ORDER BY depth DESC LIMIT 1
+$$;
+
+CREATE OR REPLACE FUNCTION fathom_notify_ddl() RETURNS event_trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    command record;
+BEGIN
+    FOR command IN SELECT * FROM pg_event_trigger_ddl_commands() LOOP
+        PERFORM pg_notify('%(channel)s', json_build_object(
+            'kind', command.object_type,
+            'oid', command.objid,
+            'schema', command.schema_name,
+            'name', CASE command.object_type
+                WHEN 'trigger' THEN (SELECT tgname FROM pg_catalog.pg_trigger
+                                     WHERE oid = command.objid)
+                ELSE (SELECT relname FROM pg_catalog.pg_class
+                      WHERE oid = command.objid) END,
+            'table', fathom_ddl_table(CASE command.object_type
+                WHEN 'index' THEN (SELECT x.indrelid
+                                   FROM pg_catalog.pg_index x
+                                   WHERE x.indexrelid = command.objid)
+                WHEN 'trigger' THEN (SELECT t.tgrelid
+                                     FROM pg_catalog.pg_trigger t
+                                     WHERE t.oid = command.objid)
+                WHEN 'table constraint' THEN (SELECT t.conrelid
+                                              FROM pg_catalog.pg_constraint t
+                                              WHERE t.oid = command.objid)
+                ELSE command.objid END),
+            'dropped', false)::text);
+    END LOOP;
+END $$;
+
+CREATE OR REPLACE FUNCTION fathom_notify_drop() RETURNS event_trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    dropped record;
+BEGIN
+    FOR dropped IN SELECT * FROM pg_event_trigger_dropped_objects() LOOP
+        PERFORM pg_notify('%(channel)s', json_build_object(
+            'kind', dropped.object_type,
+            'oid', dropped.objid,
+            'schema', dropped.schema_name,
+            'name', dropped.address_names[
+                array_length(dropped.address_names, 1)],
+            'table', CASE
+                WHEN dropped.object_type IN ('table', 'view')
+                THEN dropped.object_name
+                WHEN dropped.object_type IN ('trigger', 'table column',
+                                             'table constraint')
+                THEN coalesce(fathom_ddl_table(to_regclass(
+                         quote_ident(dropped.schema_name) || '.' ||
+                         quote_ident(dropped.address_names[2]))),
+                     dropped.address_names[2]) END,
+            'dropped', true)::text);
+    END LOOP;
+END $$;
+
+DROP EVENT TRIGGER IF EXISTS fathom_ddl;
+CREATE EVENT TRIGGER fathom_ddl ON ddl_command_end
+EXECUTE PROCEDURE fathom_notify_ddl();
+
+DROP EVENT TRIGGER IF EXISTS fathom_drop;
+CREATE EVENT TRIGGER fathom_drop ON sql_drop
+EXECUTE PROCEDURE fathom_notify_drop();
+"""
+
+_UNINSTALL_SQL = """
+DROP EVENT TRIGGER IF EXISTS fathom_ddl;
+DROP EVENT TRIGGER IF EXISTS fathom_drop;
+DROP FUNCTION IF EXISTS fathom_notify_ddl();
+DROP FUNCTION IF EXISTS fathom_notify_drop();
+DROP FUNCTION IF EXISTS fathom_ddl_table(oid);
+"""
+
+# renamed tables and views are notified with their new name only, the old
+# one is found by oid among relations existing when listening started
+_RELATIONS_SQL = """
+SELECT c.oid, c.relname
+FROM pg_catalog.pg_class c
+JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = %s AND c.relkind IN ('r', 'p', 'v')
+"""
+
+
+def install_notifier(database, channel=CHANNEL):
+    '''Create event triggers notifying channel about schema changes in the
+    database.'''
+    _execute(database, _NOTIFIER_SQL % {'channel': channel})
+
+
+def uninstall_notifier(database):
+    '''Drop event triggers created by install_notifier.'''
+    _execute(database, _UNINSTALL_SQL)
+
+
+class Listener(object):
+
+    '''Consumer of notifications sent by event triggers of install_notifier,
+    that refreshes tables and views of the database affected by them. Uses
+    its own connection, opened by the database's inspector unless given.'''
+
+    # notification kinds, that change a table
+    TABLE_KINDS = ('table', 'index', 'trigger', 'table column',
+                   'table constraint')
+
+    def __init__(self, database, channel=CHANNEL, connection=None):
+        self.database = database
+        self.channel = channel
+        inspector = database.inspector
+        if connection is None:
+            connection = inspector._api.connect(*inspector._args,
+                                                **inspector._kwargs)
+            connection.autocommit = True
+        self._connection = connection
+        # objects must be complete, so that they can be compared with
+        # reloaded ones
+        database.load_columns()
+        database.load_foreign_keys()
+        database.load_index_columns()
+        database.load_triggers()
+        cursor = connection.cursor()
+        cursor.execute('LISTEN %s' % channel)
+        cursor.execute(_RELATIONS_SQL, (inspector.schema,))
+        self._relations = dict(cursor.fetchall())
+
+    def poll(self, timeout=0):
+        '''Wait at most timeout seconds for notifications and return events
+        of tables and views refreshed because of them.'''
+        connection = self._connection
+        if not connection.notifies:
+            select([connection], [], [], timeout)
+        connection.poll()
+        notifications = []
+        while connection.notifies:
+            notifications.append(connection.notifies.pop(0))
+        tables, views = {}, {}
+        for notification in notifications:
+            if notification.channel == self.channel:
+                self._collect(json.loads(notification.payload), tables,
+                              views)
+        if not tables and not views:
+            return []
+        return refresh_objects(self.database, tables=tables, views=views)
+
+    def listen(self, callback, stop=None, timeout=1.0):
+        '''Call callback with every event until stop, a threading.Event,
+        is set; it is checked at least every timeout seconds.'''
+        stop = stop if stop is not None else Flag()
+        while not stop.is_set():
+            for event in self.poll(timeout):
+                callback(event)
+
+    def close(self):
+        self._connection.close()
+
+    # protected:
+
+    def _collect(self, change, tables, views):
+        # names of changed tables and views are collected with flag telling
+        # whether they exist, later changes win; dropping objects of a table
+        # does not bring back the table dropped with them
+        inspector = self.database.inspector
+        if change['schema'] != inspector.schema:
+            return
+        kind, table = change['kind'], change['table']
+        if kind in ('table', 'view'):
+            self._rename(change, tables if kind == 'table' else views)
+        if kind in self.TABLE_KINDS:
+            if table is None and kind == 'index':
+                # dropped index is found among cached ones
+                table = next((index.table for index
+                              in self.database.indices.values()
+                              if index.base_name == change['name']), None)
+            if table is None:
+                return
+            table = self.database.case(table)
+            parent = self._partitioned_table(table)
+            if parent is not None:
+                # dropped partition changes its partitioned table
+                table, kind = parent, 'partition'
+            if not inspector._name_matches(table):
+                return
+            if not change['dropped']:
+                tables[table] = True
+            elif kind == 'table':
+                tables[table] = False
+            else:
+                tables.setdefault(table, True)
+        elif kind == 'view' and inspector._name_matches(change['name']):
+            views[change['name']] = not change['dropped']
+
+    def _rename(self, change, objects):
+        # table or view known under another name was renamed, so it is
+        # dropped under the old one, unless recreated by a later change
+        oid = change.get('oid')
+        old = self._relations.pop(oid, None)
+        if oid is not None and not change['dropped']:
+            self._relations[oid] = change['name']
+        if old is None or old == change['name']:
+            return
+        old = self.database.case(old)
+        if self.database.inspector._name_matches(old):
+            objects[old] = False
+
+    def _partitioned_table(self, name):
+        # partitions are found among loaded partitions of cached tables
+        if name in self.database.tables:
+            return None
+        return next((table.name for table in self.database.tables.values()
+                     if getattr(table, '_partitions', None)
+                     and name in table._partitions), None)
+
+# protected:
+
+def _execute(database, sql):
+    inspector = database.inspector
+    connection = inspector._api.connect(*inspector._args, **inspector._kwargs)
+    try:
+        connection.cursor().execute(sql)
+        connection.commit()
+    finally:
+        connection.close()
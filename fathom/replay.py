@@ -0,0 +1,234 @@
+#!/usr/bin/python3
+
+'''Recording and replaying DB-API stand-ins, that let inspectors run without
+a database server.
+
+RecordingApi wraps a real driver module and stores every executed query with
+its result rows and duration; ReplayApi serves these results back, so any
+inspector given it as api works offline, optionally with recorded latency:
+
+    inspector = PostgresInspector('dbname=fathom', api=RecordingApi(psycopg2))
+    ...
+    inspector._api.save('catalog.json')
+
+    inspector = PostgresInspector('dbname=fathom',
+                                  api=ReplayApi('catalog.json'))'''
+
+import json
+import re
+from base64 import b64decode, b64encode
+from datetime import date, datetime
+from decimal import Decimal
+from threading import Lock
+from time import sleep, time
+
+from .errors import FathomError
+
+
+class RecordingApi(object):
+
+    '''DB-API module wrapper, that records queries run through its
+    connections. Other attributes, like exception classes, are taken from
+    the wrapped module.'''
+
+    def __init__(self, api):
+        self.api = api
+        self.queries = []
+        self._lock = Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.api, name)
+
+    def connect(self, *args, **kwargs):
+        return _RecordingConnection(self, self.api.connect(*args, **kwargs))
+
+    def save(self, path):
+        '''Write recorded queries to a JSON file.'''
+        with open(path, 'w') as file:
+            json.dump([[sql, _encode(parameters), _encode(rows), duration]
+                       for sql, parameters, rows, duration in self.queries],
+                      file, indent=0)
+
+    # protected:
+
+    def _record(self, sql, parameters, rows, duration):
+        with self._lock:
+            self.queries.append((sql, parameters, rows, duration))
+
+
+class ReplayApi(object):
+
+    '''DB-API module stand-in serving results recorded by RecordingApi. With
+    latency, every query takes as long as it took when it was recorded.
+    Executed queries are kept in queries, so they can be counted.'''
+
+    Error = FathomError
+
+    def __init__(self, path, latency=False):
+        self.latency = latency
+        self.queries = []
+        self._lock = Lock()
+        # the same query may be recorded many times, the last result wins
+        self._results = {}
+        with open(path) as file:
+            for sql, parameters, rows, duration in json.load(file):
+                key = _key(sql, _decode(parameters))
+                self._results[key] = ([tuple(row) for row in _decode(rows)],
+                                      duration)
+
+    def connect(self, *args, **kwargs):
+        return _ReplayConnection(self)
+
+    # protected:
+
+    def _execute(self, sql, parameters):
+        try:
+            rows, duration = self._results[_key(sql, parameters)]
+        except KeyError:
+            raise FathomError('Query was not recorded: %s' % sql)
+        with self._lock:
+            self.queries.append(sql)
+        if self.latency:
+            sleep(duration)
+        return rows
+
+
+class _RecordingConnection(object):
+
+    def __init__(self, api, connection):
+        self._api = api
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        return _RecordingCursor(self._api,
+                                self._connection.cursor(*args, **kwargs))
+
+
+class _RecordingCursor(object):
+
+    def __init__(self, api, cursor):
+        self._api = api
+        self._cursor = cursor
+        self._rows = []
+        self._position = 0
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def execute(self, sql, parameters=None):
+        # results are fetched right away to be recorded, so the cursor
+        # serves them from memory afterwards
+        start = time()
+        if parameters is None:
+            self._cursor.execute(sql)
+        else:
+            self._cursor.execute(sql, parameters)
+        try:
+            self._rows = [tuple(row) for row in self._cursor.fetchall()]
+        except Exception:
+            # statements without result set
+            self._rows = []
+        self._api._record(sql, parameters, self._rows, time() - start)
+        self._position = 0
+
+    def fetchmany(self, size=None):
+        size = size if size is not None else getattr(self, 'arraysize', 1)
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class _ReplayConnection(object):
+
+    def __init__(self, api):
+        self._api = api
+
+    def cursor(self, *args, **kwargs):
+        return _ReplayCursor(self._api)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _ReplayCursor(_RecordingCursor):
+
+    arraysize = 1
+
+    def __init__(self, api):
+        self._api = api
+        self._rows = []
+        self._position = 0
+
+    def __getattr__(self, name):
+        raise AttributeError(name)
+
+    def execute(self, sql, parameters=None):
+        self._rows = self._api._execute(sql, parameters)
+        self._position = 0
+
+    def close(self):
+        pass
+
+# protected:
+
+# values of timeouts set by inspectors with time budget depend on time left
+_TIMEOUT = re.compile(r'\b(busy_timeout|statement_timeout|lock_timeout|'
+                      r'max_execution_time|lock_wait_timeout) = \d+')
+
+def _key(sql, parameters):
+    # parameters are compared in their stored form, where tuples are lists;
+    # timeouts match whatever value they were recorded with
+    return (_TIMEOUT.sub(r'\1 = ?', sql), json.dumps(_encode(parameters)))
+
+# JSON does not know some values returned by drivers, so they are stored as
+# single key dictionaries naming their type
+
+def _encode(value):
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict):
+        return {'dict': [[_encode(key), _encode(item)]
+                         for key, item in value.items()]}
+    if isinstance(value, Decimal):
+        return {'decimal': str(value)}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'bytes': b64encode(bytes(value)).decode('ascii')}
+    if isinstance(value, datetime):
+        return {'datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'date': value.isoformat()}
+    return value
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if isinstance(value, dict):
+        (kind, data), = value.items()
+        if kind == 'dict':
+            return dict((_decode(key), _decode(item)) for key, item in data)
+        return DECODERS[kind](data)
+    return value
+
+DECODERS = {'decimal': Decimal, 'bytes': lambda data: b64decode(data),
+            'datetime': datetime.fromisoformat, 'date': date.fromisoformat}
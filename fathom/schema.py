@@ -1,8 +1,47 @@
 #!/usr/bin/python3
 
+from itertools import chain
+from threading import Lock, RLock
+from weakref import WeakKeyDictionary
+
+from .errors import FathomError
+
 lower = lambda string: string.lower()
 upper = lambda string: string.upper()
 
+# locks guarding lazy loading of schema objects; they are kept outside of the
+# objects, so these stay easy to copy and pickle
+_locks = WeakKeyDictionary()
+_locks_lock = Lock()
+
+def _lock(obj):
+    with _locks_lock:
+        lock = _locks.get(obj)
+        if lock is None:
+            lock = _locks[obj] = RLock()
+        return lock
+
+def _load_once(obj, name, load, owner=None):
+    '''Return attribute _<name> of the object, calling load first if it is 
+    None. Concurrent callers wait for the one running load instead of loading
+    again; loads sharing an owner are serialized on the owner's lock.'''
+    value = getattr(obj, '_' + name, None)
+    if value is None:
+        with _lock(owner if owner is not None else obj):
+            value = getattr(obj, '_' + name, None)
+            if value is None:
+                load()
+                value = getattr(obj, '_' + name, None)
+    return value
+
+def _inspector(obj, part):
+    # objects of detached databases have no inspector to load parts, that
+    # were left out of the snapshot
+    if obj.inspector is None:
+        raise FathomError('%s %s is detached without %s.' % 
+                          (type(obj).__name__, obj.name, part))
+    return obj.inspector
+
 class Named(object):
     
     def __init__(self, name):
@@ -11,16 +50,21 @@ class Named(object):
 
 
 def build_get_database_objects_function(name):
+    def load(self):
+        # dictionary is published only after it is complete
+        if self.inspector is not None:
+            dictionary = getattr(self.inspector, 'get_' + name)()
+            # objects got one by one before stay the same objects
+            partial = getattr(self, '_partial_' + name, {})
+            dictionary.update((key, partial[key]) for key in partial
+                              if key in dictionary)
+            for obj in dictionary.values():
+                obj.database = self
+            setattr(self, '_' + name, dictionary)
+        else:
+            setattr(self, '_' + name, {})
     def function(self):
-        if getattr(self, '_' + name, None) is None:
-            if self.inspector is not None:
-                dictionary = getattr(self.inspector, 'get_' + name)()
-                for obj in dictionary.values():
-                    obj.database = self
-                setattr(self, '_' + name, dictionary)
-            else:
-                setattr(self, '_' + name, {})
-        return getattr(self, '_' + name)
+        return _load_once(self, name, lambda: load(self))
     return function
     
 def build_set_database_objects_function(name):
@@ -36,19 +80,37 @@ def build_accessors(name):
 
 class Database(Named):
     
-    def __init__(self, name='', inspector=None, **kwargs):
+    # parts of the database, that can be materialized by detach
+    PARTS = ('tables', 'views', 'indices', 'triggers', 'procedures', 'stats',
+             'schemas')
+    
+    def __init__(self, name='', inspector=None, include=None, exclude=None,
+                 timeout=None, governor=None, **kwargs):
         # TODO: somehow database name should be set too, maybe inspector should
         # get it too
         super(Database, self).__init__(name, **kwargs)
+        # include and exclude are patterns of names of tables and views, that
+        # are inspected; they are applied by the inspector in its queries
+        if inspector is not None and (include or exclude):
+            inspector = inspector.filtered(include, exclude)
+        # timeout is time budget in seconds of all inspection done through
+        # this database, counted from its creation
+        if inspector is not None and timeout is not None:
+            inspector = inspector.with_timeout(timeout)
+        if inspector is not None and governor is not None:
+            inspector = inspector.with_governor(governor)
         self.inspector = inspector
         self.refresh()
                         
     def refresh(self):
+        # tables got by get_table before all tables were enumerated
+        self._partial_tables = {}
         self._tables = None
         self._views = None
         self._procedures = None
         self._triggers = None
         self._indices = None
+        self._schemas = None
         
     def _get_version(self):
         return self.inspector.version
@@ -63,15 +125,217 @@ class Database(Named):
     procedures = property(*build_accessors('procedures'))
     indices = property(*build_accessors('indices'))
     triggers = property(*build_accessors('triggers'))
+    schemas = property(*build_accessors('schemas'))
+    
+    def get_table(self, name, full=True):
+        '''Return table with given name without enumerating all tables of the
+        database; with full, all its details are loaded with one query. 
+        Tables not enumerated yet are always loaded with it, so that their
+        kind is known, and kept until tables are enumerated.'''
+        name = self.case(name)
+        with _lock(self):
+            if self._tables is None:
+                table = self._partial_tables.get(name)
+                if table is None:
+                    return self._load_partial_table(name)
+            elif name in self._tables:
+                table = self._tables[name]
+            else:
+                raise FathomError('Table %s does not exist.' % name)
+        if full:
+            table.load()
+        return table
+        
+    def detach(self, parts=PARTS):
+        '''Load given parts of the database and return its snapshot without
+        inspector, that can be pickled cheaply and used in other processes;
+        objects of parts, that were not requested, are not included.'''
+        parts = set(parts)
+        self._materialize(parts)
+        return _restore_database(type(self), self._snapshot(parts))
+        
+    def __reduce__(self):
+        # inspectors hold database connection parameters and driver modules,
+        # so only detached databases are pickled, as plain tuples
+        if self.inspector is not None:
+            raise FathomError('Only detached databases can be pickled, use '
+                              'detach().')
+        return _restore_database, (type(self), self._snapshot(self.PARTS))
+        
+    def load_schemas(self, names=None):
+        '''Load objects of given schemas (all by default) in one pass, instead
+        of loading every schema on first access.'''
+        if self.inspector is None:
+            return
+        names = self.schemas.keys() if names is None else names
+        self.inspector.build_schemas([self.schemas[name] for name in names])
+        
+    def load_columns(self):
+        '''Load columns of all tables and views, that do not have them yet,
+        in one pass.'''
+        with _lock(self):
+            objects = [obj for obj in chain(self.tables.values(), 
+                                            self.views.values())
+                       if obj._columns is None]
+            if objects and self.inspector is not None:
+                self.inspector.build_all_columns(objects)
+        
+    def load_foreign_keys(self):
+        '''Load foreign keys of all tables, that do not have them yet, in one
+        pass.'''
+        with _lock(self):
+            tables = [table for table in self.tables.values()
+                      if table._foreign_keys is None]
+            if tables and self.inspector is not None:
+                self.inspector.build_all_foreign_keys(tables)
+        
+    def load_stats(self):
+        '''Load size and usage statistics of all tables and indices with one
+        query.'''
+        if self.inspector is None:
+            return
+        with _lock(self):
+            self.inspector.build_all_stats(list(self.tables.values()),
+                                           list(self.indices.values()))
+        
+    def load_index_columns(self):
+        '''Load columns of all indices, that do not have them yet, in one
+        pass.'''
+        with _lock(self):
+            indices = [index for index in self.indices.values()
+                       if index._columns is None]
+            if indices and self.inspector is not None:
+                self.inspector.build_all_index_columns(indices)
+            
+    def load_arguments(self, names=None):
+        '''Load arguments of all procedures, or of those with given names,
+        that do not have them yet, in one pass.'''
+        with _lock(self):
+            procedures = [procedure for name, procedure 
+                          in (self.procedures or {}).items()
+                          if procedure._arguments is None 
+                          and (names is None or name in names)]
+            if procedures and self.inspector is not None:
+                self.inspector.build_all_arguments(procedures)
+            
+    def load_triggers(self):
+        '''Load details of all triggers, that do not have them yet, in one
+        pass.'''
+        with _lock(self):
+            triggers = [trigger for trigger in self.triggers.values()
+                        if trigger._table is None]
+            if triggers and self.inspector is not None:
+                self.inspector.build_all_triggers(triggers)
             
     def supports_stored_procedures(self):
         return self.inspector.supports_stored_procedures()
+        
+    # protected:
+    
+    def _load_partial_table(self, name):
+        # tables excluded by name filters do not exist for the database
+        if self.inspector is None or not self.inspector._name_matches(name):
+            raise FathomError('Table %s does not exist.' % name)
+        table = self.inspector.get_table(name, database=self)
+        self._partial_tables[name] = table
+        return table
+        
+
+    def _materialize(self, parts):
+        if self.inspector is None:
+            return
+        if parts & {'tables', 'views'}:
+            self.load_columns()
+        if 'tables' in parts:
+            self.load_foreign_keys()
+            for table in self.tables.values():
+                if isinstance(table, PartitionedTable):
+                    table.partitions
+        if 'indices' in parts:
+            self.load_index_columns()
+        if 'triggers' in parts:
+            self.load_triggers()
+        if 'procedures' in parts:
+            self.load_arguments()
+        if 'stats' in parts:
+            self.load_stats()
+        if {'tables', 'indices', 'triggers'} <= parts:
+            # per table indices and triggers are taken from whole database
+            for table in self.tables.values():
+                table._indices, table._triggers = {}, {}
+            for name, index in self.indices.items():
+                table = self.tables.get(self.case(index.table))
+                if table is not None:
+                    table._indices[name] = index
+            for name, trigger in self.triggers.items():
+                table = self.tables.get(self.case(trigger.table))
+                if table is not None:
+                    table._triggers[name] = trigger
+        if 'schemas' in parts:
+            for schema in self.schemas.values():
+                schema._materialize(parts - {'schemas'})
+                
+    def _snapshot(self, parts):
+        # compact state of loaded objects made of tuples of plain values;
+        # lazy attributes, that were not loaded, are kept as None
+        stats = 'stats' in parts
+        state = dict((kind, _snapshot_objects(getattr(self, '_' + kind), 
+                                              snapshot, stats))
+                     for kind, snapshot in SNAPSHOTS.items() if kind in parts)
+        if 'schemas' in parts and self._schemas is not None:
+            state['schemas'] = tuple(schema._snapshot(parts) 
+                                     for schema in self._schemas.values())
+        return self.name, state
     
     def case(self, string):
         if self.inspector is not None:
             return self.inspector.case(string)
         return string
 
+class Schema(Database):
+    
+    '''Namespace inside of a database; its objects are loaded independently
+    of other schemas and their keys are qualified with schema name.'''
+    
+    def __init__(self, name, database=None, inspector=None, **kwargs):
+        super(Schema, self).__init__(name, inspector=inspector, **kwargs)
+        self.database = database
+
+
+class Statistics(object):
+    
+    '''Size and usage statistics of a table or an index; values that given
+    database system does not provide are None. Row counts and pages are
+    estimates kept by the database, sizes are in bytes and scans count how
+    many times the object was scanned since statistics were reset.'''
+    
+    def __init__(self, rows=None, pages=None, size=None, index_size=None, 
+                 scans=None):
+        self.rows = rows
+        self.pages = pages
+        self.size = size
+        self.index_size = index_size
+        self.scans = scans
+
+
+class WithStats(object):
+    
+    def __init__(self):
+        super(WithStats, self).__init__()
+        self._stats = None
+        
+    def _get_stats(self):
+        # statistics of all objects are loaded together with one query, so
+        # concurrent loads are serialized on the database
+        return _load_once(self, 'stats', self.database.load_stats,
+                          owner=self.database)
+        
+    def _set_stats(self, stats):
+        self._stats = stats
+        
+    stats = property(_get_stats, _set_stats)
+
+
 class WithColumns(object):
 
     def __init__(self):
@@ -79,9 +343,8 @@ class WithColumns(object):
         self._columns = None
 
     def _get_columns(self):
-        if self._columns is None:
-            self.inspector.build_columns(self)
-        return self._columns
+        return _load_once(self, 'columns', lambda: _inspector(
+            self, 'columns').build_columns(self))
     
     def _set_columns(self, columns):
         self._columns = columns
@@ -89,24 +352,51 @@ class WithColumns(object):
     columns = property(_get_columns, _set_columns)
 
 
-class Table(Named, WithColumns):
+class Table(Named, WithColumns, WithStats):
     
     def __init__(self, name, database=None, inspector=None):
         super(Table, self).__init__(name)
         self.inspector = inspector
         self._foreign_keys = None
+        self._indices = None
+        self._triggers = None
         self.database = database
     
     def _get_foreign_keys(self):
-        if self._foreign_keys is None:
-            self.inspector.build_foreign_keys(self)
-        return self._foreign_keys
+        return _load_once(self, 'foreign_keys', lambda: _inspector(
+            self, 'foreign keys').build_foreign_keys(self))
         
     def _set_foreign_keys(self, foreign_keys):
         self._foreign_keys = foreign_keys
         
     foreign_keys = property(_get_foreign_keys, _set_foreign_keys)
     
+    def _get_indices(self):
+        return _load_once(self, 'indices', lambda: self._load('indices'))
+        
+    def _set_indices(self, indices):
+        self._indices = indices
+        
+    indices = property(_get_indices, _set_indices)
+    
+    def _get_triggers(self):
+        return _load_once(self, 'triggers', lambda: self._load('triggers'))
+        
+    def _set_triggers(self, triggers):
+        self._triggers = triggers
+        
+    triggers = property(_get_triggers, _set_triggers)
+    
+    def load(self):
+        '''Load columns, indices, foreign keys and triggers of the table with
+        one query.'''
+        self._load('details')
+        
+    def _load(self, part):
+        inspector = _inspector(self, part)
+        with _lock(self):
+            inspector.build_table(self)
+    
     def drop(self):
         if self.inspector:
             self.inspector.drop_table(self)
@@ -114,15 +404,54 @@ class Table(Named, WithColumns):
             del self.database.tables[self.name]
         
 
+class PartitionedTable(Table):
+    
+    '''Table split into partitions; partitions are not listed as separate
+    tables, but are loaded lazily as descriptors sharing parent columns.'''
+    
+    def __init__(self, name, database=None, inspector=None):
+        super(PartitionedTable, self).__init__(name, database=database, 
+                                               inspector=inspector)
+        self._partitions = None
+        
+    def _get_partitions(self):
+        return _load_once(self, 'partitions', lambda: _inspector(
+            self, 'partitions').build_partitions(self))
+        
+    def _set_partitions(self, partitions):
+        self._partitions = partitions
+        
+    partitions = property(_get_partitions, _set_partitions)
+    
+    
+class Partition(Named):
+    
+    def __init__(self, name, table, bound=None, tablespace=None, **kwargs):
+        super(Partition, self).__init__(name, **kwargs)
+        self.table = table
+        self.bound = bound
+        self.tablespace = tablespace
+        # partition may be partitioned further itself
+        self.is_partitioned = False
+        
+    def _get_columns(self):
+        return self.table.columns
+        
+    columns = property(_get_columns)
+
+
 class View(Named, WithColumns):
     
     def __init__(self, name, database=None, inspector=None, **kwargs):
         super(View, self).__init__(name, **kwargs)
+        # source of the view as the database keeps it, when the inspector
+        # reads it with view names
+        self.sql = None
         self.inspector = inspector
         self.database = database
 
 
-class Index(Named):
+class Index(Named, WithStats):
     
     def __init__(self, name, table, base_name=None, database=None, 
                  inspector=None, **kwargs):
@@ -130,16 +459,25 @@ class Index(Named):
         self.table = table
         self._columns = None
         self.is_unique = False
+        self.is_primary = False
+        # access method and predicate of partial index, where the inspector
+        # reads them
+        self.method = None
+        self.predicate = None
         self.inspector = inspector
         self.base_name = base_name if base_name is not None else name
         self.database = database
         
     def _get_columns(self):
-        if self._columns is None:
-            self._columns = self.inspector.get_index_columns(self)
-        return self._columns
+        def load():
+            self._columns = _inspector(self, 'columns').get_index_columns(
+                self)
+        return _load_once(self, 'columns', load)
         
-    columns = property(_get_columns)
+    def _set_columns(self, columns):
+        self._columns = columns
+        
+    columns = property(_get_columns, _set_columns)
 
         
 class Procedure(Named):
@@ -161,9 +499,8 @@ class Procedure(Named):
         return types
         
     def _get_arguments(self):
-        if self._arguments is None:
-            self.inspector.build_procedure(self)
-        return self._arguments
+        return _load_once(self, 'arguments', lambda: _inspector(
+            self, 'arguments').build_procedure(self))
         
     def _set_arguments(self, arguments):
         self._arguments = arguments
@@ -186,9 +523,8 @@ class Trigger(Named):
         self.database = database
         
     def _get_table(self):
-        if self._table is None:
-            self.inspector.build_trigger(self)
-        return self._table
+        return _load_once(self, 'table', lambda: _inspector(
+            self, 'table').build_trigger(self))
         
     def _set_table(self, table):
         self._table = table
@@ -219,3 +555,168 @@ class ForeignKey(object):
         self.columns = []
         self.referenced_table = None
         self.referenced_columns = []
+
+
+# snapshots of schema objects used by detached databases; every snapshot
+# starts with class of the object and its name
+
+def _snapshot_objects(objects, snapshot, stats):
+    if objects is None:
+        return None
+    return tuple((name, snapshot(obj, stats)) for name, obj in objects.items())
+
+def _snapshot_stats(obj, stats):
+    if not stats or obj._stats is None:
+        return None
+    stats = obj._stats
+    return (stats.rows, stats.pages, stats.size, stats.index_size, stats.scans)
+
+def _snapshot_columns(obj):
+    if obj._columns is None:
+        return None
+    return tuple((column.name, column.type, column.not_null, column.default)
+                 for column in obj._columns.values())
+
+def _snapshot_table(table, stats):
+    foreign_keys = None
+    if table._foreign_keys is not None:
+        foreign_keys = tuple((tuple(fk.columns), fk.referenced_table, 
+                              tuple(fk.referenced_columns))
+                             for fk in table._foreign_keys)
+    partitions = None
+    if getattr(table, '_partitions', None) is not None:
+        partitions = tuple((partition.name, partition.bound, 
+                            partition.tablespace, partition.is_partitioned)
+                           for partition in table._partitions.values())
+    return (type(table), table.name, _snapshot_columns(table), foreign_keys,
+            _snapshot_stats(table, stats), 
+            tuple(table._indices) if table._indices is not None else None,
+            tuple(table._triggers) if table._triggers is not None else None,
+            partitions)
+
+def _snapshot_view(view, stats):
+    return (type(view), view.name, _snapshot_columns(view), view.sql)
+
+def _snapshot_index(index, stats):
+    columns = tuple(index._columns) if index._columns is not None else None
+    return (type(index), index.name, index.table, index.base_name, columns,
+            index.is_unique, index.is_primary, index.method, index.predicate,
+            _snapshot_stats(index, stats))
+
+def _snapshot_trigger(trigger, stats):
+    return (type(trigger), trigger.name, trigger._table, trigger.when, 
+            trigger.event)
+
+def _snapshot_procedure(procedure, stats):
+    arguments = None
+    if procedure._arguments is not None:
+        arguments = tuple((argument.name, argument.type) 
+                          for argument in procedure._arguments.values())
+    return (type(procedure), procedure.name, procedure.returns, 
+            getattr(procedure, 'sql', None), arguments)
+
+SNAPSHOTS = {'tables': _snapshot_table, 'views': _snapshot_view,
+             'indices': _snapshot_index, 'triggers': _snapshot_trigger,
+             'procedures': _snapshot_procedure}
+
+def _restore_database(Class, state):
+    name, state = state
+    database = Class(name)
+    for kind, restore in RESTORES:
+        if state.get(kind) is not None:
+            objects = dict((key, restore(snapshot)) 
+                           for key, snapshot in state[kind])
+            for obj in objects.values():
+                obj.database = database
+            setattr(database, '_' + kind, objects)
+    if state.get('schemas') is not None:
+        database._schemas = {}
+        for snapshot in state['schemas']:
+            schema = _restore_database(Schema, snapshot)
+            schema.database = database
+            database._schemas[schema.name] = schema
+    indices, triggers = database._indices or {}, database._triggers or {}
+    for table in (database._tables or {}).values():
+        # per table indices and triggers are shared with the database
+        if table._indices is not None:
+            table._indices = dict((key, indices[key]) 
+                                  for key in table._indices if key in indices)
+        if table._triggers is not None:
+            table._triggers = dict((key, triggers[key]) for key 
+                                   in table._triggers if key in triggers)
+    return database
+
+def _restore_stats(obj, stats):
+    if stats is not None:
+        obj._stats = Statistics(*stats)
+
+def _restore_columns(obj, columns):
+    if columns is not None:
+        obj._columns = dict((row[0], Column(*row)) for row in columns)
+
+def _restore_table(snapshot):
+    (Class, name, columns, foreign_keys, stats, indices, triggers, 
+     partitions) = snapshot
+    table = Class(name)
+    _restore_columns(table, columns)
+    if foreign_keys is not None:
+        table._foreign_keys = []
+        for columns, referenced_table, referenced_columns in foreign_keys:
+            fk = ForeignKey()
+            fk.columns = list(columns)
+            fk.referenced_table = referenced_table
+            fk.referenced_columns = list(referenced_columns)
+            table._foreign_keys.append(fk)
+    _restore_stats(table, stats)
+    # index and trigger names are resolved to objects by _restore_database
+    table._indices = dict.fromkeys(indices) if indices is not None else None
+    table._triggers = dict.fromkeys(triggers) if triggers is not None else None
+    if partitions is not None:
+        table._partitions = {}
+        for name, bound, tablespace, is_partitioned in partitions:
+            partition = Partition(name, table, bound=bound, 
+                                  tablespace=tablespace)
+            partition.is_partitioned = is_partitioned
+            table._partitions[name] = partition
+    return table
+
+def _restore_view(snapshot):
+    Class, name, columns, sql = snapshot
+    view = Class(name)
+    _restore_columns(view, columns)
+    view.sql = sql
+    return view
+
+def _restore_index(snapshot):
+    (Class, name, table, base_name, columns, is_unique, is_primary, method,
+     predicate, stats) = snapshot
+    index = Class(name, table, base_name=base_name)
+    index._columns = columns
+    index.is_unique = is_unique
+    index.is_primary = is_primary
+    index.method = method
+    index.predicate = predicate
+    _restore_stats(index, stats)
+    return index
+
+def _restore_trigger(snapshot):
+    Class, name, table, when, event = snapshot
+    trigger = Class(name, when=when, event=event)
+    trigger._table = table
+    return trigger
+
+def _restore_procedure(snapshot):
+    Class, name, returns, sql, arguments = snapshot
+    procedure = Class(name)
+    procedure.returns = returns
+    if sql is not None:
+        procedure.sql = sql
+    if arguments is not None:
+        procedure._arguments = dict((name, Argument(name, type))
+                                    for name, type in arguments)
+    return procedure
+
+# indices and triggers are restored before tables, which refer to them
+RESTORES = (('indices', _restore_index), ('triggers', _restore_trigger),
+            ('tables', _restore_table), ('views', _restore_view),
+            ('procedures', _restore_procedure))
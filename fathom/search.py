@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+
+'''Inverted index of identifiers in source of stored procedures and views.
+
+SourceIndex splits sources into identifiers, ignoring their case and quotes,
+and keeps positions of every identifier in every source, so that sources
+mentioning an identifier or a sequence of identifiers, like a qualified
+name, are found without reading any source:
+
+    index = SourceIndex(database)
+    index.search('ledger_entries')
+    index.search('public.ledger_entries')
+
+Words of string literals and comments are indexed too, as they often hold
+dynamic SQL. update() brings the index in line with a refreshed database
+and tokenizes again only sources, that changed.'''
+
+import re
+from array import array
+
+# string literals and comments are split further into words, quoted
+# identifiers are kept whole
+_TOKEN = re.compile(r"""'((?:[^']|'')*)'|--([^\n]*)|/\*(.*?)\*/|"""
+                    r'''"((?:[^"]|"")+)"|`((?:[^`]|``)+)`|([\w$#]+)''',
+                    re.S)
+
+_WORD = re.compile(r'[\w$#]+')
+
+
+def tokenize(sql):
+    '''Return list of lower case identifiers and words of given source.'''
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        group = match.lastindex
+        if group <= 3:
+            tokens.extend(word.lower() for word
+                          in _WORD.findall(match.group(group)))
+        else:
+            tokens.append(match.group(group).lower())
+    return tokens
+
+
+class SourceIndex(object):
+
+    '''Index of sources of procedures and views of a database, whose keys
+    are pairs of kind, either 'procedure' or 'view', and name.'''
+
+    def __init__(self, database=None):
+        self._sources = {}
+        # sources are numbered, postings map every token to positions of
+        # the token in numbered sources
+        self._numbers, self._keys = {}, []
+        self._postings = {}
+        if database is not None:
+            self.update(database)
+
+    def add(self, kind, name, sql):
+        '''Index source of an object, replacing its previous source; return
+        whether the index changed.'''
+        key = (kind, name)
+        if self._sources.get(key) == sql:
+            return False
+        self.remove(kind, name)
+        if sql is None:
+            return True
+        number = self._numbers[key] = len(self._keys)
+        self._keys.append(key)
+        self._sources[key] = sql
+        positions = {}
+        for position, token in enumerate(tokenize(sql)):
+            if token not in positions:
+                positions[token] = array('I')
+            positions[token].append(position)
+        for token, token_positions in positions.items():
+            if token not in self._postings:
+                self._postings[token] = {}
+            self._postings[token][number] = token_positions
+        return True
+
+    def remove(self, kind, name):
+        '''Remove source of an object from the index; return whether it
+        was there.'''
+        key = (kind, name)
+        sql = self._sources.pop(key, None)
+        if sql is None:
+            return False
+        number = self._numbers.pop(key)
+        self._keys[number] = None
+        for token in set(tokenize(sql)):
+            postings = self._postings[token]
+            del postings[number]
+            if not postings:
+                del self._postings[token]
+        return True
+
+    def update(self, database):
+        '''Index procedures and views of the database, reindexing only
+        changed sources and dropping those of removed objects; return set of
+        keys of objects, whose sources changed.'''
+        sources = dict((('procedure', name), getattr(procedure, 'sql', None))
+                       for name, procedure
+                       in (database.procedures or {}).items())
+        sources.update((('view', name), view.sql)
+                       for name, view in database.views.items())
+        changed = set(self._sources) - set(sources)
+        for key in changed:
+            self.remove(*key)
+        for key, sql in sources.items():
+            if self.add(key[0], key[1], sql):
+                changed.add(key)
+        return changed
+
+    def apply(self, events):
+        '''Update sources of views changed by events of a Watcher or a
+        Listener.'''
+        for event in events:
+            if event.kind == 'view':
+                if event.new is None:
+                    self.remove('view', event.name)
+                else:
+                    self.add('view', event.name, event.new.sql)
+
+    def search(self, query):
+        '''Return sorted keys of objects, whose sources contain identifiers
+        of the query in the same order, one after another.'''
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        postings = [self._postings.get(token) for token in tokens]
+        if not all(postings):
+            return []
+        # sources are intersected starting with the rarest token
+        numbers = set(min(postings, key=len))
+        for token_postings in postings:
+            numbers.intersection_update(token_postings)
+        if len(tokens) > 1:
+            numbers = [number for number in numbers
+                       if self._contains_phrase(number, postings)]
+        return sorted(self._keys[number] for number in numbers)
+
+    def source(self, kind, name):
+        '''Return indexed source of an object.'''
+        return self._sources.get((kind, name))
+
+    def __len__(self):
+        return len(self._sources)
+
+    # protected:
+
+    def _contains_phrase(self, number, postings):
+        # tokens occur few times in a source, so position arrays are
+        # searched directly
+        following = [token_postings[number] for token_postings in postings[1:]]
+        for start in postings[0][number]:
+            for offset, positions in enumerate(following, 1):
+                if start + offset not in positions:
+                    break
+            else:
+                return True
+        return False
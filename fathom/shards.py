@@ -0,0 +1,214 @@
+#!/usr/bin/python3
+
+'''Inspection of many SQLite shards through a single connection.
+
+SqliteShardsInspector attaches shard files to one in-memory connection in
+batches of at most SQLITE_MAX_ATTACHED databases and reads everything about
+a batch with one query over sqlite_master tables and table-valued pragmas of
+the attached schemas:
+
+    databases = SqliteShardsInspector(*paths).get_databases()
+    databases[paths[0]].tables
+
+Every shard gets its own, fully loaded Database, whose inspector is a plain
+SqliteInspector of the shard. Shards have mostly the same schema, so
+columns of identical tables are built once and shared by all shards; they
+must be treated as read only.'''
+
+from os.path import abspath
+from urllib.parse import quote
+
+from .inspectors import SqliteInspector
+from .schema import Database, Table, View, Trigger
+
+
+class SqliteShardsInspector(SqliteInspector):
+
+    '''Inspector of many SQLite database files at once; name filters, time
+    budget and governor apply to all of them.'''
+
+    # used when the driver cannot tell the limit of attached databases
+    MAX_ATTACHED = 10
+
+    _SHARD_KINDS = ('table', 'view', 'column', 'index', 'index_column',
+                    'foreign_key', 'trigger')
+
+    # rows start with kind of the object, number of the shard in the batch
+    # and name of the table or view, that the object belongs to
+    _SHARD_SQL = """
+SELECT 'table', %(shard)d, name, NULL, NULL, NULL, NULL, NULL, NULL
+FROM %(schema)s.sqlite_master
+WHERE type = 'table' AND %(filter name)s
+UNION ALL
+SELECT 'view', %(shard)d, name, sql, NULL, NULL, NULL, NULL, NULL
+FROM %(schema)s.sqlite_master
+WHERE type = 'view' AND %(filter name)s
+UNION ALL
+SELECT 'column', %(shard)d, m.name, p.cid, p.name, p.type, p."notnull",
+       p.dflt_value, p.pk
+FROM %(schema)s.sqlite_master m
+     JOIN pragma_table_info(m.name, '%(schema)s') p
+WHERE m.type IN ('table', 'view') AND %(filter m.name)s
+UNION ALL
+SELECT 'index', %(shard)d, m.tbl_name, m.name, l."unique", l.origin = 'pk',
+       NULL, NULL, NULL
+FROM %(schema)s.sqlite_master m
+     JOIN pragma_index_list(m.tbl_name, '%(schema)s') l ON l.name = m.name
+WHERE m.type = 'index' AND %(filter m.tbl_name)s
+UNION ALL
+SELECT 'index_column', %(shard)d, m.tbl_name, m.name, p.name, p.seqno,
+       NULL, NULL, NULL
+FROM %(schema)s.sqlite_master m
+     JOIN pragma_index_info(m.name, '%(schema)s') p
+WHERE m.type = 'index' AND %(filter m.tbl_name)s
+UNION ALL
+SELECT 'foreign_key', %(shard)d, m.name, p.id, p."table", p."from", p."to",
+       p.seq, NULL
+FROM %(schema)s.sqlite_master m
+     JOIN pragma_foreign_key_list(m.name, '%(schema)s') p
+WHERE m.type = 'table' AND %(filter m.name)s
+UNION ALL
+SELECT 'trigger', %(shard)d, tbl_name, name, sql, NULL, NULL, NULL, NULL
+FROM %(schema)s.sqlite_master
+WHERE type = 'trigger' AND %(filter tbl_name)s"""
+
+    def __init__(self, *paths, api=None, batch_size=None):
+        SqliteInspector.__init__(self, 'file::memory:', api=api)
+        self._kwargs = {'uri': True}
+        self.paths = paths
+        self.batch_size = batch_size
+
+    def get_databases(self):
+        '''Return dictionary mapping paths of shards to their databases.'''
+        databases = {}
+        # columns of identical tables are shared by all shards
+        interned = {}
+        for start, rows in self._batches():
+            for shard, path in enumerate(
+                    self.paths[start:start + len(rows)]):
+                databases[path] = self._build_database(path, rows[shard],
+                                                       interned)
+        return databases
+
+    # protected:
+
+    def _batches(self):
+        # yields position of the first shard of a batch and rows of its
+        # shards grouped by kind
+        connection = self._api.connect(*self._args, **self._kwargs)
+        try:
+            if self._deadline is not None:
+                self._set_timeout(connection, self._remaining())
+            size = self.batch_size or self._attach_limit(connection)
+            for start in range(0, len(self.paths), size):
+                batch = self.paths[start:start + size]
+                yield start, self._read_batch(connection, batch)
+        except self._api.Error as e:
+            raise self._error(e)
+        finally:
+            connection.close()
+
+    def _attach_limit(self, connection):
+        getlimit = getattr(connection, 'getlimit', None)
+        limit = getattr(self._api, 'SQLITE_LIMIT_ATTACHED', None)
+        if getlimit is None or limit is None:
+            return self.MAX_ATTACHED
+        return getlimit(limit)
+
+    def _read_batch(self, connection, paths):
+        slot = (self._governor.acquire(self._deadline)
+                if self._governor is not None else None)
+        cursor = connection.cursor()
+        attached = 0
+        try:
+            for shard, path in enumerate(paths):
+                # shards are opened read only, so missing files are not
+                # created
+                cursor.execute('ATTACH DATABASE ? AS shard_%d' % shard,
+                               ('file:%s?mode=ro' % quote(abspath(path)),))
+                attached += 1
+            sql = ' UNION ALL '.join(
+                self._format(self._SHARD_SQL, shard=shard,
+                             schema='shard_%d' % shard)
+                for shard in range(len(paths)))
+            cursor.execute(sql)
+            rows = [dict((kind, []) for kind in self._SHARD_KINDS)
+                    for path in paths]
+            for row in cursor:
+                rows[row[1]][row[0]].append(row[2:])
+            return rows
+        finally:
+            for shard in range(attached):
+                cursor.execute('DETACH DATABASE shard_%d' % shard)
+            if self._governor is not None:
+                self._governor.release(slot)
+
+    def _build_database(self, path, rows, interned):
+        # database gets all objects at once, its inspector is used only for
+        # what is loaded later, like statistics
+        inspector = self._shard_inspector(path)
+        database = Database(path, inspector=inspector)
+        columns = {}
+        for row in rows['column']:
+            columns.setdefault(self.case(row[0]), []).append(row[1:])
+        tables = {}
+        for row in rows['table']:
+            table = Table(self.case(row[0]), database=database,
+                          inspector=inspector)
+            table._columns = self._columns(columns.get(table.name, ()),
+                                           interned)
+            table._indices, table._triggers = {}, {}
+            tables[table.name] = table
+        views = {}
+        for row in rows['view']:
+            view = views[row[0]] = View(row[0], database=database,
+                                        inspector=inspector)
+            view.sql = row[1]
+            view._columns = self._columns(columns.get(self.case(row[0]), ()),
+                                          interned)
+        index_columns = {}
+        for row in sorted(rows['index_column'], key=lambda row: row[3]):
+            index_columns.setdefault(row[1], []).append(row[2])
+        indices = {}
+        for row in rows['index']:
+            name, index = inspector.prepare_index((row[1], row[0], row[2],
+                                                   row[3]))
+            index._columns = tuple(index_columns.get(name, ()))
+            index.database = database
+            indices[name] = index
+            tables[self.case(row[0])]._indices[name] = index
+        foreign_keys = {}
+        # foreign keys are ordered by identifier and position
+        for row in sorted(rows['foreign_key'],
+                          key=lambda row: (row[1], row[5])):
+            foreign_keys.setdefault(self.case(row[0]), []).append(row[1:5])
+        for name, table in tables.items():
+            table._foreign_keys = inspector._prepare_foreign_keys(
+                foreign_keys.get(name, ()))
+        triggers = {}
+        for row in rows['trigger']:
+            trigger = triggers[row[1]] = Trigger(row[1], database=database,
+                                                 inspector=inspector)
+            inspector._parse_trigger(trigger, row[2])
+            tables[self.case(row[0])]._triggers[row[1]] = trigger
+        database._tables, database._views = tables, views
+        database._indices, database._triggers = indices, triggers
+        database._procedures = {}
+        return database
+
+    def _shard_inspector(self, path):
+        inspector = SqliteInspector(path, api=self._api)
+        inspector._include, inspector._exclude = self._include, self._exclude
+        inspector._deadline, inspector._governor = (self._deadline,
+                                                    self._governor)
+        return inspector
+
+    def _columns(self, rows, interned):
+        # rows of pragma table_info without cid identify the columns
+        key = tuple(tuple(row[1:]) for row in rows)
+        columns = interned.get(key)
+        if columns is None:
+            columns = interned[key] = dict(
+                (column.name, column)
+                for column in map(self.prepare_column, rows))
+        return columns
@@ -0,0 +1,821 @@
+#!/usr/bin/python3
+
+'''Simulated PostgreSQL, MySQL and Oracle catalogs for benchmarking inspectors
+without database servers.
+
+The model of the catalog is an ordinary detached Database, either generated
+by generate_database or built from a real one with Database.detach().
+SimulatedApi is a DB-API module stand-in, that recognizes queries of given
+inspector class by their templates and answers them from the model:
+
+    model = generate_database(tables=50000)
+    api = SimulatedApi(PostgresInspector, model, latency=0.001)
+    db = Database('simulated', inspector=PostgresInspector('', api=api))
+
+Every query sleeps for latency seconds, so saved round trips show up as saved
+wall time; executed queries are kept in queries.'''
+
+import re
+from random import Random
+from threading import Lock
+from time import sleep
+
+from .errors import FathomError
+from .fingerprints import (signature, table_data, view_data, index_data,
+                           trigger_data)
+from .inspectors import PostgresInspector, MySqlInspector, OracleInspector
+from .schema import (Database, Table, PartitionedTable, View, Column, Index,
+                     Trigger, ForeignKey, Statistics, Procedure, Argument)
+
+
+def generate_database(tables=100, columns=8, indices=1, foreign_keys=1,
+                      triggers=0.1, views=0.1, procedures=0, seed=0):
+    '''Return detached database with given number of tables, each with given
+    number of columns, secondary indices and foreign keys referencing earlier
+    tables; triggers and views give fraction of tables having one. Every
+    other procedure is a function returning integer.'''
+    random = Random(seed)
+    database = Database('simulated')
+    database._tables, database._views = {}, {}
+    database._indices, database._triggers = {}, {}
+    database._procedures = {}
+    for number in range(tables):
+        table = Table('table_%05d' % number, database=database)
+        table._columns = {'id': Column('id', 'integer', not_null=True)}
+        for column in range(1, columns):
+            if column % 2:
+                table._columns['column_%d' % column] = Column(
+                    'column_%d' % column, 'varchar(%d)' % random.choice(
+                        (20, 80, 255)))
+            else:
+                table._columns['column_%d' % column] = Column(
+                    'column_%d' % column, 'integer', default=0)
+        table._foreign_keys = []
+        for fk_number in range(min(foreign_keys, number)):
+            fk = ForeignKey()
+            fk.columns = ['ref_%d' % fk_number]
+            fk.referenced_table = 'table_%05d' % random.randrange(number)
+            fk.referenced_columns = ['id']
+            table._columns[fk.columns[0]] = Column(fk.columns[0], 'integer')
+            table._foreign_keys.append(fk)
+        rows = random.randrange(100000)
+        table._stats = Statistics(rows=rows, pages=rows // 50 + 1,
+                                  size=rows * 100, index_size=rows * 20,
+                                  scans=random.randrange(1000))
+        database._tables[table.name] = table
+        _add_index(database, table, '%s_pkey' % table.name, ('id',),
+                   unique=True, primary=True)
+        names = [name for name in table._columns if name != 'id']
+        for index_number in range(min(indices, len(names))):
+            _add_index(database, table,
+                       '%s_index_%d' % (table.name, index_number),
+                       (names[index_number],))
+        if random.random() < triggers:
+            trigger = Trigger('%s_trigger' % table.name,
+                              when=random.choice((Trigger.BEFORE,
+                                                  Trigger.AFTER)),
+                              event=random.choice((Trigger.INSERT,
+                                                   Trigger.UPDATE,
+                                                   Trigger.DELETE)),
+                              database=database)
+            trigger._table = table.name
+            database._triggers[trigger.name] = trigger
+        if random.random() < views:
+            view = View('view_%05d' % number, database=database)
+            view._columns = dict(list(table._columns.items())[:3])
+            view.sql = 'SELECT %s FROM %s' % (', '.join(view._columns),
+                                              table.name)
+            database._views[view.name] = view
+    for number in range(procedures):
+        procedure = Procedure('procedure_%05d' % number, database=database)
+        procedure._arguments = dict(
+            ('argument_%d' % argument, 
+             Argument('argument_%d' % argument, 
+                      random.choice(('integer', 'varchar'))))
+            for argument in range(random.randrange(3)))
+        procedure.returns = 'integer' if number % 2 else None
+        procedure.sql = 'BEGIN NULL; END'
+        database._procedures[procedure.name] = procedure
+    return database
+
+
+class SimulatedApi(object):
+
+    '''DB-API module stand-in answering catalog queries of given inspector
+    class from the model database.'''
+
+    Error = FathomError
+
+    def __init__(self, Inspector, model, latency=0.0):
+        for Class in Inspector.__mro__:
+            if Class in SIMULATORS:
+                self._simulator = SIMULATORS[Class](Inspector, model)
+                break
+        else:
+            raise FathomError('Inspector %s cannot be simulated.' %
+                              Inspector.__name__)
+        self.latency = latency
+        self.queries = []
+        self._lock = Lock()
+
+    def connect(self, *args, **kwargs):
+        return _Connection(self)
+
+    # protected:
+
+    def _execute(self, sql):
+        with self._lock:
+            self.queries.append(sql)
+        if self.latency:
+            sleep(self.latency)
+        return self._simulator.execute(sql)
+
+
+class _Connection(object):
+
+    def __init__(self, api):
+        self._api = api
+
+    def cursor(self, *args, **kwargs):
+        return _Cursor(self._api)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _Cursor(object):
+
+    def __init__(self, api):
+        self._api = api
+        self._rows = []
+
+    def execute(self, sql, parameters=None):
+        self._rows = self._api._execute(sql)
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        pass
+
+
+class _Query(object):
+
+    # values of placeholders of a recognized query; filter is predicate of
+    # the first name filter placeholder
+
+    def __init__(self, names, values):
+        self.values = values
+        self.named = dict(zip(names, values))
+        filters = [value for name, value in zip(names, values)
+                   if name and name.startswith('filter ')]
+        self.filter = filters[0] if filters else None
+
+
+class _Simulator(object):
+
+    # maps attributes holding query templates of the inspector to methods
+    # answering them; subclasses provide rows in format of their inspectors
+    HANDLERS = {}
+
+    def __init__(self, Inspector, model):
+        self.Inspector = Inspector
+        self.schema = 'public'
+        self.tables = dict((self.name(table.name), table)
+                           for table in model.tables.values())
+        self.views = dict((self.name(view.name), view)
+                          for view in model.views.values())
+        self._sorted_tables = sorted(self.tables.items())
+        self.procedures = dict((self.name(procedure.name), procedure)
+                               for procedure in model.procedures.values())
+        # lookups answering per object queries without scanning the model
+        self.indices, self.triggers, self._named_indices = {}, {}, {}
+        for index in model.indices.values():
+            self.indices.setdefault(self.name(index.table), []).append(index)
+            self._named_indices.setdefault(self.index_name(index), 
+                                           []).append(index)
+        for trigger in model.triggers.values():
+            self.triggers.setdefault(self.name(trigger.table), []).append(
+                trigger)
+        self._templates = []
+        for attribute, handler in self.HANDLERS.items():
+            template = getattr(Inspector, attribute, None)
+            if template is not None:
+                pattern, names = _compile(template)
+                self._templates.append((pattern, names,
+                                        getattr(self, handler)))
+
+    def execute(self, sql):
+        for pattern, names, handler in self._templates:
+            match = pattern.match(sql)
+            if match is not None:
+                return handler(_Query(names, match.groups()))
+        raise FathomError('Query is not simulated: %s' % sql)
+
+    def name(self, name):
+        return name
+
+    def matching_tables(self, query):
+        return [(name, table) for name, table in self._sorted_tables
+                if _matches(query.filter, name)]
+
+    def column_rows(self, name):
+        obj = self.tables.get(name) or self.views.get(name)
+        if obj is None:
+            return []
+        return [self.column_row(column) for column in obj._columns.values()]
+
+    def table_indices(self, name):
+        return self.indices.get(name, ())
+
+    def index_name(self, index):
+        return self.name(index.base_name)
+
+    def index_columns(self, index):
+        return [self.name(column) for column in index._columns]
+
+    def index_column_names(self, query):
+        # index names are not unique in every system, the query returns
+        # columns of all indices of given name then
+        return [(column,) 
+                for index in self._named_indices.get(query.values[0], ())
+                for column in self.index_columns(index)]
+
+    def fk_name(self, table, number):
+        return self.name('%s_fk_%d' % (table, number))
+
+    def foreign_key_rows(self, name):
+        # constraint, referenced table, column, referenced column, position
+        rows = []
+        for number, fk in enumerate(self.tables[name]._foreign_keys):
+            for position, (column, referenced) in enumerate(
+                    zip(fk.columns, fk.referenced_columns), 1):
+                rows.append((self.fk_name(name, number),
+                             self.name(fk.referenced_table), self.name(column),
+                             self.name(referenced), position))
+        return rows
+
+    def stats(self, obj):
+        stats = obj._stats or Statistics()
+        return (stats.rows, stats.pages, stats.size, stats.index_size,
+                stats.scans)
+
+    # handlers shared by all simulated systems
+
+    def version(self, query):
+        return [(self.VERSION,)]
+
+    def nothing(self, query):
+        return []
+
+    def procedure_arguments(self, query):
+        procedure = self.procedures.get(self.name(query.values[0]))
+        if procedure is None:
+            return []
+        return [(self.name(argument.name), self.type_name(argument.type))
+                for argument in procedure._arguments.values()]
+
+    def all_procedure_arguments(self, query):
+        return [(name, self.name(argument.name), self.type_name(argument.type))
+                for name, procedure in sorted(self.procedures.items())
+                for argument in procedure._arguments.values()]
+
+    def all_columns(self, query):
+        objects = sorted(list(self.tables.items()) + list(self.views.items()))
+        return [(name,) + self.column_row(column)
+                for name, obj in objects if _matches(query.filter, name)
+                for column in obj._columns.values()]
+
+    def all_foreign_keys(self, query):
+        return [(name,) + row[:4] for name, table in self.matching_tables(query)
+                for row in self.foreign_key_rows(name)]
+
+    def all_index_columns(self, query):
+        return [(name, self.index_name(index), column)
+                for name, table in self.matching_tables(query)
+                for index in self.table_indices(name)
+                for column in self.index_columns(index)]
+
+    def partition_rows(self, table):
+        if not isinstance(table, PartitionedTable):
+            return []
+        return [(partition.name, partition.bound, partition.tablespace,
+                 partition.is_partitioned)
+                for name, partition in sorted(table._partitions.items())]
+
+    def change_markers(self, query):
+        # signatures of model objects serve as their markers; partitions
+        # are part of the marker of their table
+        rows = []
+        for name, table in self.matching_tables(query):
+            rows.append(('table', name, name, signature(
+                (table_data(table), self.partition_rows(table)))))
+            rows.extend(('index', self.index_name(index), name,
+                         signature(index_data(index)))
+                        for index in self.table_indices(name))
+            rows.extend(('trigger', self.name(trigger.name), name,
+                         signature(trigger_data(trigger)))
+                        for trigger in self.triggers.get(name, ()))
+        rows.extend(('view', name, name, signature(view_data(view)))
+                    for name, view in sorted(self.views.items())
+                    if _matches(query.filter, name))
+        return rows
+
+    def schema_version(self, query):
+        return [(signature(self.change_markers(query)),)]
+
+    def bundle_table_row(self, name):
+        return (name,)
+
+    def table_bundle(self, query):
+        # rows of every kind are placed into their slice of a wide row
+        name = query.named['table']
+        if name not in self.tables:
+            return []
+        kinds = [('table', [self.bundle_table_row(name)]),
+                 ('column', self.column_rows(name)),
+                 ('index', [self.index_row(name, index)
+                            for index in self.table_indices(name)]),
+                 ('index_column', [(self.index_name(index), column, position)
+                                   for index in self.table_indices(name)
+                                   for position, column in enumerate(
+                                       self.index_columns(index), 1)]),
+                 ('foreign_key', self.foreign_key_rows(name)),
+                 ('trigger', [self.trigger_row(name, trigger)
+                              for trigger in self.triggers.get(name, ())])]
+        layout = self.Inspector._TABLE_BUNDLE_LAYOUT
+        width = max(stop for start, stop in layout.values())
+        rows = []
+        for kind, kind_rows in kinds:
+            start, stop = layout[kind]
+            for row in kind_rows:
+                wide = [None] * width
+                wide[0] = kind
+                wide[start:stop] = row
+                rows.append(tuple(wide))
+        return rows
+
+
+class _PostgresSimulator(_Simulator):
+
+    VERSION = 'PostgreSQL 16.2 on x86_64-pc-linux-gnu'
+
+    HANDLERS = {'_VERSION_SQL': 'version',
+                '_SCHEMA_NAMES_SQL': 'schema_names',
+                '_TABLE_NAMES_SQL': 'table_names',
+                '_VIEW_NAMES_SQL': 'view_names',
+                '_TRIGGER_NAMES_SQL': 'trigger_names',
+                '_INDEX_NAMES_SQL': 'index_names',
+                '_PROCEDURE_NAMES_SQL': 'procedure_names',
+                '_PROCEDURE_ARGUMENTS_SQL': 'procedure_arguments',
+                '_ALL_PROCEDURE_ARGUMENTS_SQL': 'all_procedure_arguments',
+                '_TYPES_SQL': 'type_names',
+                '_PARTITIONS_SQL': 'partitions',
+                '_COLUMN_NAMES_SQL': 'column_names',
+                '_INDEX_COLUMNS_SQL': 'index_column_names',
+                '_FOREIGN_KEYS_SQL': 'foreign_keys',
+                '_ALL_COLUMNS_SQL': 'all_columns',
+                '_ALL_FOREIGN_KEYS_SQL': 'all_foreign_keys',
+                '_ALL_INDEX_COLUMNS_SQL': 'all_index_columns',
+                '_STATS_SQL': 'stats_rows',
+                '_CHANGE_MARKERS_SQL': 'change_markers',
+                '_SCHEMA_VERSION_SQL': 'schema_version',
+                '_TABLE_BUNDLE_SQL': 'table_bundle'}
+
+    EVENT_BITS = {Trigger.INSERT: PostgresInspector._INSERT_BIT,
+                  Trigger.DELETE: PostgresInspector._DELETE_BIT,
+                  Trigger.UPDATE: PostgresInspector._UPDATE_BIT}
+
+    TYPE_OIDS = {'integer': 23, 'varchar': 1043, None: 2278}
+    TYPE_NAMES = {23: 'integer', 1043: 'varchar', 2278: 'void'}
+
+    def in_schemas(self, query):
+        return ("'%s'" % self.schema) in query.named['schemas']
+
+    def column_row(self, column):
+        if column.type.startswith('varchar'):
+            data_type, length = 'character varying', int(column.type[8:-1])
+        else:
+            data_type, length = column.type, None
+        default = str(column.default) if column.default is not None else None
+        return (column.name, data_type, length,
+                'NO' if column.not_null else 'YES', default)
+
+    def index_row(self, table, index):
+        definition = 'CREATE %sINDEX %s ON %s.%s USING %s (%s)' % (
+            'UNIQUE ' if index.is_unique else '', index.base_name,
+            self.schema, table, index.method or 'btree', 
+            ', '.join(index._columns))
+        if index.predicate is not None:
+            definition += ' WHERE %s' % index.predicate
+        return (index.base_name, table, index.is_unique, definition,
+                index.is_primary)
+
+    def trigger_row(self, table, trigger):
+        bitmask = self.EVENT_BITS[trigger.event]
+        if trigger.when == Trigger.BEFORE:
+            bitmask |= PostgresInspector._BEFORE_BIT
+        # oid of the table is not used by the inspector
+        return (trigger.name, table, None, bitmask)
+
+    def schema_names(self, query):
+        return [(self.schema,)]
+
+    def table_names(self, query):
+        if not self.in_schemas(query):
+            return []
+        return [(name, isinstance(table, PartitionedTable), self.schema)
+                for name, table in self.matching_tables(query)]
+
+    def bundle_table_row(self, name):
+        partitioned = isinstance(self.tables[name], PartitionedTable)
+        return (name, 'p' if partitioned else None)
+
+    def view_names(self, query):
+        if not self.in_schemas(query):
+            return []
+        return [(name, view.sql, self.schema)
+                for name, view in sorted(self.views.items())
+                if _matches(query.filter, name)]
+
+    def trigger_names(self, query):
+        if not self.in_schemas(query):
+            return []
+        return [self.trigger_row(name, trigger) + (self.schema,)
+                for name, table in self.matching_tables(query)
+                for trigger in self.triggers.get(name, ())]
+
+    def index_names(self, query):
+        if not self.in_schemas(query):
+            return []
+        return [self.index_row(name, index) + (self.schema,)
+                for name, table in self.matching_tables(query)
+                for index in self.table_indices(name)]
+
+    def partitions(self, query):
+        table = self.tables.get(query.values[0])
+        return self.partition_rows(table) if table is not None else []
+
+    def procedure_oids(self, procedure):
+        return ' '.join(str(self.TYPE_OIDS[argument.type])
+                        for argument in procedure._arguments.values())
+
+    def procedure_names(self, query):
+        if not self.in_schemas(query):
+            return []
+        return [(name, self.procedure_oids(procedure), procedure.sql,
+                 self.TYPE_OIDS[procedure.returns], self.schema)
+                for name, procedure in sorted(self.procedures.items())]
+
+    def procedure_arguments(self, query):
+        procedure = self.procedures.get(query.values[0])
+        if procedure is None:
+            return []
+        return [(list(procedure._arguments), self.procedure_oids(procedure),
+                 None)]
+
+    def all_procedure_arguments(self, query):
+        if query.named['schema'] != self.schema:
+            return []
+        return [(name, self.procedure_oids(procedure),
+                 list(procedure._arguments))
+                for name, procedure in sorted(self.procedures.items())]
+
+    def type_names(self, query):
+        return [(int(oid), self.TYPE_NAMES[int(oid)])
+                for oid in query.values[0].split(', ')]
+
+    def column_names(self, query):
+        return self.column_rows(query.values[0])
+
+    def foreign_keys(self, query):
+        # column names are resolved in the query itself
+        table = self.tables.get(query.values[0])
+        if table is None:
+            return []
+        return [(fk.referenced_table, list(fk.columns),
+                 list(fk.referenced_columns))
+                for fk in table._foreign_keys]
+
+
+    def stats_rows(self, query):
+        rows = []
+        for name, table in self.matching_tables(query):
+            rows.append(('table', name, name) + self.stats(table))
+            for index in self.table_indices(name):
+                stats = self.stats(index)
+                rows.append(('index', name, index.base_name) + stats[:3] +
+                            (None, stats[4]))
+        return rows
+
+
+class _MySqlSimulator(_Simulator):
+
+    VERSION = '8.0.36'
+
+    HANDLERS = {'_VERSION_SQL': 'version',
+                '_TABLE_NAMES_SQL': 'table_names',
+                '_VIEW_NAMES_SQL': 'view_names',
+                '_PROCEDURE_NAMES_SQL': 'procedure_names',
+                '_PROCEDURE_ARGUMENTS_SQL': 'procedure_arguments',
+                '_ALL_PROCEDURE_ARGUMENTS_SQL': 'all_procedure_arguments',
+                '_TRIGGER_NAMES_SQL': 'trigger_names',
+                '_COLUMN_NAMES_SQL': 'column_names',
+                '_INDEX_NAMES_SQL': 'index_names',
+                '_INDEX_COLUMNS_SQL': 'index_column_names',
+                '_FOREIGN_KEYS_SQL': 'foreign_keys',
+                '_ALL_COLUMNS_SQL': 'all_columns',
+                '_ALL_FOREIGN_KEYS_SQL': 'all_foreign_keys',
+                '_ALL_INDEX_COLUMNS_SQL': 'all_index_columns',
+                '_STATS_SQL': 'stats_rows',
+                '_CHANGE_MARKERS_SQL': 'change_markers',
+                '_SCHEMA_VERSION_SQL': 'schema_version',
+                '_TABLE_BUNDLE_SQL': 'table_bundle'}
+
+    EVENTS = {Trigger.INSERT: 'INSERT', Trigger.UPDATE: 'UPDATE',
+              Trigger.DELETE: 'DELETE'}
+
+    def column_row(self, column):
+        if column.type.startswith('varchar'):
+            data_type, length = 'varchar', int(column.type[8:-1])
+        else:
+            data_type, length = 'int', None
+        default = str(column.default) if column.default is not None else None
+        return (column.name, data_type, length,
+                'NO' if column.not_null else 'YES', default)
+
+    def index_row(self, table, index):
+        return (self.index_name(index), table, int(not index.is_unique))
+
+    def index_name(self, index):
+        return 'PRIMARY' if index.is_primary else index.base_name
+
+    def trigger_row(self, table, trigger):
+        when = 'BEFORE' if trigger.when == Trigger.BEFORE else 'AFTER'
+        return (trigger.name, table, self.EVENTS[trigger.event], when)
+
+    def type_name(self, type):
+        return 'int' if type == 'integer' else type
+
+    def table_names(self, query):
+        return [(name,) for name, table in self.matching_tables(query)]
+
+    def view_names(self, query):
+        return [(name, view.sql) for name, view in sorted(self.views.items())
+                if _matches(query.filter, name)]
+
+    def procedure_names(self, query):
+        return [(name, self.type_name(procedure.returns), procedure.sql)
+                for name, procedure in sorted(self.procedures.items())]
+
+    def trigger_names(self, query):
+        return [self.trigger_row(name, trigger)
+                for name, table in self.matching_tables(query)
+                for trigger in self.triggers.get(name, ())]
+
+    def column_names(self, query):
+        return self.column_rows(query.values[0])
+
+    def index_names(self, query):
+        # statistics view has a row for every column of every index
+        return [self.index_row(name, index)
+                for name, table in self.matching_tables(query)
+                for index in self.table_indices(name)
+                for column in index._columns]
+
+    def foreign_keys(self, query):
+        name = query.values[0]
+        if name not in self.tables:
+            return []
+        return [(row[0], row[2], row[1], row[3])
+                for row in self.foreign_key_rows(name)]
+
+    def stats_rows(self, query):
+        rows = []
+        for name, table in self.matching_tables(query):
+            stats = self.stats(table)
+            rows.append(('table', name, name, stats[0], None, stats[2],
+                         stats[3], None))
+        return rows
+
+
+class _OracleSimulator(_Simulator):
+
+    HANDLERS = {'_TABLE_NAMES_SQL': 'table_names',
+                '_VIEW_NAMES_SQL': 'view_names',
+                '_TRIGGER_NAMES_SQL': 'trigger_names',
+                '_PROCEDURE_NAMES_SQL': 'procedure_names',
+                '_FUNCTION_NAMES_SQL': 'function_names',
+                '_ARGUMENTS_SQL': 'procedure_arguments',
+                '_ALL_ARGUMENTS_SQL': 'all_procedure_arguments',
+                '_COLUMN_NAMES_SQL': 'column_names',
+                '_INDEX_NAMES_SQL': 'index_names',
+                '_INDEX_COLUMNS_SQL': 'index_column_names',
+                '_TRIGGER_INFO_SQL': 'trigger_info',
+                '_ALL_TRIGGERS_INFO_SQL': 'all_triggers_info',
+                '_FOREIGN_KEYS_SQL': 'foreign_keys',
+                '_ALL_COLUMNS_SQL': 'all_columns',
+                '_ALL_FOREIGN_KEYS_SQL': 'all_foreign_keys',
+                '_ALL_INDEX_COLUMNS_SQL': 'all_index_columns',
+                '_STATS_SQL': 'stats_rows',
+                '_CHANGE_MARKERS_SQL': 'change_markers',
+                '_SCHEMA_VERSION_SQL': 'schema_version',
+                '_TABLE_BUNDLE_SQL': 'table_bundle'}
+
+    EVENTS = _MySqlSimulator.EVENTS
+
+    def name(self, name):
+        return name.upper()
+
+    def column_row(self, column):
+        if column.type.startswith('varchar'):
+            data_type, length = 'VARCHAR2', int(column.type[8:-1])
+        else:
+            data_type, length = 'NUMBER', 22
+        default = str(column.default) if column.default is not None else None
+        return (self.name(column.name), data_type, length, default,
+                'N' if column.not_null else 'Y')
+
+    def index_row(self, table, index):
+        return (self.index_name(index), table,
+                'UNIQUE' if index.is_unique else 'NONUNIQUE',
+                int(index.is_primary))
+
+    def trigger_row(self, table, trigger):
+        when = 'BEFORE' if trigger.when == Trigger.BEFORE else 'AFTER'
+        return (self.name(trigger.name), table, '%s EACH ROW' % when,
+                self.EVENTS[trigger.event])
+
+    def all_triggers(self):
+        return [self.trigger_row(name, trigger)
+                for name, triggers in sorted(self.triggers.items())
+                for trigger in triggers]
+
+    def type_name(self, type):
+        return 'NUMBER' if type == 'integer' else 'VARCHAR2'
+
+    def table_names(self, query):
+        return [(name,) for name, table in self.matching_tables(query)]
+
+    def view_names(self, query):
+        return [(name, view.sql) for name, view in sorted(self.views.items())
+                if _matches(query.filter, name)]
+
+    def procedure_names(self, query):
+        return [(name,) for name, procedure in sorted(self.procedures.items())
+                if procedure.returns is None]
+
+    def function_names(self, query):
+        return [(name, self.type_name(procedure.returns))
+                for name, procedure in sorted(self.procedures.items())
+                if procedure.returns is not None]
+
+    def trigger_names(self, query):
+        return [(self.name(trigger.name),)
+                for name, table in self.matching_tables(query)
+                for trigger in self.triggers.get(name, ())]
+
+    def column_names(self, query):
+        return self.column_rows(query.values[0])
+
+    def index_names(self, query):
+        return [self.index_row(name, index)
+                for name, table in self.matching_tables(query)
+                for index in self.table_indices(name)]
+
+    def trigger_info(self, query):
+        return [row[1:] for row in self.all_triggers()
+                if row[0] == query.values[0]]
+
+    def all_triggers_info(self, query):
+        return self.all_triggers()
+
+    def foreign_keys(self, query):
+        name = self.name(query.values[0])
+        if name not in self.tables:
+            return []
+        return [row[:4] for row in self.foreign_key_rows(name)]
+
+    def stats_rows(self, query):
+        rows = []
+        for name, table in self.matching_tables(query):
+            stats = self.stats(table)
+            rows.append(('table', name, name) + stats[:3] + (None, None))
+        for name, table in self.matching_tables(query):
+            for index in self.table_indices(name):
+                stats = self.stats(index)
+                rows.append(('index', name, self.name(index.base_name)) +
+                            stats[:3] + (None, None))
+        return rows
+
+
+# the most specific simulator is chosen by inspector class
+SIMULATORS = {PostgresInspector: _PostgresSimulator,
+              MySqlInspector: _MySqlSimulator,
+              OracleInspector: _OracleSimulator}
+
+# protected:
+
+def _add_index(database, table, name, columns, unique=False, primary=False):
+    index = Index(name, table.name, database=database)
+    index._columns = columns
+    index.is_unique = unique
+    index.is_primary = primary
+    index._stats = Statistics(rows=table._stats.rows,
+                              pages=table._stats.pages // 4 + 1,
+                              size=table._stats.index_size // 2,
+                              scans=table._stats.scans)
+    database._indices[name] = index
+
+_PLACEHOLDER = re.compile(r'%(?:\(([^)]*)\))?([s%])')
+
+def _compile(template):
+    # template is turned into a pattern with a group for every placeholder
+    pattern, names, position = [], [], 0
+    for match in _PLACEHOLDER.finditer(template):
+        pattern.append(re.escape(template[position:match.start()]))
+        if match.group(2) == '%':
+            pattern.append('%')
+        else:
+            pattern.append('(.*?)')
+            names.append(match.group(1))
+        position = match.end()
+    pattern.append(re.escape(template[position:]))
+    return re.compile(''.join(pattern) + r'\Z', re.DOTALL), names
+
+# name filters are rendered by inspectors as predicates made of IN and LIKE
+# conditions; they are evaluated here on their tokens
+
+_TOKEN = re.compile(r"'(?:[^']|'')*'|\w+|[^\s\w]")
+
+def _matches(predicate, name):
+    if predicate is None:
+        return True
+    tokens = _TOKEN.findall(predicate)
+    if tokens == ['1', '=', '1']:
+        return True
+    position, result = 0, True
+    while position < len(tokens):
+        negate = tokens[position].upper() == 'NOT'
+        position += 2 if negate else 1
+        matched = False
+        while True:
+            value = name
+            if tokens[position].lower() == 'lower':
+                value = name.lower()
+                position = tokens.index(')', position) + 1
+            else:
+                position += 1
+                while tokens[position] == '.':
+                    position += 2
+            operator = tokens[position].upper()
+            if operator == 'IN':
+                end = tokens.index(')', position)
+                values = [_unquote(token) for token
+                          in tokens[position + 2:end] if token != ',']
+                matched = matched or value in values
+                position = end + 1
+            else:
+                pattern = _like(_unquote(tokens[position + 1]),
+                                _unquote(tokens[position + 3]))
+                matched = matched or pattern.match(value) is not None
+                position += 4
+            if position < len(tokens) and tokens[position].upper() == 'OR':
+                position += 1
+            else:
+                break
+        position += 1
+        result = result and matched != negate
+        if position < len(tokens) and tokens[position].upper() == 'AND':
+            position += 1
+    return result
+
+def _unquote(token):
+    return token[1:-1].replace("''", "'")
+
+def _like(pattern, escape):
+    regex, escaped = [], False
+    for char in pattern:
+        if escaped:
+            regex.append(re.escape(char))
+            escaped = False
+        elif char == escape:
+            escaped = True
+        elif char == '%':
+            regex.append('.*')
+        elif char == '_':
+            regex.append('.')
+        else:
+            regex.append(re.escape(char))
+    return re.compile(''.join(regex) + r'\Z', re.DOTALL)
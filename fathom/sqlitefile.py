@@ -0,0 +1,1105 @@
+#!/usr/bin/python3
+
+'''Reading schema of SQLite databases straight from their files.
+
+SqliteFileInspector maps the database file into memory and walks the
+sqlite_master b-tree rooted on page 1 itself, without opening a sqlite3
+connection, running queries or taking locks. Tables, views, indices and
+triggers are built from the DDL stored there, the way SQLite itself
+describes them in its pragmas, which makes audits of many shard files
+cheap:
+
+    db = Database(path, inspector=SqliteFileInspector(path))
+
+The file is only read, never locked. When the file change counter moves
+while sqlite_master is read, reading is retried. Changes kept in a
+write-ahead log, that were not checkpointed yet, are not visible. Columns
+of views are derived from their select lists; types are exact for column
+references and empty for other expressions, as in SQLite. Columns of
+virtual tables and statistics are not available.'''
+
+import mmap
+import re
+from struct import error as StructError, unpack_from
+
+from .errors import FathomError, FathomParsingError
+from .inspectors import SqliteInspector
+from .schema import Statistics, Table, Trigger
+
+
+class SqliteFile(object):
+
+    '''Read-only memory map of a SQLite database file; use it as a context
+    manager, so that the map is closed.'''
+
+    MAGIC = b'SQLite format 3\x00'
+    ENCODINGS = {0: 'utf-8', 1: 'utf-8', 2: 'utf-16-le', 3: 'utf-16-be'}
+
+    # table b-tree page types
+    INTERIOR_PAGE, LEAF_PAGE = 5, 13
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            try:
+                self._map = mmap.mmap(file.fileno(), 0,
+                                      access=mmap.ACCESS_READ)
+            except ValueError:
+                # file of a new database is empty until a table is created
+                self._map = None
+        self._view = None
+        if self._map is None:
+            self.page_size = self.encoding = None
+            return
+        if self._map[:16] != self.MAGIC:
+            self.close()
+            raise FathomError('%s is not a SQLite database.' % path)
+        page_size = unpack_from('>H', self._map, 16)[0]
+        self.page_size = 65536 if page_size == 1 else page_size
+        self._usable = self.page_size - self._map[20]
+        self.encoding = self.ENCODINGS.get(
+            unpack_from('>I', self._map, 56)[0])
+        if self.encoding is None or self.page_size < 512:
+            self.close()
+            raise FathomError('%s is not a SQLite database.' % path)
+        self._view = memoryview(self._map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            if self._view is not None:
+                self._view.release()
+            self._map.close()
+            self._map = None
+
+    @property
+    def change_counter(self):
+        return self._header_number(24)
+
+    @property
+    def schema_version(self):
+        return self._header_number(40)
+
+    def master(self):
+        '''Return rows of sqlite_master as tuples of type, name, tbl_name,
+        rootpage and sql.'''
+        if self._map is None:
+            return []
+        # payloads are slices of the map, which cannot be closed while any
+        # of them is alive; the error is raised only after the traceback
+        # holding frames with slices is gone
+        try:
+            rows = self._rows()
+        except (FathomError, IndexError, StructError, UnicodeDecodeError):
+            rows = None
+        if rows is None:
+            raise FathomError('Schema of %s is corrupt.' % self.path)
+        return rows
+
+    # protected:
+
+    def _header_number(self, offset):
+        if self._map is None:
+            return 0
+        return unpack_from('>I', self._map, offset)[0]
+
+    def _rows(self):
+        return [tuple(self._record(payload)[:5])
+                for payload in self._payloads(1)]
+
+    def _payloads(self, root):
+        # payloads of leaf cells of the table b-tree in order of rowids;
+        # cells are read in place, only overflowing payloads are copied
+        stack, seen = [root], set()
+        pages = len(self._map) // self.page_size
+        while stack:
+            page = stack.pop()
+            if page in seen or not 0 < page <= pages:
+                raise FathomError('Schema of %s is corrupt.' % self.path)
+            seen.add(page)
+            offset = (page - 1) * self.page_size
+            header = offset + 100 if page == 1 else offset
+            kind = self._map[header]
+            cells = unpack_from('>H', self._map, header + 3)[0]
+            if kind == self.INTERIOR_PAGE:
+                pointers = header + 12
+                children = [unpack_from('>I', self._map, offset + pointer)[0]
+                            for pointer in self._pointers(pointers, cells)]
+                children.append(unpack_from('>I', self._map, header + 8)[0])
+                stack.extend(reversed(children))
+            elif kind == self.LEAF_PAGE:
+                for pointer in self._pointers(header + 8, cells):
+                    size, cell = _varint(self._map, offset + pointer)
+                    rowid, cell = _varint(self._map, cell)
+                    yield self._payload(cell, size)
+            else:
+                raise FathomError('Schema of %s is corrupt.' % self.path)
+
+    def _pointers(self, start, count):
+        return (unpack_from('>H', self._map, start + 2 * cell)[0]
+                for cell in range(count))
+
+    def _payload(self, start, size):
+        usable = self._usable
+        largest = usable - 35
+        if size <= largest:
+            return self._view[start:start + size]
+        smallest = (usable - 12) * 32 // 255 - 23
+        local = smallest + (size - smallest) % (usable - 4)
+        if local > largest:
+            local = smallest
+        parts = [self._view[start:start + local]]
+        remaining = size - local
+        page = unpack_from('>I', self._map, start + local)[0]
+        while remaining > 0:
+            if page == 0:
+                raise FathomError('Schema of %s is corrupt.' % self.path)
+            offset = (page - 1) * self.page_size
+            chunk = min(remaining, usable - 4)
+            parts.append(self._view[offset + 4:offset + 4 + chunk])
+            remaining -= chunk
+            page = unpack_from('>I', self._map, offset)[0]
+        return b''.join(parts)
+
+    def _record(self, payload):
+        header_size, position = _varint(payload, 0)
+        types = []
+        while position < header_size:
+            type, position = _varint(payload, position)
+            types.append(type)
+        values = []
+        position = header_size
+        for type in types:
+            if type == 0 or type in (8, 9):
+                values.append(None if type == 0 else type - 8)
+                continue
+            if type <= 6:
+                size = (1, 2, 3, 4, 6, 8)[type - 1]
+                values.append(int.from_bytes(payload[position:position + size],
+                                             'big', signed=True))
+            elif type == 7:
+                size = 8
+                values.append(unpack_from('>d', payload, position)[0])
+            elif type >= 12:
+                size = (type - 12) // 2
+                value = payload[position:position + size]
+                values.append(str(value, self.encoding) if type % 2
+                              else bytes(value))
+            else:
+                raise FathomError('Schema of %s is corrupt.' % self.path)
+            position += size
+        return values + [None] * (5 - len(values))
+
+
+class SqliteFileInspector(SqliteInspector):
+
+    '''Inspector reading schema of a SQLite database from its file, without
+    sqlite3 module.'''
+
+    # times sqlite_master is read again, when the file changes meanwhile
+    RETRIES = 3
+
+    def __init__(self, path):
+        SqliteInspector.__init__(self, path, api=_NoApi)
+        self.path = path
+        self._cache = {}
+
+    def get_tables(self):
+        return {self.case(row[1]): Table(self.case(row[1]), inspector=self)
+                for row in self._master('table')}
+
+    def get_views(self):
+        return dict(self.prepare_view((row[1], row[4]))
+                    for row in self._master('view'))
+
+    def get_indices(self):
+        schema = self._schema()
+        return dict(self.prepare_index(schema.index_row(row))
+                    for row in self._master('index', schema))
+
+    def get_triggers(self):
+        return dict((row[1], Trigger(row[1], inspector=self))
+                    for row in self._master('trigger'))
+
+    def build_columns(self, schema_object):
+        rows = self._schema().column_rows(schema_object.name)
+        schema_object.columns = dict((row[1].lower(), self.prepare_column(row))
+                                     for row in rows)
+
+    def build_all_columns(self, schema_objects):
+        schema = self._schema()
+        for schema_object in schema_objects:
+            columns = [self.prepare_column(row)
+                       for row in schema.column_rows(schema_object.name)]
+            schema_object.columns = dict((column.name, column)
+                                         for column in columns)
+
+    def build_foreign_keys(self, table):
+        table.foreign_keys = self._prepare_foreign_keys(
+            self._schema().foreign_key_rows(table.name))
+
+    def build_all_foreign_keys(self, tables):
+        schema = self._schema()
+        for table in tables:
+            table.foreign_keys = self._prepare_foreign_keys(
+                schema.foreign_key_rows(table.name))
+
+    def get_index_columns(self, index):
+        return self._schema().index_columns(index.name)
+
+    def build_all_index_columns(self, indices):
+        schema = self._schema()
+        for index in indices:
+            index.columns = schema.index_columns(index.base_name)
+
+    def build_all_stats(self, tables, indices):
+        for obj in list(tables) + list(indices):
+            obj.stats = Statistics()
+
+    def build_trigger(self, trigger):
+        self._parse_trigger(trigger, self._schema().sql('trigger',
+                                                        trigger.name))
+
+    def build_all_triggers(self, triggers):
+        schema = self._schema()
+        for trigger in triggers:
+            self._parse_trigger(trigger, schema.sql('trigger', trigger.name))
+
+    def get_table(self, name, database=None):
+        table = Table(name, database=database, inspector=self)
+        self.build_table(table)
+        return table
+
+    def build_table(self, table):
+        schema = self._schema()
+        if schema.sql('table', table.name) is None:
+            raise FathomError('Table %s does not exist.' % table.name)
+        table.columns = dict(
+            (column.name, column) for column
+            in map(self.prepare_column, schema.column_rows(table.name)))
+        indices = {}
+        for row in schema.rows('index', table.name):
+            name, index = self.prepare_index(schema.index_row(row))
+            index.columns = schema.index_columns(name)
+            index.database = table.database
+            indices[name] = index
+        table.indices = indices
+        table.foreign_keys = self._prepare_foreign_keys(
+            schema.foreign_key_rows(table.name))
+        triggers = {}
+        for row in schema.rows('trigger', table.name):
+            trigger = Trigger(row[1], inspector=self,
+                              database=table.database)
+            self._parse_trigger(trigger, row[4])
+            triggers[row[1]] = trigger
+        table.triggers = triggers
+
+    def get_schema_version(self):
+        return (self._schema().key[1],)
+
+    def get_change_markers(self):
+        return self._prepare_change_markers(
+            row[:3] + row[4:] for row in self._master()
+            if row[0] in ('table', 'view', 'index', 'trigger'))
+
+    def drop_table(self, table):
+        raise FathomError('Database file %s is inspected read only.' %
+                          self.path)
+
+    # protected:
+
+    def _select(self, sql, stream=False):
+        raise FathomError('Database file %s cannot be queried.' % self.path)
+
+    def _master(self, type=None, schema=None):
+        schema = schema if schema is not None else self._schema()
+        return [row for row in schema.rows(type)
+                if self._name_matches(row[2])]
+
+    def _schema(self):
+        # parsed schema is kept until the file changes; it is shared with
+        # copies of the inspector
+        if self._deadline is not None:
+            self._remaining()
+        for attempt in range(self.RETRIES):
+            with SqliteFile(self.path) as file:
+                key = (file.change_counter, file.schema_version)
+                schema = self._cache.get('schema')
+                if schema is not None and schema.key == key:
+                    return schema
+                try:
+                    rows = file.master()
+                except FathomError:
+                    if attempt + 1 == self.RETRIES:
+                        raise
+                    continue
+                if (file.change_counter, file.schema_version) == key:
+                    schema = self._cache['schema'] = _Schema(rows, key)
+                    return schema
+        raise FathomError('Database file %s kept changing while it was '
+                          'read.' % self.path)
+
+
+class _NoApi(object):
+
+    Error = FathomError
+
+
+class _Schema(object):
+
+    '''Rows of sqlite_master with object descriptions derived from their
+    DDL in shape of rows of SQLite pragmas.'''
+
+    def __init__(self, rows, key):
+        # change counter and schema version of the file
+        self.key = key
+        self._rows = rows
+        self._all = dict(((row[0], row[1].lower()), row) for row in rows)
+        self._tables = {}
+        self._views = {}
+        self._indices = {}
+
+    def rows(self, type=None, table=None):
+        return [row for row in self._rows
+                if (type is None or row[0] == type) and
+                   (table is None or row[2].lower() == table.lower())]
+
+    def sql(self, type, name):
+        row = self._all.get((type, name.lower()))
+        return row[4] if row is not None else None
+
+    def table(self, name):
+        # definitions are parsed once per schema
+        name = name.lower()
+        if name not in self._tables:
+            sql = self.sql('table', name)
+            self._tables[name] = (_TableDefinition(sql) if sql is not None
+                                  else None)
+        return self._tables[name]
+
+    def column_rows(self, name):
+        '''Return rows of pragma table_info of a table or view.'''
+        table = self.table(name)
+        if table is not None:
+            return [(cid, column.name, column.type, int(column.not_null),
+                     column.default, column.key)
+                    for cid, column in enumerate(table.columns)]
+        return [(cid, column, type, 0, None, 0) for cid, (column, type)
+                in enumerate(self.view_columns(name))]
+
+    def view_columns(self, name, parents=()):
+        name = name.lower()
+        if name not in self._views:
+            sql = self.sql('view', name)
+            if sql is None or name in parents:
+                return []
+            self._views[name] = _ViewParser(
+                sql, lambda source: self._source(source, parents + (name,))
+            ).columns()
+        return self._views[name]
+
+    def foreign_key_rows(self, name):
+        '''Return rows of pragma foreign_key_list of a table, that is id,
+        referenced table, column and referenced column.'''
+        table = self.table(name)
+        if table is None:
+            return []
+        rows = []
+        # SQLite numbers foreign keys from the last one
+        for id, (columns, referenced, referenced_columns) in enumerate(
+                reversed(table.foreign_keys)):
+            for position, column in enumerate(columns):
+                to = (referenced_columns[position]
+                      if position < len(referenced_columns) else None)
+                rows.append((id, referenced, table.column_name(column), to))
+        return rows
+
+    def index_row(self, row):
+        '''Return name, table, uniqueness and primarity of an index.'''
+        if row[4] is None:
+            key = self._automatic_key(row)
+            return (row[1], row[2], 1, int(key is not None and key.primary))
+        return (row[1], row[2], int(self._index(row)[0]), 0)
+
+    def index_columns(self, name):
+        row = self._all.get(('index', name.lower()))
+        if row is None:
+            return ()
+        if row[4] is None:
+            key = self._automatic_key(row)
+            columns = key.columns if key is not None else ()
+        else:
+            columns = self._index(row)[1]
+        table = self.table(row[2])
+        if table is None:
+            return tuple(columns)
+        return tuple(column and table.column_name(column)
+                     for column in columns)
+
+    # protected:
+
+    def _index(self, row):
+        if row[1] not in self._indices:
+            self._indices[row[1]] = _parse_index(row[4])
+        return self._indices[row[1]]
+
+    def _automatic_key(self, row):
+        # automatic indices of UNIQUE and PRIMARY KEY constraints are
+        # numbered in order, in which SQLite creates them
+        table = self.table(row[2])
+        number = row[1][len('sqlite_autoindex_%s_' % row[2]):]
+        if table is None or not number.isdigit():
+            return None
+        keys = table.keys()
+        return keys[int(number) - 1] if int(number) <= len(keys) else None
+
+    def _source(self, name, parents):
+        table = self.table(name)
+        if table is not None:
+            return [(column.name, column.type) for column in table.columns]
+        return self.view_columns(name, parents)
+
+# DDL parsing
+
+_TOKENS = re.compile(r'''
+    (?P<space>\s+|--[^\n]*|/\*.*?(?:\*/|$))
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\])
+  | (?P<blob>[xX]'[0-9a-fA-F]*')
+  | (?P<number>0[xX][0-9a-fA-F]+|(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<name>[^\W\d][\w$]*)
+  | (?P<operator>\|\||<<|>>|<=|>=|==|!=|<>|->>|->|.)
+''', re.VERBOSE | re.DOTALL)
+
+# standard type names, that SQLite reports in upper case
+_STANDARD_TYPES = ('INT', 'INTEGER', 'REAL', 'TEXT', 'BLOB', 'ANY')
+
+_COLUMN_CONSTRAINTS = ('CONSTRAINT', 'PRIMARY', 'NOT', 'NULL', 'UNIQUE',
+                       'CHECK', 'DEFAULT', 'COLLATE', 'REFERENCES',
+                       'GENERATED', 'AS')
+
+_TABLE_CONSTRAINTS = ('CONSTRAINT', 'PRIMARY', 'UNIQUE', 'CHECK', 'FOREIGN')
+
+# keywords ending a select list or from clause
+_CLAUSES = ('FROM', 'WHERE', 'GROUP', 'HAVING', 'WINDOW', 'ORDER', 'LIMIT',
+            'UNION', 'EXCEPT', 'INTERSECT')
+
+_JOINS = ('JOIN', 'NATURAL', 'LEFT', 'RIGHT', 'FULL', 'INNER', 'CROSS',
+          'OUTER')
+
+# keywords, that may end an expression or stand between its operands, so
+# they are never taken for an alias
+_EXPRESSION_WORDS = ('AND', 'OR', 'NOT', 'IS', 'IN', 'LIKE', 'GLOB', 'MATCH',
+                     'REGEXP', 'BETWEEN', 'ESCAPE', 'CASE', 'WHEN', 'THEN',
+                     'ELSE', 'END', 'COLLATE', 'NULL', 'NOTNULL', 'ISNULL',
+                     'DISTINCT', 'EXISTS', 'CAST', 'TRUE', 'FALSE',
+                     'CURRENT_TIME', 'CURRENT_DATE', 'CURRENT_TIMESTAMP')
+
+
+class _Token(object):
+
+    __slots__ = ('kind', 'text', 'start', 'end', 'word')
+
+    def __init__(self, kind, text, start, end):
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.end = end
+        # keywords are compared in upper case
+        self.word = text.upper() if kind == 'name' else None
+
+    @property
+    def value(self):
+        # identifiers without quotes
+        if self.kind == 'quoted':
+            if self.text[0] == '[':
+                return self.text[1:-1]
+            return self.text[1:-1].replace(self.text[0] * 2, self.text[0])
+        if self.kind == 'string':
+            return self.text[1:-1].replace("''", "'")
+        return self.text
+
+
+def _tokenize(sql):
+    return [_Token(match.lastgroup, match.group(), *match.span())
+            for match in _TOKENS.finditer(sql) if match.lastgroup != 'space']
+
+
+class _Parser(object):
+
+    def __init__(self, sql, tokens=None):
+        self.sql = sql
+        self.tokens = _tokenize(sql) if tokens is None else tokens
+        self.position = 0
+
+    def peek(self, offset=0):
+        try:
+            return self.tokens[self.position + offset]
+        except IndexError:
+            return None
+
+    def at(self, *words):
+        token = self.peek()
+        return token is not None and token.word in words
+
+    def at_operator(self, operator):
+        token = self.peek()
+        return (token is not None and token.kind == 'operator' and
+                token.text == operator)
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            self.fail()
+        self.position += 1
+        return token
+
+    def accept(self, *words):
+        if self.at(*words):
+            return self.next()
+        return None
+
+    def accept_operator(self, operator):
+        if self.at_operator(operator):
+            return self.next()
+        return None
+
+    def expect(self, *words):
+        token = self.accept(*words)
+        if token is None:
+            self.fail()
+        return token
+
+    def expect_operator(self, operator):
+        if self.accept_operator(operator) is None:
+            self.fail()
+
+    def name(self):
+        token = self.next()
+        if token.kind not in ('name', 'quoted', 'string'):
+            self.fail()
+        return token.value
+
+    def qualified_name(self):
+        name = self.name()
+        if self.accept_operator('.'):
+            name = self.name()
+        return name
+
+    def parenthesized(self):
+        '''Skip parenthesized tokens and return those inside.'''
+        self.expect_operator('(')
+        start, depth = self.position, 1
+        while depth:
+            token = self.next()
+            if token.kind == 'operator' and token.text in '()':
+                depth += 1 if token.text == '(' else -1
+        return self.tokens[start:self.position - 1]
+
+    def until(self, stop):
+        '''Return tokens up to the first one at top level, for which stop is
+        true, or up to the end.'''
+        tokens, start = self.tokens, self.position
+        position, depth = start, 0
+        while position < len(tokens):
+            token = tokens[position]
+            if depth == 0 and stop(token):
+                break
+            if token.kind == 'operator':
+                if token.text == '(':
+                    depth += 1
+                elif token.text == ')':
+                    depth -= 1
+                    if depth < 0:
+                        break
+            position += 1
+        self.position = position
+        return tokens[start:position]
+
+    def items(self, tokens):
+        '''Split tokens into lists separated by commas at top level.'''
+        items, item, depth = [], [], 0
+        for token in tokens:
+            if token.kind == 'operator':
+                if token.text == ',' and depth == 0:
+                    items.append(item)
+                    item = []
+                    continue
+                if token.text == '(':
+                    depth += 1
+                elif token.text == ')':
+                    depth -= 1
+            item.append(token)
+        if item:
+            items.append(item)
+        return items
+
+    def span(self, tokens):
+        return self.sql[tokens[0].start:tokens[-1].end] if tokens else ''
+
+    def skip_create(self, kind):
+        # CREATE [TEMP] [UNIQUE | VIRTUAL] kind [IF NOT EXISTS] name
+        self.expect('CREATE')
+        self.accept('TEMP', 'TEMPORARY')
+        modifier = self.accept('UNIQUE', 'VIRTUAL')
+        self.expect(kind)
+        if self.accept('IF'):
+            self.expect('NOT')
+            self.expect('EXISTS')
+        name = self.qualified_name()
+        return name, modifier is not None
+
+    def fail(self):
+        raise FathomParsingError('CREATE statement', self.sql)
+
+
+def _is_comma(token):
+    return token.kind == 'operator' and token.text == ','
+
+
+class _ColumnDefinition(object):
+
+    def __init__(self, name, type):
+        self.name = name
+        self.type = type
+        self.not_null = False
+        self.default = None
+        # position in primary key, 0 for other columns
+        self.key = 0
+        self.generated = False
+
+
+class _Key(object):
+
+    '''UNIQUE or PRIMARY KEY constraint, that is backed by an index.'''
+
+    def __init__(self, columns, primary=False, rowid=False):
+        self.columns = columns
+        self.primary = primary
+        # INTEGER PRIMARY KEY of a rowid table aliases rowid and has no index
+        self.rowid = rowid
+
+
+class _TableDefinition(object):
+
+    def __init__(self, sql):
+        self.columns = []
+        self._names = {}
+        self.foreign_keys = []
+        self.without_rowid = False
+        self.virtual = False
+        self._keys = []
+        self._parse(_Parser(sql))
+
+    def column(self, name):
+        return self._names.get(name.lower())
+
+    def column_name(self, name):
+        column = self.column(name)
+        return column.name if column is not None else name
+
+    def keys(self):
+        '''Return keys backed by automatic indices in order of their
+        numbers.'''
+        if not self.without_rowid:
+            return [key for key in self._keys if not key.rowid]
+        # without rowid, integer primary key gets its index last
+        return ([key for key in self._keys if not key.rowid] +
+                [key for key in self._keys if key.rowid])
+
+    # protected:
+
+    def _parse(self, parser):
+        name, self.virtual = parser.skip_create('TABLE')
+        if self.virtual:
+            return
+        body = parser.parenthesized()
+        for item in parser.items(body):
+            item_parser = _Parser(parser.sql, item)
+            if item_parser.at(*_TABLE_CONSTRAINTS):
+                self._table_constraint(item_parser)
+            else:
+                self._column(item_parser)
+        for option in parser.items(parser.tokens[parser.position:]):
+            if [token.word for token in option] == ['WITHOUT', 'ROWID']:
+                self.without_rowid = True
+        self.columns = [column for column in self.columns
+                        if not column.generated]
+        if self.without_rowid:
+            for column in self.columns:
+                column.not_null = column.not_null or bool(column.key)
+
+    def _column(self, parser):
+        column = _ColumnDefinition(parser.name(), '')
+        type = parser.until(lambda token: token.word in _COLUMN_CONSTRAINTS)
+        column.type = parser.span(type)
+        if column.type.upper() in _STANDARD_TYPES:
+            column.type = column.type.upper()
+        self.columns.append(column)
+        self._names[column.name.lower()] = column
+        while parser.peek() is not None:
+            word = parser.next().word
+            if word == 'CONSTRAINT':
+                parser.name()
+            elif word == 'PRIMARY':
+                parser.expect('KEY')
+                descending = parser.accept('ASC', 'DESC')
+                rowid = (column.type == 'INTEGER' and not
+                         (descending and descending.word == 'DESC'))
+                self._add_primary_key([column.name], rowid)
+                self._skip_conflict(parser)
+                parser.accept('AUTOINCREMENT')
+            elif word == 'NOT':
+                parser.expect('NULL')
+                column.not_null = True
+                self._skip_conflict(parser)
+            elif word == 'NULL':
+                self._skip_conflict(parser)
+            elif word == 'UNIQUE':
+                self._add_key(_Key([column.name]))
+                self._skip_conflict(parser)
+            elif word == 'CHECK':
+                parser.parenthesized()
+            elif word == 'DEFAULT':
+                column.default = self._default(parser)
+            elif word == 'COLLATE':
+                parser.name()
+            elif word == 'REFERENCES':
+                self.foreign_keys.append(([column.name],) +
+                                         self._references(parser))
+            elif word == 'GENERATED':
+                parser.expect('ALWAYS')
+            elif word == 'AS':
+                parser.parenthesized()
+                parser.accept('STORED', 'VIRTUAL')
+                column.generated = True
+            else:
+                parser.fail()
+
+    def _table_constraint(self, parser):
+        if parser.accept('CONSTRAINT'):
+            parser.name()
+        if parser.accept('PRIMARY'):
+            parser.expect('KEY')
+            columns = _indexed_columns(parser)
+            column = self.column(columns[0]) if len(columns) == 1 else None
+            self._add_primary_key(columns, column is not None and
+                                  column.type == 'INTEGER')
+        elif parser.accept('UNIQUE'):
+            self._add_key(_Key(_indexed_columns(parser)))
+        elif parser.accept('CHECK'):
+            parser.parenthesized()
+        elif parser.accept('FOREIGN'):
+            parser.expect('KEY')
+            columns = [_Parser(parser.sql, item).name() for item
+                       in parser.items(parser.parenthesized())]
+            parser.expect('REFERENCES')
+            self.foreign_keys.append((columns,) + self._references(parser))
+        else:
+            parser.fail()
+
+    def _add_primary_key(self, columns, rowid):
+        for position, name in enumerate(columns):
+            column = self.column(name)
+            if column is not None:
+                column.key = position + 1
+        self._add_key(_Key(columns, primary=True, rowid=rowid))
+
+    def _add_key(self, key):
+        # SQLite does not create an index duplicating an earlier one, but
+        # the earlier one becomes primary
+        columns = [column.lower() for column in key.columns]
+        for other in self._keys:
+            if (not other.rowid and not key.rowid and
+                [column.lower() for column in other.columns] == columns):
+                other.primary = other.primary or key.primary
+                return
+        self._keys.append(key)
+
+    def _default(self, parser):
+        if parser.at_operator('('):
+            return parser.span(parser.parenthesized())
+        if parser.at_operator('+') or parser.at_operator('-'):
+            sign = parser.next()
+            return parser.span([sign, parser.next()])
+        return parser.next().text
+
+    def _references(self, parser):
+        table = parser.name()
+        columns = []
+        if parser.at_operator('('):
+            columns = [_Parser(parser.sql, item).name() for item
+                       in parser.items(parser.parenthesized())]
+        while True:
+            if parser.accept('ON'):
+                parser.next()
+                if parser.accept('SET', 'NO'):
+                    parser.next()
+                else:
+                    parser.next()
+            elif parser.accept('MATCH'):
+                parser.name()
+            elif (parser.at('NOT') and parser.peek(1) is not None and
+                  parser.peek(1).word == 'DEFERRABLE'):
+                parser.next()
+            elif parser.accept('DEFERRABLE'):
+                if parser.accept('INITIALLY'):
+                    parser.next()
+            else:
+                return table, columns
+
+    def _skip_conflict(self, parser):
+        if parser.accept('ON'):
+            parser.expect('CONFLICT')
+            parser.next()
+
+
+def _indexed_columns(parser):
+    '''Return names of indexed columns in parentheses, None stands for an
+    expression.'''
+    columns = []
+    for item in parser.items(parser.parenthesized()):
+        words = [token.word for token in item[1:]]
+        if words and words[0] == 'COLLATE':
+            words = words[2:]
+        if (item[0].kind in ('name', 'quoted', 'string') and
+            words in ([], ['ASC'], ['DESC'])):
+            columns.append(item[0].value)
+        else:
+            columns.append(None)
+    return columns
+
+
+def _parse_index(sql):
+    '''Return uniqueness and columns of an index created by sql.'''
+    parser = _Parser(sql)
+    name, unique = parser.skip_create('INDEX')
+    parser.expect('ON')
+    parser.name()
+    return unique, _indexed_columns(parser)
+
+
+class _ViewParser(object):
+
+    '''Derives names and types of columns of a view from its select list;
+    columns of tables and views in from clause are given by source.'''
+
+    def __init__(self, sql, source):
+        self.sql = sql
+        self._source = source
+
+    def columns(self):
+        parser = _Parser(self.sql)
+        parser.skip_create('VIEW')
+        names = None
+        if parser.at_operator('('):
+            names = [_Parser(self.sql, item).name() for item
+                     in parser.items(parser.parenthesized())]
+        parser.expect('AS')
+        columns = self._query(_Parser(self.sql,
+                                      parser.tokens[parser.position:]), {})
+        if names is not None:
+            columns = [(name, type) for name, (_, type)
+                       in zip(names, columns)]
+        return columns
+
+    # protected:
+
+    def _query(self, parser, tables):
+        # only the first select of a compound one names the columns
+        if parser.accept('WITH'):
+            parser.accept('RECURSIVE')
+            tables = dict(tables)
+            while True:
+                name = parser.name()
+                names = None
+                if parser.at_operator('('):
+                    names = [_Parser(self.sql, item).name() for item
+                             in parser.items(parser.parenthesized())]
+                parser.expect('AS')
+                parser.accept('NOT')
+                parser.accept('MATERIALIZED')
+                columns = self._query(_Parser(self.sql,
+                                              parser.parenthesized()), tables)
+                if names is not None:
+                    columns = [(name, type) for name, (_, type)
+                               in zip(names, columns)]
+                tables[name.lower()] = columns
+                if not parser.accept_operator(','):
+                    break
+        if parser.at_operator('('):
+            return self._query(_Parser(self.sql, parser.parenthesized()),
+                               tables)
+        if parser.accept('VALUES'):
+            values = parser.items(parser.parenthesized())
+            return [('column%d' % (number + 1), '')
+                    for number in range(len(values))]
+        parser.expect('SELECT')
+        parser.accept('DISTINCT', 'ALL')
+        items = parser.items(parser.until(
+            lambda token: token.word in _CLAUSES))
+        sources = []
+        if parser.accept('FROM'):
+            sources = self._sources(parser, tables)
+        return self._name_columns(parser, items, sources)
+
+    def _sources(self, parser, tables):
+        # sources are tuples of name, columns and names of columns hidden
+        # from * by USING or NATURAL join
+        sources = []
+        natural = False
+        while True:
+            if parser.at_operator('('):
+                inner = _Parser(self.sql, parser.parenthesized())
+                if inner.at('SELECT', 'WITH', 'VALUES') or \
+                   inner.at_operator('('):
+                    columns = self._query(inner, tables)
+                else:
+                    columns = [column for source in self._sources(inner,
+                                                                 tables)
+                               for column in source[1]]
+                name = None
+            else:
+                name = parser.qualified_name()
+                if parser.at_operator('('):
+                    # table-valued function
+                    parser.parenthesized()
+                    columns = []
+                elif name.lower() in tables:
+                    columns = tables[name.lower()]
+                else:
+                    columns = self._source(name)
+            if parser.accept('AS'):
+                name = parser.name()
+            elif (parser.peek() is not None and
+                  parser.peek().kind in ('name', 'quoted', 'string') and
+                  not parser.at('ON', 'USING', 'INDEXED', 'NOT',
+                                *(_CLAUSES + _JOINS))):
+                name = parser.name()
+            if parser.accept('INDEXED'):
+                parser.expect('BY')
+                parser.name()
+            elif parser.accept('NOT'):
+                parser.expect('INDEXED')
+            hidden = set()
+            earlier = set(column.lower() for source in sources
+                          for column, _ in source[1])
+            if natural:
+                hidden = set(column.lower() for column, _ in columns
+                             if column.lower() in earlier)
+            if parser.accept('ON'):
+                parser.until(lambda token: _is_comma(token) or
+                             token.word in _CLAUSES + _JOINS)
+            elif parser.accept('USING'):
+                hidden = set(_Parser(self.sql, item).name().lower() for item
+                             in parser.items(parser.parenthesized()))
+            sources.append((name, columns, hidden))
+            natural = False
+            if parser.accept_operator(','):
+                continue
+            joined = False
+            while parser.at(*_JOINS):
+                token = parser.next()
+                natural = natural or token.word == 'NATURAL'
+                joined = token.word == 'JOIN'
+            if not joined:
+                return sources
+
+    def _name_columns(self, parser, items, sources):
+        columns = []
+        for item in items:
+            if len(item) == 1 and item[0].text == '*':
+                for name, source, hidden in sources:
+                    columns.extend(column for column in source
+                                   if column[0].lower() not in hidden)
+                continue
+            if (len(item) == 3 and item[1].text == '.' and
+                item[2].text == '*'):
+                columns.extend(self._columns_of(sources, item[0].value))
+                continue
+            alias = None
+            if len(item) > 2 and item[-2].word == 'AS':
+                alias, item = item[-1].value, item[:-2]
+            elif (len(item) > 1 and
+                  item[-1].kind in ('name', 'quoted', 'string') and
+                  _operand(item[-1]) and _operand(item[-2])):
+                alias, item = item[-1].value, item[:-1]
+            expression = item
+            while (len(expression) > 2 and expression[0].text == '(' and
+                   self._encloses(expression)):
+                expression = expression[1:-1]
+            name, type = self._reference(sources, expression)
+            if name is None:
+                name = parser.span(item)
+            columns.append((alias if alias is not None else name, type))
+        return _unique_names(columns)
+
+    def _encloses(self, tokens):
+        # whether the first parenthesis is closed by the last token
+        depth = 0
+        for position, token in enumerate(tokens):
+            if token.kind == 'operator' and token.text in '()':
+                depth += 1 if token.text == '(' else -1
+                if depth == 0:
+                    return position == len(tokens) - 1
+        return False
+
+    def _reference(self, sources, tokens):
+        # column reference is name, table.name or schema.table.name
+        identifiers = ('name', 'quoted')
+        if len(tokens) == 1 and tokens[0].kind in identifiers:
+            for name, columns, hidden in sources:
+                for column, type in columns:
+                    if column.lower() == tokens[0].value.lower():
+                        return column, type
+            return tokens[0].value, ''
+        if (len(tokens) in (3, 5) and
+            all(token.kind in identifiers for token in tokens[::2]) and
+            all(token.text == '.' for token in tokens[1::2])):
+            for column, type in self._columns_of(sources, tokens[-3].value):
+                if column.lower() == tokens[-1].value.lower():
+                    return column, type
+            return tokens[-1].value, ''
+        return None, ''
+
+    def _columns_of(self, sources, name):
+        for source, columns, hidden in sources:
+            if source is not None and source.lower() == name.lower():
+                return columns
+        return []
+
+
+def _operand(token):
+    # token, that may end an operand of an expression
+    if token.kind == 'operator':
+        return token.text == ')'
+    return token.word not in _EXPRESSION_WORDS
+
+
+def _unique_names(columns):
+    # SQLite distinguishes duplicate names by a counter suffix
+    used = set()
+    result = []
+    for name, type in columns:
+        unique, counter = name, 0
+        while unique.lower() in used:
+            counter += 1
+            unique = '%s:%d' % (name, counter)
+        used.add(unique.lower())
+        result.append((unique, type))
+    return result
+
+
+def _varint(buffer, position):
+    value = 0
+    for offset in range(8):
+        byte = buffer[position + offset]
+        value = (value << 7) | (byte & 0x7f)
+        if byte < 0x80:
+            return value, position + offset + 1
+    return (value << 8) | buffer[position + 8], position + 9
@@ -0,0 +1,115 @@
+#!/usr/bin/python3
+
+'''Helpers for tests guarding the number of round trips made by inspectors.
+
+Performance regressions of inspectors almost always mean extra queries, like
+a query per table where one query for all tables used to do. RoundTrips
+counts queries and connections of an inspector and fails when they exceed
+given budget:
+
+    with RoundTrips(db.inspector, queries=3, connections=3):
+        db.load_columns()
+
+Queries are counted on the inspector's DB-API module, so inspectors of
+schemas, that were copied from the inspector before, are not counted.'''
+
+from threading import Lock
+
+
+class RoundTrips(object):
+
+    '''Context manager counting queries and connections made by given
+    inspector; executed queries are kept in queries. Budgets left as None
+    are not checked.'''
+
+    def __init__(self, inspector, queries=None, connections=None):
+        self.inspector = inspector
+        self.budget = queries
+        self.connection_budget = connections
+        self.queries = []
+        self.connections = 0
+        self._lock = Lock()
+        self._api = None
+
+    def __enter__(self):
+        self._api = self.inspector._api
+        self.inspector._api = _CountingApi(self, self._api)
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.inspector._api = self._api
+        if type is None:
+            self.check(self.budget, self.connection_budget)
+
+    def check(self, queries=None, connections=None):
+        '''Raise AssertionError listing executed queries when there were
+        more of them or more connections than given.'''
+        if queries is not None and len(self.queries) > queries:
+            raise AssertionError('%d queries made, at most %d expected:\n%s' %
+                                 (len(self.queries), queries,
+                                  '\n'.join(self.queries)))
+        if connections is not None and self.connections > connections:
+            raise AssertionError('%d connections made, at most %d expected' %
+                                 (self.connections, connections))
+
+    # protected:
+
+    def _connected(self):
+        with self._lock:
+            self.connections += 1
+
+    def _executed(self, sql):
+        with self._lock:
+            self.queries.append(sql)
+
+
+class _CountingApi(object):
+
+    def __init__(self, counter, api):
+        self._counter = counter
+        self._wrapped = api
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+    def connect(self, *args, **kwargs):
+        connection = self._wrapped.connect(*args, **kwargs)
+        self._counter._connected()
+        return _CountingConnection(self._counter, connection)
+
+
+class _CountingConnection(object):
+
+    def __init__(self, counter, connection):
+        self._counter = counter
+        self._connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def cursor(self, *args, **kwargs):
+        return _CountingCursor(self._counter,
+                               self._connection.cursor(*args, **kwargs))
+
+
+class _CountingCursor(object):
+
+    def __init__(self, counter, cursor):
+        self._counter = counter
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, *args):
+        self._counter._executed(sql)
+        return self._cursor.execute(sql, *args)
@@ -0,0 +1,264 @@
+#!/usr/bin/python3
+
+'''Catalog of many inspected databases in one indexed SQLite file.
+
+Warehouse writes tables, views, columns, indices, foreign keys, triggers and
+procedures of databases into normalized tables, so that questions about a
+whole fleet of databases are answered by SQL queries instead of loops over
+Database objects:
+
+    with Warehouse('catalog.db3') as warehouse:
+        warehouse.add(*databases)
+        warehouse.query("""SELECT d.name, r.name FROM columns c
+                           JOIN relations r ON r.id = c.relation_id
+                           JOIN databases d ON d.id = r.database_id
+                           WHERE c.name = 'email'
+                                 AND c.type = 'varchar(255)'""")
+
+Rows of all given databases are inserted with executemany in a single
+transaction. Databases are identified by their names, or by names given to
+add, like host and database name; adding a database again replaces its
+previous rows.'''
+
+import sqlite3
+from itertools import count
+
+from .errors import FathomError
+from .schema import Trigger
+
+
+class Warehouse(object):
+
+    WHEN = {Trigger.BEFORE: 'before', Trigger.AFTER: 'after',
+            Trigger.INSTEAD: 'instead of'}
+    EVENTS = {Trigger.UPDATE: 'update', Trigger.INSERT: 'insert',
+              Trigger.DELETE: 'delete'}
+
+    # rows of child tables are removed with their database; expressions of
+    # indices have no column name
+    _SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS databases (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS relations (
+    id INTEGER PRIMARY KEY,
+    database_id INTEGER NOT NULL REFERENCES databases (id)
+                ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS relations_database ON relations (database_id);
+CREATE INDEX IF NOT EXISTS relations_name ON relations (name);
+CREATE TABLE IF NOT EXISTS columns (
+    relation_id INTEGER NOT NULL REFERENCES relations (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT,
+    not_null INTEGER,
+    "default" TEXT,
+    PRIMARY KEY (relation_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS columns_name ON columns (name, type);
+CREATE INDEX IF NOT EXISTS columns_type ON columns (type);
+CREATE TABLE IF NOT EXISTS indices (
+    id INTEGER PRIMARY KEY,
+    relation_id INTEGER NOT NULL REFERENCES relations (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    is_unique INTEGER NOT NULL,
+    is_primary INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS indices_relation ON indices (relation_id);
+CREATE INDEX IF NOT EXISTS indices_name ON indices (name);
+CREATE TABLE IF NOT EXISTS index_columns (
+    index_id INTEGER NOT NULL REFERENCES indices (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT,
+    PRIMARY KEY (index_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS index_columns_name ON index_columns (name);
+CREATE TABLE IF NOT EXISTS foreign_keys (
+    id INTEGER PRIMARY KEY,
+    relation_id INTEGER NOT NULL REFERENCES relations (id) ON DELETE CASCADE,
+    referenced_table TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS foreign_keys_relation
+    ON foreign_keys (relation_id);
+CREATE INDEX IF NOT EXISTS foreign_keys_referenced
+    ON foreign_keys (referenced_table);
+CREATE TABLE IF NOT EXISTS foreign_key_columns (
+    foreign_key_id INTEGER NOT NULL REFERENCES foreign_keys (id)
+                   ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    referenced_name TEXT,
+    PRIMARY KEY (foreign_key_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS triggers (
+    relation_id INTEGER NOT NULL REFERENCES relations (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    "when" TEXT,
+    event TEXT
+);
+CREATE INDEX IF NOT EXISTS triggers_relation ON triggers (relation_id);
+CREATE INDEX IF NOT EXISTS triggers_name ON triggers (name);
+CREATE TABLE IF NOT EXISTS procedures (
+    id INTEGER PRIMARY KEY,
+    database_id INTEGER NOT NULL REFERENCES databases (id)
+                ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    returns TEXT
+);
+CREATE INDEX IF NOT EXISTS procedures_database ON procedures (database_id);
+CREATE INDEX IF NOT EXISTS procedures_name ON procedures (name);
+CREATE TABLE IF NOT EXISTS arguments (
+    procedure_id INTEGER NOT NULL REFERENCES procedures (id)
+                 ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT,
+    PRIMARY KEY (procedure_id, position)
+) WITHOUT ROWID;"""
+
+    # insert statements of child tables in the order of their dependencies
+    _INSERT_SQL = (
+        ('databases', 'INSERT INTO databases (id, name) VALUES (?, ?)'),
+        ('relations', 'INSERT INTO relations (id, database_id, kind, name) '
+                      'VALUES (?, ?, ?, ?)'),
+        ('columns', 'INSERT INTO columns (relation_id, position, name, type, '
+                    'not_null, "default") VALUES (?, ?, ?, ?, ?, ?)'),
+        ('indices', 'INSERT INTO indices (id, relation_id, name, is_unique, '
+                    'is_primary) VALUES (?, ?, ?, ?, ?)'),
+        ('index_columns', 'INSERT INTO index_columns (index_id, position, '
+                          'name) VALUES (?, ?, ?)'),
+        ('foreign_keys', 'INSERT INTO foreign_keys (id, relation_id, '
+                         'referenced_table) VALUES (?, ?, ?)'),
+        ('foreign_key_columns', 'INSERT INTO foreign_key_columns '
+                                '(foreign_key_id, position, name, '
+                                'referenced_name) VALUES (?, ?, ?, ?)'),
+        ('triggers', 'INSERT INTO triggers (relation_id, name, "when", '
+                     'event) VALUES (?, ?, ?, ?)'),
+        ('procedures', 'INSERT INTO procedures (id, database_id, name, '
+                       'returns) VALUES (?, ?, ?, ?)'),
+        ('arguments', 'INSERT INTO arguments (procedure_id, position, name, '
+                      'type) VALUES (?, ?, ?, ?)'))
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute('PRAGMA foreign_keys = ON')
+        self._connection.executescript(self._SCHEMA_SQL)
+
+    def add(self, *databases, names=None):
+        '''Load what is missing in given databases and write them to the
+        warehouse in one transaction, replacing earlier rows of databases
+        with the same names. Names of databases are used unless names,
+        a sequence of the same length, are given.'''
+        names = ([database.name for database in databases] if names is None
+                 else list(names))
+        if len(names) != len(databases):
+            raise FathomError('Got %d names for %d databases.' %
+                              (len(names), len(databases)))
+        duplicates = sorted(set(name for name in names
+                                if names.count(name) > 1))
+        if duplicates:
+            raise FathomError('Databases must have unique names, give '
+                              'distinct names for: %s.' %
+                              ', '.join(map(str, duplicates)))
+        rows = dict((table, []) for table, sql in self._INSERT_SQL)
+        # identifiers are assigned here, so that rows referring to each
+        # other can be inserted in bulk
+        ids = dict((table, count(self._next_id(table)))
+                   for table in ('databases', 'relations', 'indices',
+                                 'foreign_keys', 'procedures'))
+        for database, label in zip(databases, names):
+            self._collect(database, label, rows, ids)
+        with self._connection:
+            self._connection.executemany(
+                'DELETE FROM databases WHERE name = ?',
+                ((row[1],) for row in rows['databases']))
+            for table, sql in self._INSERT_SQL:
+                self._connection.executemany(sql, rows[table])
+
+    def query(self, sql, parameters=()):
+        '''Return all rows of a query over the warehouse.'''
+        return self._connection.execute(sql, parameters).fetchall()
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # protected:
+
+    def _next_id(self, table):
+        return self._connection.execute(
+            'SELECT coalesce(max(id), 0) + 1 FROM %s' % table).fetchone()[0]
+
+    def _collect(self, database, label, rows, ids):
+        database.load_columns()
+        database.load_foreign_keys()
+        database.load_index_columns()
+        database.load_triggers()
+        database.load_arguments()
+        database_id = next(ids['databases'])
+        rows['databases'].append((database_id, label))
+        relations = {}
+        for kind, objects in (('table', database.tables),
+                              ('view', database.views)):
+            for name, obj in objects.items():
+                relation_id = relations[database.case(name)] = next(
+                    ids['relations'])
+                rows['relations'].append((relation_id, database_id, kind,
+                                          name))
+                rows['columns'].extend(
+                    (relation_id, position, column.name, column.type,
+                     column.not_null, _text(column.default))
+                    for position, column in enumerate(obj.columns.values()))
+                if kind == 'table':
+                    self._collect_foreign_keys(obj, relation_id, rows, ids)
+        for name, index in database.indices.items():
+            relation_id = relations.get(database.case(index.table))
+            if relation_id is None:
+                continue
+            index_id = next(ids['indices'])
+            rows['indices'].append((index_id, relation_id, index.name,
+                                    index.is_unique, index.is_primary))
+            rows['index_columns'].extend(
+                (index_id, position, column)
+                for position, column in enumerate(index.columns))
+        for name, trigger in database.triggers.items():
+            relation_id = relations.get(database.case(trigger.table))
+            if relation_id is not None:
+                rows['triggers'].append((relation_id, trigger.name,
+                                         self.WHEN.get(trigger.when),
+                                         self.EVENTS.get(trigger.event)))
+        for name, procedure in database.procedures.items():
+            procedure_id = next(ids['procedures'])
+            rows['procedures'].append((procedure_id, database_id, name,
+                                       procedure.returns))
+            rows['arguments'].extend(
+                (procedure_id, position, argument.name, argument.type)
+                for position, argument
+                in enumerate(procedure.arguments.values()))
+
+    def _collect_foreign_keys(self, table, relation_id, rows, ids):
+        for fk in table.foreign_keys:
+            fk_id = next(ids['foreign_keys'])
+            rows['foreign_keys'].append((fk_id, relation_id,
+                                         fk.referenced_table))
+            referenced = list(fk.referenced_columns)
+            referenced += [None] * (len(fk.columns) - len(referenced))
+            rows['foreign_key_columns'].extend(
+                (fk_id, position, column, referenced[position])
+                for position, column in enumerate(fk.columns))
+
+# protected:
+
+def _text(value):
+    # defaults are kept as SQL text whatever type the driver gave them
+    return str(value) if value is not None else None
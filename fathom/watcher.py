@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+
+'''Watches a database for schema changes without inspecting it over and over.
+
+Every inspector reads a schema version, that changes with any change of
+inspected objects, with a single query: PRAGMA schema_version on SQLite and
+a digest of catalog change markers elsewhere. The digest is cheap except on
+MySQL, where information_schema has no bounded marker of in place
+alterations and polling costs about as much as reading markers. Only when the
+version changes, markers of all tables and views are read and objects with
+changed markers are reloaded; comparison of old and new objects gives
+events about added, removed and altered tables, views, indices and
+triggers:
+
+    watcher = Watcher(database, interval=5)
+    watcher.watch(print)'''
+
+from threading import Event as Flag
+
+from .fingerprints import table_data, index_data, trigger_data
+from .schema import Table, View, _lock
+
+
+class Event(object):
+
+    '''Change of a table, view, index or trigger; old and new are the
+    object before and after the change, None when it did not exist.'''
+
+    ADDED, REMOVED, ALTERED = range(3)
+
+    NAMES = {ADDED: 'added', REMOVED: 'removed', ALTERED: 'altered'}
+
+    def __init__(self, type, kind, name, old=None, new=None):
+        self.type = type
+        self.kind = kind
+        self.name = name
+        self.old = old
+        self.new = new
+
+    def __str__(self):
+        return '%s %s %s' % (self.NAMES[self.type], self.kind, self.name)
+
+    def __repr__(self):
+        return '<Event %s>' % self
+
+
+class Watcher(object):
+
+    '''Polls the database for changes every interval seconds. Changed
+    objects are reloaded and replace old ones in the database, so the
+    database stays current; unchanged objects are kept.'''
+
+    def __init__(self, database, interval=1.0):
+        self.database = database
+        self.interval = interval
+        # events need complete old objects to compare them with new ones
+        database.load_columns()
+        database.load_foreign_keys()
+        database.load_index_columns()
+        database.load_triggers()
+        inspector = database.inspector
+        self._version = inspector.get_schema_version()
+        self._markers = inspector.get_change_markers()
+
+    def poll(self):
+        '''Return events for changes since the previous poll; without
+        changes, this takes a single query.'''
+        inspector = self.database.inspector
+        version = inspector.get_schema_version()
+        if version == self._version:
+            return []
+        markers = inspector.get_change_markers()
+        events = refresh_objects(
+            self.database,
+            tables=_changed(self._markers['tables'], markers['tables']),
+            views=_changed(self._markers['views'], markers['views']))
+        self._version, self._markers = version, markers
+        return events
+
+    def watch(self, callback, stop=None):
+        '''Call callback with every event until stop, a threading.Event,
+        is set.'''
+        stop = stop if stop is not None else Flag()
+        while not stop.is_set():
+            for event in self.poll():
+                callback(event)
+            stop.wait(self.interval)
+
+
+def refresh_objects(database, tables=None, views=None):
+    '''Reload given tables and views of the database and return events
+    describing how they changed. Tables and views are given as dictionaries
+    mapping their names to True for existing objects and to False for
+    dropped ones; indices and triggers are refreshed with their tables.'''
+    return (_refresh_tables(database, tables or {}) +
+            _refresh_views(database, views or {}))
+
+# protected:
+
+def _changed(old, new):
+    return dict((name, name in new) for name in set(old) | set(new)
+                if old.get(name) != new.get(name))
+
+def _refresh_tables(database, names):
+    tables = dict(database.tables)
+    indices = dict(database.indices)
+    triggers = dict(database.triggers)
+    events = []
+    for name in sorted(names):
+        old = tables.pop(name, None)
+        new = None
+        if names[name]:
+            # partitioned tables stay partitioned, their partitions are
+            # loaded again lazily
+            Class = type(old) if old is not None else Table
+            new = Class(name, database=database, inspector=database.inspector)
+            new.load()
+            tables[name] = new
+        if old is None and new is None:
+            continue
+        if old is None:
+            events.append(Event(Event.ADDED, 'table', name, new=new))
+        elif new is None:
+            events.append(Event(Event.REMOVED, 'table', name, old=old))
+        elif table_data(old) != table_data(new):
+            events.append(Event(Event.ALTERED, 'table', name, old, new))
+        # indices and triggers are loaded with their table, they are
+        # compared to those the table had before
+        events.extend(_replace(indices, 'index', index_data, name,
+                               new.indices if new else {}, database))
+        events.extend(_replace(triggers, 'trigger', trigger_data, name,
+                               new.triggers if new else {}, database))
+    with _lock(database):
+        database._tables = tables
+        database._indices = indices
+        database._triggers = triggers
+    return events
+
+def _refresh_views(database, names):
+    views = dict(database.views)
+    events = []
+    for name in sorted(names):
+        old = views.pop(name, None)
+        new = None
+        if names[name]:
+            new = View(name, database=database, inspector=database.inspector)
+            new.columns
+            views[name] = new
+        if old is None and new is None:
+            continue
+        if old is None:
+            events.append(Event(Event.ADDED, 'view', name, new=new))
+        elif new is None:
+            events.append(Event(Event.REMOVED, 'view', name, old=old))
+        else:
+            events.append(Event(Event.ALTERED, 'view', name, old, new))
+    with _lock(database):
+        database._views = views
+    return events
+
+def _replace(objects, kind, data, table, new, database):
+    # objects of the table are replaced with new ones in objects dictionary
+    old = dict((key, obj) for key, obj in objects.items()
+               if database.case(obj.table) == table)
+    events = []
+    for key in sorted(set(old) | set(new)):
+        if key not in new:
+            events.append(Event(Event.REMOVED, kind, key, old=old[key]))
+        elif key not in old:
+            events.append(Event(Event.ADDED, kind, key, new=new[key]))
+        elif data(old[key]) != data(new[key]):
+            events.append(Event(Event.ALTERED, kind, key, old[key], new[key]))
+    for key in old:
+        del objects[key]
+    objects.update(new)
+    return events
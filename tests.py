@@ -48,11 +48,40 @@ Python you need to have cx_Oracle package installed for python3.
 
 from abc import ABCMeta, abstractmethod
 from unittest import TestCase, main, skipUnless
+from unittest.mock import Mock
+from threading import Barrier, Lock, Thread
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+import os
+import json
+import pickle
+from time import sleep, time
 from collections import namedtuple, OrderedDict
 
 from fathom import (get_sqlite3_database, get_postgresql_database, 
                     get_mysql_database, get_oracle_database, FathomError)
-from fathom.schema import Trigger, Table, Column, Database
+from fathom.schema import (Trigger, Table, Column, Database, Argument,
+                           PartitionedTable, Partition, Index, Procedure)
+from fathom.errors import FathomTimeoutError
+from fathom.advisor import Advice, advise
+from fathom.diff import diff
+from fathom.fingerprints import (Fingerprints, fingerprint, table_data, 
+                                 index_data, trigger_data)
+from fathom.inspectors import (SqliteInspector, PostgresInspector, 
+                               PostgresCatalogInspector, MySqlInspector,
+                               OracleInspector)
+from fathom.schema import upper, lower
+from fathom.simulator import SimulatedApi, generate_database
+from fathom.testing import RoundTrips
+from fathom.governor import Governor
+from fathom.watcher import Watcher
+from fathom.sqlitefile import SqliteFileInspector
+from fathom.shards import SqliteShardsInspector
+from fathom.listener import Listener, install_notifier
+from fathom.history import HistoryStore
+from fathom.warehouse import Warehouse
+from fathom.search import SourceIndex, tokenize
+from fathom.joins import JoinGraph
+from fathom.replay import RecordingApi, ReplayApi
 from fathom import constants
 
 try:
@@ -396,6 +425,253 @@ FOR EACH ROW BEGIN INSERT INTO one_column values(3); END'''
         self.assertEqual(index.columns, ('col',))
         self.assertFalse(index.is_unique)
         
+    # bulk loading tests
+    
+    def test_load_columns(self):
+        self.db.load_columns()
+        for table in self.db.tables.values():
+            columns = table.columns
+            table.columns = None
+            self.assertEqual(
+                {name: (column.type, column.not_null, column.default)
+                 for name, column in columns.items()},
+                {name: (column.type, column.not_null, column.default)
+                 for name, column in table.columns.items()})
+                 
+    def test_load_foreign_keys(self):
+        self.db.load_foreign_keys()
+        table = self.db.tables[self.case('reference_one_unique_column')]
+        self.assertEqual(len(table.foreign_keys), 1)
+        fk = table.foreign_keys[0]
+        self.assertEqual(fk.columns, [self.case('ref_one_column')])
+        self.assertEqual(fk.referenced_table, self.case('one_unique_column'))
+        self.assertEqual(fk.referenced_columns, [self.case('col')])
+        table = self.db.tables[self.case('reference_two_tables')]
+        self.assertEqual(len(table.foreign_keys), 2)
+        
+    def test_load_index_columns(self):
+        self.db.load_index_columns()
+        for index in self.db.indices.values():
+            self.assertEqual(index.columns, 
+                             self.db.inspector.get_index_columns(index))
+                             
+    def test_streamed_select(self):
+        inspector = self.db.inspector
+        sql = inspector._bulk_sql(inspector._ALL_COLUMNS_SQL)
+        expected = inspector._select(sql)
+        inspector.fetch_size = 2
+        try:
+            rows = inspector._select(sql, stream=True)
+            self.assertNotIsInstance(rows, list)
+            self.assertEqual(list(rows), expected)
+        finally:
+            del inspector.fetch_size
+
+    def test_round_trip_budgets(self):
+        inspector = self.db.inspector
+        with RoundTrips(inspector, queries=1, connections=1):
+            tables = self.db.tables
+        with RoundTrips(inspector, queries=1, connections=1):
+            self.db.views
+        for table in tables.values():
+            with RoundTrips(inspector, queries=1, connections=1):
+                table.foreign_keys
+            with RoundTrips(inspector, queries=1, connections=1):
+                inspector.build_columns(table)
+        with RoundTrips(inspector, queries=1, connections=1):
+            self.db.load_columns()
+        with RoundTrips(inspector, queries=1, connections=1):
+            self.db.load_foreign_keys()
+        with RoundTrips(inspector, queries=1, connections=1):
+            self.db.indices
+        # some systems keep procedures and functions apart, postgres needs
+        # names of argument types
+        with RoundTrips(inspector, queries=2, connections=2):
+            self.db.procedures
+
+    def test_get_table(self):
+        queries = []
+        select = self.db.inspector._select
+        def counting_select(sql, *args, **kwargs):
+            queries.append(sql)
+            return select(sql, *args, **kwargs)
+        self.db.inspector._select = counting_select
+        table = self.db.get_table('one_column')
+        columns = table.columns
+        indices = table.indices
+        triggers = table.triggers
+        foreign_keys = table.foreign_keys
+        self.assertEqual(len(queries), 1)
+        del self.db.inspector._select
+        self.assertEqual(set(columns), {self.case('col')})
+        self.assertEqual(foreign_keys, [])
+        expected = {name: index.columns 
+                    for name, index in self.db.indices.items()
+                    if self.case(index.table) == self.case('one_column')}
+        self.assertEqual({name: index.columns 
+                          for name, index in indices.items()}, expected)
+        expected = {name: (trigger.when, trigger.event)
+                    for name, trigger in self.db.triggers.items()
+                    if self.case(trigger.table) == self.case('one_column')}
+        self.assertEqual({name: (trigger.when, trigger.event)
+                          for name, trigger in triggers.items()}, expected)
+        table = self.db.get_table('reference_two_tables')
+        self.assertEqual(sorted(fk.referenced_table 
+                                for fk in table.foreign_keys),
+                         [self.case('one_unique_column'), 
+                          self.case('primary_key_only')])
+                          
+    def test_get_missing_table(self):
+        self.assertRaises(FathomError, self.db.get_table, 'missing_table')
+        
+    # concurrency tests
+    
+    def test_concurrent_lazy_loading(self):
+        queries = []
+        queries_lock = Lock()
+        select = self.db.inspector._select
+        def slow_counting_select(sql, *args, **kwargs):
+            # widens window, in which concurrent loads could overlap
+            sleep(0.01)
+            with queries_lock:
+                queries.append(sql)
+            return select(sql, *args, **kwargs)
+        self.db.inspector._select = slow_counting_select
+        barrier = Barrier(8)
+        errors = []
+        def inspect():
+            try:
+                barrier.wait()
+                for table in self.db.tables.values():
+                    self.assertTrue(table.columns)
+                    table.stats
+                for index in self.db.indices.values():
+                    index.columns
+            except Exception as e:
+                errors.append(e)
+        threads = [Thread(target=inspect) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        del self.db.inspector._select
+        self.assertEqual(errors, [])
+        # tables, indices and statistics once, columns of every table and 
+        # every index once
+        expected = 3 + len(self.db.tables) + len(self.db.indices)
+        self.assertEqual(len(queries), expected)
+        
+    # detached snapshot tests
+    
+    def test_detach(self):
+        snapshot = pickle.loads(pickle.dumps(self.db.detach()))
+        self.assertIsNone(snapshot.inspector)
+        self.assertEqual(set(snapshot.tables), set(self.db.tables))
+        self.assertEqual(set(snapshot.views), set(self.db.views))
+        for name, table in self.db.tables.items():
+            detached = snapshot.tables[name]
+            self.assertIs(detached.database, snapshot)
+            self.assertEqual(
+                {name: (column.type, column.not_null, column.default)
+                 for name, column in table.columns.items()},
+                {name: (column.type, column.not_null, column.default)
+                 for name, column in detached.columns.items()})
+            self.assertEqual(
+                [(fk.columns, fk.referenced_table, fk.referenced_columns)
+                 for fk in table.foreign_keys],
+                [(fk.columns, fk.referenced_table, fk.referenced_columns)
+                 for fk in detached.foreign_keys])
+        for name, index in self.db.indices.items():
+            self.assertEqual(snapshot.indices[name].columns, index.columns)
+            self.assertEqual(snapshot.indices[name].is_unique, index.is_unique)
+        for name, trigger in self.db.triggers.items():
+            detached = snapshot.triggers[name]
+            self.assertEqual((detached.table, detached.when, detached.event),
+                             (trigger.table, trigger.when, trigger.event))
+        table = snapshot.tables[self.case('one_column')]
+        self.assertEqual(set(table.triggers), 
+                         {name for name, trigger in snapshot.triggers.items()
+                          if self.case(trigger.table) == table.name})
+                          
+    def test_detach_parts(self):
+        snapshot = self.db.detach(parts=('tables',))
+        self.assertEqual(set(snapshot.tables), set(self.db.tables))
+        self.assertEqual(snapshot.indices, {})
+        self.assertEqual(snapshot.views, {})
+        # parts left out are not loaded, objects have no inspector
+        table = snapshot.tables[self.case('one_column')]
+        self.assertEqual(set(table.columns), 
+                         set(self.db.tables[table.name].columns))
+        self.assertEqual(table.foreign_keys, [])
+        for part in ('indices', 'triggers'):
+            self.assertRaises(FathomError, getattr, table, part)
+        self.assertRaises(FathomError, table.load)
+        for obj, part in ((Table('one'), 'columns'),
+                          (Table('one'), 'foreign_keys'),
+                          (PartitionedTable('one'), 'partitions'),
+                          (Index('one_index', 'one'), 'columns'),
+                          (Procedure('one_procedure'), 'arguments'),
+                          (Trigger('one_trigger'), 'table')):
+            self.assertRaises(FathomError, getattr, obj, part)
+        
+    def test_pickle_attached_database(self):
+        self.assertRaises(FathomError, pickle.dumps, self.db)
+        
+    # name filter tests
+    
+    def test_name_filters(self):
+        db = Database(self.db.name, inspector=self.db.inspector,
+                      include=[self.case('one_*'), 
+                               self.case('reference_two_tables')],
+                      exclude=[self.case('one_unique_column')])
+        tables = {self.case('one_column'), self.case('reference_two_tables')}
+        self.assertEqual(set(db.tables), tables)
+        self.assertEqual(set(db.views), {self.case('one_column_view')})
+        self.assertEqual(set(db.indices),
+                         {name for name, index in self.db.indices.items()
+                          if self.case(index.table) in tables})
+        self.assertEqual(set(db.triggers),
+                         {name for name, trigger in self.db.triggers.items()
+                          if self.case(trigger.table) in tables})
+        db.load_foreign_keys()
+        table = db.tables[self.case('reference_two_tables')]
+        self.assertEqual(len(table.foreign_keys), 2)
+        
+    def test_name_filters_escape_wildcards(self):
+        # _ in a pattern matches only itself, ? matches any character
+        db = Database(self.db.name, inspector=self.db.inspector,
+                      include=[self.case('one?column'), 
+                               self.case('one_unique_col*')])
+        self.assertEqual(set(db.tables), {self.case('one_column'),
+                                          self.case('one_unique_column')})
+        db = Database(self.db.name, inspector=self.db.inspector,
+                      include=[self.case('one_c%')])
+        self.assertEqual(set(db.tables), set())
+        # [ is no character class, in queries nor in names checked in Python
+        db = Database(self.db.name, inspector=self.db.inspector,
+                      include=[self.case('one_[c]olumn*')])
+        self.assertEqual(set(db.tables), set())
+        self.assertFalse(db.inspector._name_matches(self.case('one_column')))
+        self.assertTrue(db.inspector._name_matches(
+            self.case('one_[c]olumn')))
+                             
+    # advisor tests
+    
+    def test_advise_missing_foreign_key_indices(self):
+        missing = {(advice.table, advice.columns) 
+                   for advice in advise(self.db)
+                   if advice.kind == Advice.MISSING_FOREIGN_KEY_INDEX}
+        if self.CREATES_INDEX_FOR_REFERENCES:
+            expected = set()
+        else:
+            expected = {(self.case('reference_one_unique_column'), 
+                         (self.case('ref_one_column'),)),
+                        (self.case('reference_two_tables'), 
+                         (self.case('ref1'),)),
+                        (self.case('reference_two_tables'), 
+                         (self.case('ref2'),))}
+        self.assertEqual(missing, expected)
+
     # procedure tests
     
     def test_procedure_names(self):
@@ -651,6 +927,126 @@ EXECUTE PROCEDURE before_update_trigger_function()''', 'one_unique_column')
         self.assertEqual(trigger.when, Trigger.BEFORE)
         self.assertEqual(trigger.event, Trigger.UPDATE)
 
+    # schema tests
+    
+    def test_schemas(self):
+        self._add_operation(['CREATE SCHEMA fathom_tenant', '''
+CREATE TABLE fathom_tenant.tenant_table (col integer NOT NULL)''', '''
+CREATE INDEX tenant_index ON fathom_tenant.tenant_table(col)'''])
+        try:
+            self.assertTrue('public' in self.db.schemas)
+            schema = self.db.schemas['fathom_tenant']
+            self.assertEqual(schema.database, self.db)
+            self.assertEqual(set(schema.tables.keys()), 
+                             {'fathom_tenant.tenant_table'})
+            table = schema.tables['fathom_tenant.tenant_table']
+            self.assertEqual(table.database, schema)
+            self.assertColumns(table, (('col', 'integer', True),))
+            self.assertTrue('tenant_table' not in self.db.tables)
+        finally:
+            self._add_operation(['DROP SCHEMA fathom_tenant CASCADE'])
+            
+    def test_load_schemas(self):
+        self._add_operation(['CREATE SCHEMA fathom_tenant', '''
+CREATE TABLE fathom_tenant.tenant_table (col integer)''', '''
+CREATE INDEX tenant_index ON fathom_tenant.tenant_table(col)'''])
+        try:
+            self.db.load_schemas(['public', 'fathom_tenant'])
+            schema = self.db.schemas['fathom_tenant']
+            self.assertEqual(set(schema.indices.keys()), 
+                             {'fathom_tenant.tenant_table: tenant_index'})
+            index = schema.indices['fathom_tenant.tenant_table: tenant_index']
+            self.assertEqual(index.columns, ('col',))
+            self.assertEqual(set(self.db.schemas['public'].tables.keys()),
+                             set('public.' + name for name in self.TABLES))
+        finally:
+            self._add_operation(['DROP SCHEMA fathom_tenant CASCADE'])
+            
+    def test_schemas_starting_with_pg(self):
+        self._add_operation(['CREATE SCHEMA pgfathom'])
+        try:
+            self.assertTrue('pgfathom' in self.db.schemas)
+            self.assertTrue('pg_catalog' not in self.db.schemas)
+        finally:
+            self._add_operation(['DROP SCHEMA pgfathom CASCADE'])
+
+    # partition tests
+    
+    def test_advise_index_variants(self):
+        if self.db.version < (11, 0):
+            self.skipTest('INCLUDE columns require PostgreSQL 11')
+        self._add_operation([
+            'CREATE TABLE variants (a integer, b integer, c integer[])',
+            'CREATE INDEX variants_a_b ON variants (a, b)',
+            'CREATE INDEX variants_a_include ON variants (a) INCLUDE (b)',
+            'CREATE INDEX variants_a_partial ON variants (a) WHERE b > 0',
+            'CREATE INDEX variants_c ON variants (c)',
+            'CREATE INDEX variants_c_gin ON variants USING gin (c)'])
+        try:
+            db = self.db
+            index = db.indices['variants: variants_a_partial']
+            self.assertEqual((index.method, index.predicate), 
+                             ('btree', '(b > 0)'))
+            db.load_index_columns()
+            index = db.indices['variants: variants_a_include']
+            self.assertEqual(index.columns, ('a',))
+            self.assertEqual(
+                [(advice.kind, advice.index.base_name, 
+                  advice.covered_by.base_name)
+                 for advice in advise(db) if advice.table == 'variants'],
+                [(Advice.LEFT_PREFIX, 'variants_a_include', 'variants_a_b')])
+        finally:
+            self._drop_operation('TABLE', ['variants'])
+
+    def test_partitioned_table(self):
+        if self.db.version < (10, 0):
+            self.skipTest('partitioning requires PostgreSQL 10')
+        self._add_operation(['''
+CREATE TABLE measurement (logdate date NOT NULL, value integer)
+PARTITION BY RANGE (logdate)''', '''
+CREATE TABLE measurement_2020 PARTITION OF measurement
+FOR VALUES FROM ('2020-01-01') TO ('2021-01-01')''', '''
+CREATE TABLE measurement_2021 PARTITION OF measurement
+FOR VALUES FROM ('2021-01-01') TO ('2022-01-01')'''])
+        try:
+            self.assertTrue('measurement' in self.db.tables)
+            self.assertTrue('measurement_2020' not in self.db.tables)
+            table = self.db.tables['measurement']
+            self.assertEqual(set(table.partitions.keys()), 
+                             {'measurement_2020', 'measurement_2021'})
+            partition = table.partitions['measurement_2020']
+            self.assertEqual(partition.table, table)
+            self.assertEqual(partition.bound, "FOR VALUES FROM ('2020-01-01') "
+                                              "TO ('2021-01-01')")
+            self.assertFalse(partition.is_partitioned)
+            self.assertTrue(partition.columns is table.columns)
+        finally:
+            self._add_operation(['DROP TABLE measurement'])
+            
+    def test_watcher_partitions(self):
+        if self.db.version < (10, 0):
+            self.skipTest('partitioning requires PostgreSQL 10')
+        self._add_operation(['''
+CREATE TABLE measurement (logdate date NOT NULL, value integer)
+PARTITION BY RANGE (logdate)''', '''
+CREATE TABLE measurement_2020 PARTITION OF measurement
+FOR VALUES FROM ('2020-01-01') TO ('2021-01-01')'''])
+        try:
+            watcher = Watcher(self.db)
+            self._add_operation(['''
+CREATE TABLE measurement_2021 PARTITION OF measurement
+FOR VALUES FROM ('2021-01-01') TO ('2022-01-01')'''])
+            self.assertEqual(watcher.poll(), [])
+            self.assertTrue('measurement_2021' not in self.db.tables)
+            self.assertEqual(set(self.db.tables['measurement'].partitions),
+                             {'measurement_2020', 'measurement_2021'})
+            self._add_operation(
+                ['ALTER TABLE measurement ADD COLUMN note text'])
+            self.assertEqual([str(event) for event in watcher.poll()], 
+                             ['altered table measurement'])
+        finally:
+            self._add_operation(['DROP TABLE measurement'])
+
     # postgresql internal methods required for testing
             
     def index_name(self, table_name, *columns, count=1):
@@ -702,6 +1098,42 @@ EXECUTE PROCEDURE before_update_trigger_function()''', 'one_unique_column')
         self._run_using_cursor(function)
 
 
+@skipUnless(TEST_POSTGRES, 'Failed to import psycopg2 module.')
+class PostgresCatalogTestCase(PostgresTestCase):
+    
+    '''Runs whole PostgreSQL suite against pg_catalog based inspector and
+    checks that it returns the same results as information_schema one.'''
+    
+    def setUp(self):
+        PostgresTestCase.setUp(self)
+        args = 'dbname=%s user=%s' % (self.DBNAME, self.USER)
+        self.db = get_postgresql_database(args, catalog=True)
+        self.reference_db = get_postgresql_database(args)
+        
+    def test_catalog_parity(self):
+        self.assertEqual(set(self.db.tables.keys()), 
+                         set(self.reference_db.tables.keys()))
+        for name, table in self.db.tables.items():
+            reference = self.reference_db.tables[name]
+            self.assertEqual(set(table.columns.keys()), 
+                             set(reference.columns.keys()))
+            for column in table.columns.values():
+                expected = reference.columns[column.name]
+                self.assertEqual((column.type, column.not_null, column.default),
+                                 (expected.type, expected.not_null, 
+                                  expected.default))
+            self.assertEqual(
+                sorted((fk.referenced_table, fk.columns, fk.referenced_columns)
+                       for fk in table.foreign_keys),
+                sorted((fk.referenced_table, fk.columns, fk.referenced_columns)
+                       for fk in reference.foreign_keys))
+        self.assertEqual(
+            {name: (index.columns, index.is_unique)
+             for name, index in self.db.indices.items()},
+            {name: (index.columns, index.is_unique)
+             for name, index in self.reference_db.indices.items()})
+
+
 @skipUnless(TEST_MYSQL, 'Failed to import MySQLDb or PyMySQL module.')
 class MySqlTestCase(AbstractDatabaseTestCase, TestCase):
     
@@ -921,6 +1353,235 @@ class SqliteTestCase(AbstractDatabaseTestCase, TestCase):
 
     # sqlite specific tests
 
+    def test_record_and_replay(self):
+        api = RecordingApi(sqlite3)
+        recorded = Database(self.PATH, 
+                            inspector=SqliteInspector(self.PATH, api=api))
+        expected = diff(Database(), recorded)
+        with NamedTemporaryFile(suffix='.json') as file:
+            api.save(file.name)
+            replay = ReplayApi(file.name)
+        replayed = Database(self.PATH,
+                            inspector=SqliteInspector(self.PATH, api=replay))
+        self.assertEqual(str(diff(Database(), replayed)), str(expected))
+        self.assertEqual(replay.queries, [sql for sql, _, _, _ in api.queries])
+        self.assertRaises(FathomError, replayed.get_table, 'one_column')
+
+    def test_replay_with_timeout(self):
+        api = RecordingApi(sqlite3)
+        recorded = Database(self.PATH, timeout=30,
+                            inspector=SqliteInspector(self.PATH, api=api))
+        expected = diff(Database(), recorded)
+        with NamedTemporaryFile(suffix='.json') as file:
+            api.save(file.name)
+            replay = ReplayApi(file.name)
+        # timeouts are set with time left, that differs from the recording
+        replayed = Database(self.PATH, timeout=60,
+                            inspector=SqliteInspector(self.PATH, api=replay))
+        self.assertEqual(str(diff(Database(), replayed)), str(expected))
+        self.assertTrue(any(sql.startswith('PRAGMA busy_timeout') 
+                            for sql in replay.queries))
+        # timeouts of other systems are recorded the same way
+        statements = ['SET statement_timeout = %d; SET lock_timeout = %d',
+                      'SET SESSION max_execution_time = %d, '
+                      'SESSION lock_wait_timeout = %d']
+        with NamedTemporaryFile('w', suffix='.json') as file:
+            json.dump([[sql % (1000, 1), None, [], 0] for sql in statements],
+                      file)
+            file.flush()
+            replay = ReplayApi(file.name)
+        cursor = replay.connect().cursor()
+        for sql in statements:
+            cursor.execute(sql % (250, 2))
+        self.assertEqual(len(replay.queries), 2)
+
+    def test_file_inspector(self):
+        inspector = SqliteFileInspector(self.PATH)
+        db = Database(self.PATH, inspector=inspector)
+        self.assertEqual(fingerprint(db), fingerprint(self.db))
+        self.assertEqual(inspector.get_schema_version(), 
+                         self.db.inspector.get_schema_version())
+        self.assertEqual(inspector.get_change_markers(),
+                         self.db.inspector.get_change_markers())
+        self.assertRaises(FathomError, db.tables['one_column'].drop)
+        
+    def test_file_inspector_ddl(self):
+        ddl = '''
+CREATE TABLE a (id integer, x VarChar ( 20 )  NOT NULL, y default -5, 
+                z text default 'a''b' unique, w default (1 + 2), 
+                "q r" int references b, g int AS (id + 1), 
+                UNIQUE(x, y), primary key (x));
+CREATE TABLE b (id INTEGER PRIMARY KEY, k integer, u int unique,
+                foreign key (k, u) references A(X, y) ON DELETE CASCADE,
+                foreign key (u) references a);
+CREATE TABLE c (p integer primary key desc, s unique, unique(S)) ;
+CREATE TABLE [w] (`id` INTEGER PRIMARY KEY, u UNIQUE) WITHOUT ROWID;
+CREATE VIEW v AS SELECT a.x, y AS yy, 1+2, b.* FROM a JOIN b ON a.id = b.id;
+CREATE VIEW v2 (m, n) AS SELECT x, y FROM a;
+CREATE VIEW v3 AS WITH q(m) AS (SELECT x FROM a) SELECT m, * FROM q
+                  UNION SELECT 1, 2;
+CREATE VIEW v4 AS SELECT * FROM b NATURAL JOIN (SELECT 1 AS u, 'x' d);
+CREATE UNIQUE INDEX i ON a (x DESC, y COLLATE nocase, lower(z));
+CREATE TRIGGER t AFTER INSERT ON a BEGIN SELECT 1; END;'''
+        # many tables and long definitions span several pages
+        ddl += ''.join('CREATE TABLE m%d (%s);' % (number, ', '.join(
+            'c%d integer default %d' % (column, column) 
+            for column in range(number * 10 + 1))) for number in range(40))
+        def load(inspector):
+            db = Database(path, inspector=inspector)
+            db.load_columns()
+            db.load_foreign_keys()
+            db.load_index_columns()
+            db.load_triggers()
+            return (dict((name, table_data(table)) 
+                         for name, table in db.tables.items()),
+                    dict((name, [(column.name, column.type) 
+                                 for column in view.columns.values()])
+                         for name, view in db.views.items()),
+                    dict((name, (index_data(index), index.is_primary))
+                         for name, index in db.indices.items()),
+                    dict((name, trigger_data(trigger))
+                         for name, trigger in db.triggers.items()))
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'ddl.db3')
+            for encoding in ('UTF-8', 'UTF-16le', 'UTF-16be'):
+                if os.path.exists(path):
+                    os.remove(path)
+                connection = sqlite3.connect(path)
+                connection.execute('PRAGMA page_size = 512')
+                connection.execute("PRAGMA encoding = '%s'" % encoding)
+                connection.executescript(ddl)
+                connection.close()
+                self.assertEqual(load(SqliteFileInspector(path)), 
+                                 load(SqliteInspector(path)))
+            
+    def test_file_inspector_errors(self):
+        with NamedTemporaryFile(suffix='.db3') as file:
+            file.write(b'not a database' * 10)
+            file.flush()
+            db = Database(file.name, 
+                          inspector=SqliteFileInspector(file.name))
+            self.assertRaises(FathomError, lambda: db.tables)
+        with NamedTemporaryFile(suffix='.db3') as file:
+            db = Database(file.name, 
+                          inspector=SqliteFileInspector(file.name))
+            self.assertEqual(db.tables, {})
+
+    def test_file_inspector_corrupt_pages(self):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'corrupt.db3')
+            connection = sqlite3.connect(path)
+            connection.execute('PRAGMA page_size = 512')
+            connection.executescript(''.join(
+                'CREATE TABLE t%d (%s);' % (number, ', '.join(
+                    'c%d integer' % column for column in range(number + 1)))
+                for number in range(30)))
+            connection.close()
+            with open(path, 'rb') as file:
+                data = file.read()
+            # every byte of the first three pages is flipped in turn; the
+            # schema is either read or reported corrupt
+            for offset in range(3 * 512):
+                with open(path, 'wb') as file:
+                    file.write(data[:offset] + bytes([data[offset] ^ 0xff]) +
+                               data[offset + 1:])
+                db = Database(path, inspector=SqliteFileInspector(path))
+                try:
+                    db.tables
+                except FathomError:
+                    pass
+        
+    def test_select_closes_connections(self):
+        connections = []
+        class Api(object):
+            Error = sqlite3.Error
+            def connect(self, *args):
+                connection = Mock(wraps=sqlite3.connect(*args))
+                connections.append(connection)
+                return connection
+        inspector = SqliteInspector(self.PATH, api=Api())
+        inspector.fetch_size = 1
+        rows = inspector._select('SELECT name FROM sqlite_master', 
+                                 stream=True)
+        next(rows)
+        self.assertFalse(connections[-1].close.called)
+        del rows
+        self.assertTrue(connections[-1].close.called)
+        self.assertRaises(FathomError, inspector._select, 'SELECT nonsense')
+        self.assertTrue(connections[-1].close.called)
+
+    def test_timeout(self):
+        db = Database(self.PATH, inspector=SqliteInspector(self.PATH), 
+                      timeout=0.5)
+        tables = db.tables
+        sleep(0.5)
+        self.assertRaises(FathomTimeoutError, db.load_columns)
+        # objects loaded before the timeout are kept, others stay unloaded
+        self.assertIs(db.tables, tables)
+        self.assertTrue(all(table._columns is None 
+                            for table in tables.values()))
+        self.assertTrue(issubclass(FathomTimeoutError, FathomError))
+
+    def test_lock_timeout(self):
+        connection = sqlite3.connect(self.PATH)
+        connection.execute('BEGIN EXCLUSIVE')
+        try:
+            db = Database(self.PATH, inspector=SqliteInspector(self.PATH), 
+                          timeout=0.2)
+            start = time()
+            with self.assertRaises(FathomTimeoutError):
+                db.tables
+            self.assertLess(time() - start, 2)
+        finally:
+            connection.rollback()
+            connection.close()
+
+    def test_statement_timeout(self):
+        inspector = SqliteInspector(self.PATH).with_timeout(0.2)
+        sql = '''
+WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n)
+SELECT count(*) FROM n'''
+        start = time()
+        self.assertRaises(FathomTimeoutError, inspector._select, sql)
+        self.assertLess(time() - start, 2)
+
+    def test_watcher(self):
+        with NamedTemporaryFile(suffix='.db3') as file:
+            connection = sqlite3.connect(file.name)
+            connection.executescript('''
+CREATE TABLE a (id integer PRIMARY KEY, x text);
+CREATE TABLE b (id integer);
+CREATE INDEX a_x ON a (x);
+CREATE VIEW v AS SELECT x FROM a;''')
+            db = Database(file.name, inspector=SqliteInspector(file.name))
+            watcher = Watcher(db)
+            with RoundTrips(db.inspector, queries=1):
+                self.assertEqual(watcher.poll(), [])
+            old = db.tables['a']
+            connection.executescript('''
+ALTER TABLE a ADD COLUMN y integer;
+DROP TABLE b;
+CREATE TABLE c (z integer);
+CREATE INDEX a_y ON a (y);
+DROP INDEX a_x;
+CREATE TRIGGER c_trigger AFTER INSERT ON c BEGIN SELECT 1; END;
+DROP VIEW v;
+CREATE VIEW v AS SELECT y FROM a;''')
+            connection.close()
+            events = watcher.poll()
+            self.assertEqual([str(event) for event in events],
+                             ['altered table a', 'removed index a_x',
+                              'added index a_y', 'removed table b',
+                              'added table c', 'added trigger c_trigger',
+                              'altered view v'])
+            self.assertIs(events[0].old, old)
+            self.assertEqual(set(db.tables), {'a', 'c'})
+            self.assertEqual(set(db.tables['a'].columns), {'id', 'x', 'y'})
+            self.assertEqual(set(db.indices), {'a_y'})
+            self.assertEqual(set(db.triggers), {'c_trigger'})
+            self.assertEqual(set(db.views['v'].columns), {'y'})
+            self.assertEqual(watcher.poll(), [])
+
     def test_supports_procedures(self):
         self.assertFalse(self.db.supports_stored_procedures())
         
@@ -944,6 +1605,85 @@ class SqliteTestCase(AbstractDatabaseTestCase, TestCase):
         index = self.db.indices[self.case('one_column_index')]
         self.assertFalse(index.is_unique)
         
+    def test_advise_redundant_indices(self):
+        self._add_operation(['''
+CREATE TABLE advised (a integer, b integer, c integer, PRIMARY KEY (a, b))''',
+            'CREATE INDEX advised_b ON advised(b)',
+            'CREATE INDEX advised_b_copy ON advised(b)',
+            'CREATE INDEX advised_b_c ON advised(b, c)',
+            'CREATE UNIQUE INDEX advised_b_a ON advised(b, a)'])
+        try:
+            advices = [advice for advice in advise(self.db) 
+                       if advice.table == 'advised']
+            self.assertEqual(
+                [(advice.kind, advice.index.name, advice.covered_by.name)
+                 for advice in advices],
+                [(Advice.DUPLICATE, 'advised_b_copy', 'advised_b'),
+                 (Advice.SHADOWED, 'advised_b_a', 
+                  'sqlite_autoindex_advised_1'),
+                 (Advice.LEFT_PREFIX, 'advised_b', 'advised_b_c')])
+        finally:
+            self._drop_operation('TABLE', ['advised'])
+            
+    def test_diff(self):
+        old = get_sqlite3_database(self.PATH)
+        for load in (old.load_columns, old.load_foreign_keys, 
+                     old.load_index_columns, old.load_triggers):
+            load()
+        self._add_operation(['CREATE TABLE added_table (a integer)',
+                             'DROP TABLE case_sensitive_column',
+                             '''
+ALTER TABLE primary_key_only ADD COLUMN extra integer NOT NULL DEFAULT 3''',
+                             'CREATE INDEX added_index ON added_table(a)',
+                             'DROP TRIGGER after_delete_trigger'])
+        try:
+            result = diff(old, get_sqlite3_database(self.PATH))
+            self.assertEqual(set(result.tables.added), {'added_table'})
+            self.assertEqual(set(result.tables.removed), 
+                             {'case_sensitive_column'})
+            self.assertEqual(set(result.tables.changed), {'primary_key_only'})
+            change = result.tables.changed['primary_key_only']
+            self.assertEqual(set(change.columns.added), {'extra'})
+            self.assertEqual(set(result.indices.added), {'added_index'})
+            self.assertFalse(result.indices.removed or result.indices.changed)
+            self.assertEqual(set(result.triggers.removed), 
+                             {'after_delete_trigger'})
+            self.assertFalse(result.views)
+            self.assertFalse(diff(old, old))
+        finally:
+            self._drop_operation('TABLE', ['added_table'])
+            
+    def test_fingerprints(self):
+        old = Fingerprints.compute(self.db)
+        self.assertEqual(old.root, fingerprint(get_sqlite3_database(self.PATH)))
+        self._add_operation(['CREATE INDEX added_index ON one_column(col)',
+                             'ALTER TABLE some_table ADD COLUMN extra integer',
+                             'CREATE TABLE added_table (a integer)'])
+        try:
+            db = get_sqlite3_database(self.PATH)
+            new = Fingerprints.compute(db)
+            self.assertNotEqual(old.root, new.root)
+            self.assertEqual(old.differences(new),
+                             {'tables': {'one_column', 'some_table', 
+                                         'added_table'},
+                              'views': set(), 'procedures': set()})
+            # incremental update of changed tables gives the same tree
+            old.update(db, 'tables', ['one_column', 'some_table', 
+                                      'added_table'])
+            self.assertEqual(old.root, new.root)
+            self.assertEqual(old.buckets, new.buckets)
+        finally:
+            self._drop_operation('TABLE', ['added_table'])
+            
+    def test_stats(self):
+        table = self.db.tables['one_column']
+        self.assertEqual(table.stats.rows, 0)
+        self.assertEqual(table.stats.pages, 1)
+        self.assertTrue(table.stats.size > 0)
+        index = self.db.indices['one_column_index']
+        self.assertEqual(index.stats.pages, 1)
+        self.assertTrue(index.stats.size > 0)
+        
     # sqlite internal methods required for testing
 
     def index_name(self, table_name, *columns, count=1):
@@ -957,5 +1697,928 @@ class SqliteTestCase(AbstractDatabaseTestCase, TestCase):
         return sqlite3.connect(Class.PATH)
 
 
+class SqliteShardsTestCase(TestCase):
+    
+    SCHEMA = '''
+CREATE TABLE one (id integer primary key, name text not null unique);
+CREATE TABLE two (id integer, one_id integer references one(id),
+                  value real default 0, UNIQUE(id, one_id));
+CREATE INDEX two_value ON two (value, id);
+CREATE VIEW one_names AS SELECT name FROM one;
+CREATE TRIGGER two_delete AFTER DELETE ON two BEGIN SELECT 1; END;'''
+    
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.paths = []
+        for number in range(5):
+            path = os.path.join(self.directory.name, 'shard%d.db3' % number)
+            connection = sqlite3.connect(path)
+            connection.executescript(self.SCHEMA)
+            if number == 3:
+                connection.execute('CREATE TABLE three (x integer)')
+            connection.close()
+            self.paths.append(path)
+            
+    def tearDown(self):
+        self.directory.cleanup()
+        
+    def test_databases(self):
+        inspector = SqliteShardsInspector(*self.paths, batch_size=2)
+        with RoundTrips(inspector, connections=1):
+            databases = inspector.get_databases()
+        self.assertEqual(set(databases), set(self.paths))
+        for path, db in databases.items():
+            expected = Database(path, inspector=SqliteInspector(path))
+            self.assertEqual(fingerprint(db), fingerprint(expected))
+            self.assertEqual(set(db.tables['one'].indices), 
+                             set(expected.tables['one'].indices))
+            self.assertEqual(set(db.tables['two'].triggers), {'two_delete'})
+        self.assertIn('three', databases[self.paths[3]].tables)
+        
+    def test_shared_columns(self):
+        databases = SqliteShardsInspector(*self.paths).get_databases()
+        first, second = databases[self.paths[0]], databases[self.paths[1]]
+        self.assertIs(first.tables['two'].columns, 
+                      second.tables['two'].columns)
+        self.assertIsNot(first.tables['one'].columns, 
+                         first.tables['two'].columns)
+        
+    def test_name_filters(self):
+        inspector = SqliteShardsInspector(*self.paths).filtered(
+            include=['t*'])
+        db = inspector.get_databases()[self.paths[3]]
+        self.assertEqual(set(db.tables), {'two', 'three'})
+        self.assertEqual(set(db.indices), {'two_value', 
+                                           'sqlite_autoindex_two_1'})
+        self.assertEqual(db.views, {})
+        
+    def test_missing_shard(self):
+        paths = self.paths + [os.path.join(self.directory.name, 'none.db3')]
+        inspector = SqliteShardsInspector(*paths)
+        self.assertRaises(FathomError, inspector.get_databases)
+        self.assertFalse(os.path.exists(paths[-1]))
+
+
+class HistoryTestCase(TestCase):
+    
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.store = HistoryStore(os.path.join(self.directory.name, 
+                                               'history.db3'))
+        
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+        
+    def count_blobs(self):
+        return self.store._connection.execute(
+            'SELECT count(*) FROM blobs').fetchone()[0]
+        
+    def test_versions(self):
+        db = generate_database(tables=20, views=0.5, triggers=0.5)
+        expected = fingerprint(db)
+        first = self.store.record(db, recorded=100)
+        blobs = self.count_blobs()
+        # unchanged schema shares all blobs with the previous version
+        second = self.store.record(db, recorded=200)
+        self.assertEqual(self.count_blobs(), blobs)
+        db.tables['table_00003']._columns['added'] = Column('added', 'text')
+        del db._views[next(iter(db.views))]
+        third = self.store.record(db, recorded=300)
+        # changed table and manifest are the only new blobs
+        self.assertEqual(self.count_blobs(), blobs + 2)
+        self.assertEqual([row[0] for row in self.store.versions('simulated')],
+                         [first, second, third])
+        self.assertEqual(self.store.version_at(250, 'simulated'), second)
+        self.assertRaises(FathomError, self.store.version_at, 50, 'simulated')
+        restored = self.store.restore(self.store.version_at(150, 'simulated'))
+        self.assertIsNone(restored.inspector)
+        self.assertEqual(fingerprint(restored), expected)
+        self.assertEqual(fingerprint(self.store.restore(third)), 
+                         fingerprint(db))
+        
+    def test_changes(self):
+        db = generate_database(tables=20, views=0.5, triggers=0.5)
+        first = self.store.record(db)
+        self.assertFalse(self.store.changes(first, self.store.record(db)))
+        db.tables['table_00003']._columns['added'] = Column('added', 'text')
+        view = next(iter(db.views))
+        del db._views[view]
+        changes = self.store.changes(first, self.store.record(db))
+        self.assertEqual(set(changes.tables.changed), {'table_00003'})
+        self.assertEqual(set(changes.tables.changed['table_00003']
+                             .columns.added), {'added'})
+        self.assertEqual(set(changes.views.removed), {view})
+        self.assertFalse(changes.indices or changes.triggers)
+        self.assertRaises(FathomError, self.store.changes, first, 100)
+        
+    def test_live_database(self):
+        path = os.path.join(self.directory.name, 'live.db3')
+        connection = sqlite3.connect(path)
+        connection.executescript(SqliteShardsTestCase.SCHEMA)
+        first = self.store.record(get_sqlite3_database(path))
+        connection.execute('ALTER TABLE one ADD COLUMN note text')
+        connection.execute('DROP INDEX two_value')
+        connection.commit()
+        connection.close()
+        # a new store instance finds known blobs in the file
+        self.store.close()
+        self.store = HistoryStore(self.store.path)
+        second = self.store.record(get_sqlite3_database(path))
+        changes = self.store.changes(first, second)
+        self.assertEqual(set(changes.tables.changed), {'one'})
+        self.assertEqual(set(changes.indices.removed), {'two_value'})
+        restored = self.store.restore(first)
+        self.assertEqual(set(restored.tables['two'].indices), 
+                         {'two_value', 'sqlite_autoindex_two_1'})
+        self.assertEqual(set(restored.tables['two'].triggers), 
+                         {'two_delete'})
+
+
+class WarehouseTestCase(TestCase):
+    
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.warehouse = Warehouse(os.path.join(self.directory.name, 
+                                                'warehouse.db3'))
+        
+    def tearDown(self):
+        self.warehouse.close()
+        self.directory.cleanup()
+        
+    def test_simulated(self):
+        db = generate_database(tables=30, views=0.5, triggers=0.5, 
+                               procedures=4)
+        self.warehouse.add(db)
+        query = self.warehouse.query
+        self.assertEqual(query('SELECT count(*) FROM relations '
+                               "WHERE kind = 'table'"), [(30,)])
+        self.assertEqual(query('SELECT count(*) FROM columns c '
+                               'JOIN relations r ON r.id = c.relation_id '
+                               "WHERE r.kind = 'table'")[0][0],
+                         sum(len(table.columns) 
+                             for table in db.tables.values()))
+        self.assertEqual(query('SELECT count(*) FROM foreign_keys')[0][0],
+                         sum(len(table.foreign_keys) 
+                             for table in db.tables.values()))
+        self.assertEqual(query('SELECT count(*) FROM indices')[0][0], 
+                         len(db.indices))
+        self.assertEqual(set(row[0] for row 
+                             in query('SELECT name FROM triggers')),
+                         set(trigger.name for trigger 
+                             in db.triggers.values()))
+        self.assertEqual(query('SELECT count(*) FROM procedures')[0][0], 4)
+        
+    def test_fleet_query(self):
+        paths = []
+        for number in range(3):
+            path = os.path.join(self.directory.name, 'db%d.db3' % number)
+            connection = sqlite3.connect(path)
+            connection.executescript(SqliteShardsTestCase.SCHEMA)
+            if number != 1:
+                connection.execute('CREATE TABLE users '
+                                   '(id integer, email varchar(255))')
+            connection.close()
+            paths.append(path)
+        self.warehouse.add(*map(get_sqlite3_database, paths))
+        sql = """SELECT d.name, r.name FROM columns c
+                 JOIN relations r ON r.id = c.relation_id
+                 JOIN databases d ON d.id = r.database_id
+                 WHERE c.name = 'email' AND c.type = 'varchar(255)'
+                 ORDER BY d.name"""
+        self.assertEqual(self.warehouse.query(sql), 
+                         [(paths[0], 'users'), (paths[2], 'users')])
+        self.assertEqual(self.warehouse.query(
+            'SELECT i.name, c.name FROM index_columns c '
+            'JOIN indices i ON i.id = c.index_id '
+            "WHERE i.name = 'two_value' ORDER BY i.id, c.position")[:2], 
+            [('two_value', 'value'), ('two_value', 'id')])
+        self.assertEqual(self.warehouse.query(
+            'SELECT name, referenced_name FROM foreign_key_columns'), 
+            [('one_id', 'id')] * 3)
+        # adding a database again replaces its rows
+        connection = sqlite3.connect(paths[0])
+        connection.execute('DROP TABLE users')
+        connection.close()
+        self.warehouse.add(get_sqlite3_database(paths[0]))
+        self.assertEqual(self.warehouse.query(sql), [(paths[2], 'users')])
+        self.assertEqual(self.warehouse.query(
+            'SELECT count(*) FROM databases'), [(3,)])
+        self.assertEqual(self.warehouse.query(
+            "SELECT count(*) FROM relations WHERE name = 'one'"), [(3,)])
+
+    def test_names(self):
+        first = generate_database(tables=3)
+        second = generate_database(tables=5, seed=1)
+        self.assertRaises(FathomError, self.warehouse.add, first, second)
+        self.assertRaises(FathomError, self.warehouse.add, first, second,
+                          names=['one'])
+        self.assertEqual(self.warehouse.query(
+            'SELECT count(*) FROM databases'), [(0,)])
+        self.warehouse.add(first, second, names=['a/simulated',
+                                                 'b/simulated'])
+        self.assertEqual(self.warehouse.query(
+            'SELECT d.name, count(*) FROM databases d '
+            'JOIN relations r ON r.database_id = d.id '
+            'GROUP BY d.name ORDER BY d.name'),
+            [('a/simulated', 3), ('b/simulated', 5)])
+
+    def test_expression_index(self):
+        path = os.path.join(self.directory.name, 'expression.db3')
+        connection = sqlite3.connect(path)
+        connection.executescript('CREATE TABLE one (id integer, name text); '
+                                 'CREATE INDEX one_name ON one '
+                                 '(lower(name), id);')
+        connection.close()
+        self.warehouse.add(get_sqlite3_database(path))
+        self.assertEqual(self.warehouse.query(
+            'SELECT position, name FROM index_columns ORDER BY position'),
+            [(0, None), (1, 'id')])
+
+
+class SourceIndexTestCase(TestCase):
+    
+    def database(self):
+        db = generate_database(tables=10, views=0.5, procedures=2)
+        procedures = list(db.procedures.values())
+        procedures[0].sql = ("BEGIN DELETE FROM public.ledger_entries; "
+                             "-- keeps Audit_Log\n END")
+        procedures[1].sql = ("BEGIN EXECUTE 'UPDATE ledger_entries SET x = 1'"
+                             '; INSERT INTO "Ledger_Entries" VALUES (1); END')
+        return db
+        
+    def test_tokenize(self):
+        self.assertEqual(tokenize('SELECT "Full Name", `x` FROM public.t '
+                                  "WHERE a = 'it''s b.c' /* D e */"),
+                         ['select', 'full name', 'x', 'from', 'public', 't',
+                          'where', 'a', 'it', 's', 'b', 'c', 'd', 'e'])
+        
+    def test_search(self):
+        db = self.database()
+        index = SourceIndex(db)
+        self.assertEqual(len(index), len(db.procedures) + len(db.views))
+        first, second = sorted(db.procedures)
+        self.assertEqual(index.search('LEDGER_ENTRIES'), 
+                         [('procedure', first), ('procedure', second)])
+        self.assertEqual(index.search('public.ledger_entries'), 
+                         [('procedure', first)])
+        self.assertEqual(index.search('ledger_entries.public'), [])
+        self.assertEqual(index.search('update ledger_entries'), 
+                         [('procedure', second)])
+        self.assertEqual(index.search('audit_log'), [('procedure', first)])
+        self.assertEqual(index.search('missing'), [])
+        self.assertEqual(index.search(' . '), [])
+        view = next(iter(db.views.values()))
+        self.assertIn(('view', view.name), index.search(view.sql))
+        
+    def test_update(self):
+        db = self.database()
+        index = SourceIndex(db)
+        self.assertEqual(index.update(db), set())
+        first, second = sorted(db.procedures)
+        db.procedures[first].sql = 'BEGIN NULL; END'
+        view = sorted(db.views)[0]
+        del db._views[view]
+        self.assertEqual(index.update(db), {('procedure', first), 
+                                            ('view', view)})
+        self.assertEqual(index.search('ledger_entries'), 
+                         [('procedure', second)])
+        self.assertIsNone(index.source('view', view))
+        self.assertNotIn('audit_log', index._postings)
+        self.assertTrue(index.remove('procedure', second))
+        self.assertFalse(index.remove('procedure', second))
+        self.assertEqual(index.search('ledger_entries'), [])
+        
+    def test_sqlite_views(self):
+        with NamedTemporaryFile(suffix='.db3') as file:
+            connection = sqlite3.connect(file.name)
+            connection.executescript(SqliteShardsTestCase.SCHEMA)
+            connection.close()
+            db = get_sqlite3_database(file.name)
+            index = SourceIndex(db)
+            self.assertEqual(index.search('from one'), 
+                             [('view', 'one_names')])
+            self.assertEqual(db.detach().views['one_names'].sql, 
+                             db.views['one_names'].sql)
+
+
+class JoinGraphTestCase(TestCase):
+    
+    SCHEMA = '''
+CREATE TABLE countries (id integer primary key);
+CREATE TABLE customers (id integer primary key, 
+                        country_id integer references countries(id));
+CREATE TABLE warehouses (id integer primary key, 
+                         country_id integer references countries(id));
+CREATE TABLE orders (id integer primary key,
+                     customer_id integer references customers(id),
+                     warehouse_id integer references warehouses(id));
+CREATE TABLE notes (id integer primary key, 
+                    parent_id integer references notes(id));'''
+    
+    def setUp(self):
+        self.file = NamedTemporaryFile(suffix='.db3')
+        connection = sqlite3.connect(self.file.name)
+        connection.executescript(self.SCHEMA)
+        connection.close()
+        self.graph = JoinGraph(get_sqlite3_database(self.file.name))
+        
+    def tearDown(self):
+        self.file.close()
+        
+    def test_path(self):
+        path = self.graph.path('countries', 'orders')
+        self.assertEqual([(join.table, join.joined) for join in path],
+                         [('countries', 'customers'), ('customers', 'orders')])
+        self.assertEqual(str(path[0]), 'JOIN customers ON '
+                         'customers.country_id = countries.id')
+        self.assertEqual(path[1].condition(), 
+                         'orders.customer_id = customers.id')
+        self.assertIs(self.graph.path('countries', 'orders'), path)
+        self.assertEqual(self.graph.path('orders', 'orders'), [])
+        self.assertIsNone(self.graph.path('orders', 'notes'))
+        self.assertRaises(FathomError, self.graph.path, 'orders', 'none')
+        
+    def test_k_shortest_paths(self):
+        paths = self.graph.paths('orders', 'countries', k=5)
+        # paths of the same length come in no particular order
+        self.assertEqual(sorted([join.joined for join in path] 
+                                for path in paths),
+                         [['customers', 'countries'], 
+                          ['warehouses', 'countries']])
+        self.assertEqual(len(self.graph.paths('orders', 'customers', k=5)), 
+                         2)
+        
+    def test_distances(self):
+        graph = self.graph
+        self.assertEqual(graph.distance('orders', 'countries'), 2)
+        distances = graph.distances()
+        numbers = dict((name, number) 
+                       for number, name in enumerate(graph.names))
+        self.assertEqual(distances[numbers['orders']][numbers['countries']],
+                         2)
+        self.assertIsNone(distances[numbers['notes']][numbers['orders']])
+        self.assertEqual(distances[numbers['notes']][numbers['notes']], 0)
+        self.assertIsNone(graph.distance('notes', 'countries'))
+        
+    def test_generated(self):
+        graph = JoinGraph(generate_database(tables=200, foreign_keys=2))
+        distances = graph.distances()
+        for source in range(0, 200, 7):
+            for target in range(0, 200, 11):
+                path = graph.path(graph.names[source], graph.names[target])
+                self.assertEqual(len(path), distances[source][target])
+        paths = graph.paths(graph.names[3], graph.names[150], k=4)
+        self.assertEqual(len(paths), 4)
+        self.assertEqual([len(path) for path in paths], 
+                         sorted(len(path) for path in paths))
+        for path in paths:
+            tables = [path[0].table] + [join.joined for join in path]
+            self.assertEqual(len(tables), len(set(tables)))
+            self.assertEqual(tables[-1], graph.names[150])
+
+
+class SimulatorTestCase(TestCase):
+    
+    INSPECTORS = ((PostgresInspector, ('',), {}), 
+                  (PostgresCatalogInspector, ('',), {}),
+                  (MySqlInspector, (), {'db': 'simulated'}),
+                  (OracleInspector, (), {}))
+    
+    def setUp(self):
+        self.model = generate_database(tables=50, triggers=0.5, views=0.2)
+        
+    def databases(self, **kwargs):
+        for Inspector, args, inspector_kwargs in self.INSPECTORS:
+            api = SimulatedApi(Inspector, self.model)
+            inspector = Inspector(*args, api=api, **inspector_kwargs)
+            case = upper if Inspector is OracleInspector else lower
+            yield api, case, Database('simulated', inspector=inspector, 
+                                      **kwargs)
+                                      
+    def test_enumeration(self):
+        for api, case, db in self.databases():
+            self.assertEqual(set(db.tables), 
+                             {case(name) for name in self.model.tables})
+            self.assertEqual(set(db.views), 
+                             {case(name) for name in self.model.views})
+            self.assertEqual(len(db.indices), len(self.model.indices))
+            self.assertEqual(len(db.triggers), len(self.model.triggers))
+            
+    def test_bulk_loading(self):
+        for api, case, db in self.databases():
+            db.load_columns()
+            db.load_foreign_keys()
+            db.load_index_columns()
+            for name, table in self.model.tables.items():
+                loaded = db.tables[case(name)]
+                self.assertEqual(set(loaded.columns), 
+                                 {case(column) for column in table.columns})
+                self.assertEqual(
+                    [(fk.columns, fk.referenced_table) 
+                     for fk in loaded.foreign_keys],
+                    [([case(column) for column in fk.columns], 
+                      case(fk.referenced_table)) 
+                     for fk in table.foreign_keys])
+            for index in db.indices.values():
+                self.assertTrue(index.columns)
+
+    def test_advise_index_variants(self):
+        # indices differing in access method or predicate are not redundant
+        for name, method, predicate in (
+                ('plain', None, None), ('copy', 'btree', None),
+                ('partial', None, '(column_3 > 0)'), ('gin', 'gin', None),
+                ('wide', 'gin', None)):
+            index = Index('variant_' + name, 'table_00000')
+            index._columns = (('column_3', 'column_4') if name == 'wide' 
+                              else ('column_3',))
+            index.method, index.predicate = method, predicate
+            self.model.indices[index.name] = index
+        for Inspector in (PostgresInspector, PostgresCatalogInspector):
+            api = SimulatedApi(Inspector, self.model)
+            db = Database('simulated', inspector=Inspector('', api=api))
+            self.assertEqual(
+                [(advice.kind, advice.index.base_name, 
+                  advice.covered_by.base_name)
+                 for advice in advise(db) if advice.index is not None 
+                 and advice.table == 'table_00000'],
+                [(Advice.DUPLICATE, 'variant_plain', 'variant_copy'),
+                 (Advice.LEFT_PREFIX, 'variant_gin', 'variant_wide')])
+            self.assertEqual(
+                db.indices['table_00000: variant_partial'].predicate,
+                '(column_3 > 0)')
+
+    def test_bulk_arguments(self):
+        self.model = generate_database(tables=5, procedures=6)
+        arguments = lambda db: dict(
+            (name, [(argument.name, argument.type) 
+                    for argument in procedure.arguments.values()])
+            for name, procedure in db.procedures.items())
+        for api, case, db in self.databases():
+            db.procedures
+            with RoundTrips(db.inspector, queries=1):
+                db.load_arguments()
+            # arguments loaded procedure by procedure are the same
+            expected = arguments(Database('simulated', 
+                                          inspector=db.inspector))
+            self.assertEqual(len(expected), 6)
+            self.assertEqual(arguments(db), expected)
+            
+    def test_diff_bulk_arguments(self):
+        self.model = generate_database(tables=5, procedures=6)
+        for api, case, db in self.databases():
+            new = Database('simulated', inspector=db.inspector)
+            diff(db, new)
+            for database in (db, new):
+                for procedure in database.procedures.values():
+                    procedure._arguments = None
+            # arguments are loaded with one query for each database
+            with RoundTrips(db.inspector, queries=2):
+                self.assertFalse(diff(db, new))
+            
+    def test_get_table_before_tables(self):
+        for api, case, db in self.databases():
+            db = Database('simulated', inspector=db.inspector, 
+                          exclude=[case('table_00002')])
+            table = db.get_table(case('table_00010'), full=False)
+            self.assertIs(db.get_table(case('table_00010')), table)
+            self.assertRaises(FathomError, db.get_table, case('table_00002'))
+            # enumerated tables keep the table got before
+            self.assertIs(db.tables[case('table_00010')], table)
+            self.assertIs(table.database, db)
+            
+    def test_get_partitioned_table(self):
+        table = PartitionedTable('measurement', database=self.model)
+        table._columns = {'id': Column('id', 'integer', not_null=True)}
+        table._foreign_keys, table._indices, table._triggers = [], {}, {}
+        table._partitions = {'measurement_1': Partition(
+            'measurement_1', table, bound='FOR VALUES IN (1)')}
+        self.model._tables['measurement'] = table
+        api = SimulatedApi(PostgresInspector, self.model)
+        db = Database('simulated', inspector=PostgresInspector('', api=api))
+        table = db.get_table('measurement')
+        self.assertIsInstance(table, PartitionedTable)
+        self.assertEqual(set(table.partitions), {'measurement_1'})
+        self.assertNotIsInstance(db.get_table('table_00010'), 
+                                 PartitionedTable)
+            
+    def test_fingerprints_update(self):
+        for api, case, db in self.databases():
+            fingerprints = Fingerprints.compute(db)
+            indices = fingerprints._context[0]
+            name = case('table_00010')
+            kept = dict((table, group) for table, group in indices.items()
+                        if table != name)
+            key = next(key for key, index in db.indices.items()
+                       if db.case(index.table) == name)
+            del db.indices[key]
+            fingerprints.update(db, 'tables', [name])
+            self.assertEqual(fingerprints.root, 
+                             Fingerprints.compute(db).root)
+            self.assertEqual(len(indices[name]), 1)
+            # indices of other tables are not grouped again
+            self.assertTrue(all(indices[table] is group 
+                                for table, group in kept.items()))
+            
+    def test_table_bundle(self):
+        for api, case, db in self.databases():
+            # the version is queried when the database is created
+            del api.queries[:]
+            table = db.get_table(case('table_00010'))
+            self.assertEqual(len(api.queries), 1)
+            self.assertEqual(len(table.columns), 
+                             len(self.model.tables['table_00010'].columns))
+            self.assertEqual(len(table.indices), 2)
+            self.assertEqual(len(table.foreign_keys), 1)
+            
+    def test_name_filters(self):
+        for api, case, db in self.databases(include=['table_0001?'], 
+                                            exclude=['table_00012']):
+            if case is upper:
+                continue
+            self.assertEqual(len(db.tables), 9)
+            self.assertEqual(len(db.indices), 18)
+            
+    def test_round_trip_budgets(self):
+        model = generate_database(tables=1000, procedures=50)
+        for Inspector, args, kwargs in self.INSPECTORS:
+            api = SimulatedApi(Inspector, model)
+            db = Database('simulated', 
+                          inspector=Inspector(*args, api=api, **kwargs))
+            with self.subTest(Inspector.__name__):
+                with RoundTrips(db.inspector, queries=3, connections=3):
+                    db.load_columns()
+                with RoundTrips(db.inspector, queries=1, connections=1):
+                    db.load_foreign_keys()
+                with RoundTrips(db.inspector, queries=1, connections=1):
+                    db.indices
+                with RoundTrips(db.inspector, queries=2, connections=2):
+                    procedures = db.procedures
+                self.assertEqual(len(procedures), 50)
+                for procedure in procedures.values():
+                    with RoundTrips(db.inspector, queries=1):
+                        procedure.arguments
+                db = Database('simulated', 
+                              inspector=Inspector(*args, api=api, **kwargs))
+                for table in db.tables.values():
+                    with RoundTrips(db.inspector, queries=1):
+                        table.foreign_keys
+                        
+    def test_round_trips_exceeded(self):
+        api = SimulatedApi(PostgresInspector, self.model)
+        db = Database('simulated', inspector=PostgresInspector('', api=api))
+        with self.assertRaises(AssertionError):
+            with RoundTrips(db.inspector, queries=1):
+                db.tables
+                db.views
+        self.assertIs(db.inspector._api, api)
+
+    def test_watcher(self):
+        for api, case, db in self.databases():
+            watcher = Watcher(db)
+            self.assertEqual(watcher.poll(), [])
+            table = self.model.tables['table_00003']
+            table._columns['extra'] = Column('extra', 'integer')
+            try:
+                events = watcher.poll()
+            finally:
+                del table._columns['extra']
+            self.assertEqual([str(event) for event in events], 
+                             ['altered table %s' % case('table_00003')])
+            columns = db.tables[case('table_00003')].columns
+            self.assertIn(case('extra'), columns)
+            
+    def test_watcher_partitions(self):
+        table = PartitionedTable('measurement', database=self.model)
+        table._columns = {'id': Column('id', 'integer', not_null=True)}
+        table._foreign_keys, table._indices, table._triggers = [], {}, {}
+        table._partitions = {'measurement_1': Partition(
+            'measurement_1', table, bound='FOR VALUES IN (1)')}
+        self.model._tables['measurement'] = table
+        for Inspector in (PostgresInspector, PostgresCatalogInspector):
+            api = SimulatedApi(Inspector, self.model)
+            db = Database('simulated', inspector=Inspector('', api=api))
+            watcher = Watcher(db)
+            old = db.tables['measurement']
+            self.assertIsInstance(old, PartitionedTable)
+            table._partitions['measurement_2'] = Partition(
+                'measurement_2', table, bound='FOR VALUES IN (2)')
+            try:
+                events = watcher.poll()
+                new = db.tables['measurement']
+                partitions = set(new.partitions)
+                table._columns['extra'] = Column('extra', 'integer')
+                altered = watcher.poll()
+            finally:
+                del table._partitions['measurement_2']
+                table._columns.pop('extra', None)
+            # attached partition reloads its parent, but is no table itself
+            self.assertEqual(events, [])
+            self.assertIsNot(new, old)
+            self.assertIsInstance(new, PartitionedTable)
+            self.assertEqual(partitions, {'measurement_1', 'measurement_2'})
+            self.assertEqual([str(event) for event in altered], 
+                             ['altered table measurement'])
+            self.assertFalse(set(db.tables) & {'measurement_1', 
+                                                'measurement_2'})
+            
+    def test_diff_procedure_arguments(self):
+        old = generate_database(tables=5, procedures=2)
+        new = pickle.loads(pickle.dumps(old))
+        procedure = new.procedures['procedure_00001']
+        procedure._arguments['argument_x'] = Argument('argument_x', 'bigint')
+        result = diff(old, new)
+        self.assertEqual(set(result.procedures.changed), {'procedure_00001'})
+        change = result.procedures.changed['procedure_00001']
+        self.assertEqual(set(change.attributes), {'arguments'})
+        self.assertFalse(diff(old, pickle.loads(pickle.dumps(old))))
+            
+    def test_latency(self):
+        api = SimulatedApi(PostgresInspector, self.model, latency=0.01)
+        start = time()
+        db = Database('simulated', inspector=PostgresInspector('', api=api))
+        db.tables
+        self.assertGreaterEqual(time() - start, 0.02)
+        self.assertEqual(len(api.queries), 2)
+
+
+Notify = namedtuple('Notify', 'pid channel payload')
+
+
+class NotifyingConnection(object):
+    
+    '''Stand-in of a psycopg2 connection receiving notifications.'''
+    
+    def __init__(self, relations=()):
+        self.notifies = []
+        self.statements = []
+        self.relations = list(relations)
+        self.closed = False
+        self._read, self._write = os.pipe()
+        
+    def notify(self, channel='fathom_ddl', **payload):
+        self.notifies.append(Notify(0, channel, json.dumps(payload)))
+        
+    def fileno(self):
+        return self._read
+        
+    def poll(self):
+        pass
+        
+    def cursor(self):
+        cursor = Mock()
+        cursor.execute = lambda sql, *args: self.statements.append(sql)
+        cursor.fetchall = lambda: list(self.relations)
+        return cursor
+        
+    def close(self):
+        os.close(self._read)
+        os.close(self._write)
+        self.closed = True
+
+
+class ListenerTestCase(TestCase):
+    
+    def setUp(self):
+        self.model = generate_database(tables=10, triggers=0.5, views=0.2)
+        table = PartitionedTable('measurement', database=self.model)
+        table._columns = {'id': Column('id', 'integer', not_null=True)}
+        table._foreign_keys, table._indices, table._triggers = [], {}, {}
+        table._partitions = {'measurement_1': Partition(
+            'measurement_1', table, bound='FOR VALUES IN (1)')}
+        self.model._tables['measurement'] = table
+        self.api = SimulatedApi(PostgresInspector, self.model)
+        self.db = Database('simulated', 
+                           inspector=PostgresInspector('', api=self.api))
+        self.oids = dict((name, 16384 + number) for number, name in 
+                         enumerate(sorted(self.model.tables) + 
+                                   sorted(self.model.views)))
+        self.connection = NotifyingConnection(
+            (oid, name) for name, oid in self.oids.items())
+        self.listener = Listener(self.db, connection=self.connection)
+        
+    def tearDown(self):
+        self.listener.close()
+        
+    def test_listen_statement(self):
+        self.assertEqual(self.connection.statements[0], 'LISTEN fathom_ddl')
+        
+    def test_renamed_table(self):
+        simulator = self.api._simulator
+        simulator.tables['renamed'] = simulator.tables.pop('table_00003')
+        simulator._sorted_tables = sorted(simulator.tables.items())
+        for objects in (simulator.indices, simulator.triggers):
+            if 'table_00003' in objects:
+                objects['renamed'] = objects.pop('table_00003')
+        # only the new name is notified
+        self.connection.notify(kind='table', oid=self.oids['table_00003'],
+                               schema='public', name='renamed', 
+                               table='renamed', dropped=False)
+        events = [str(event) for event in self.listener.poll()]
+        self.assertIn('removed table table_00003', events)
+        self.assertIn('added table renamed', events)
+        self.assertNotIn('table_00003', self.db.tables)
+        self.assertIn('renamed', self.db.tables)
+        
+    def test_renamed_view(self):
+        name = sorted(self.model.views)[0]
+        simulator = self.api._simulator
+        simulator.views['renamed'] = simulator.views.pop(name)
+        self.connection.notify(kind='view', oid=self.oids[name],
+                               schema='public', name='renamed', 
+                               table='renamed', dropped=False)
+        self.listener.poll()
+        self.assertNotIn(name, self.db.views)
+        self.assertIn('renamed', self.db.views)
+        
+    def test_no_notifications(self):
+        del self.api.queries[:]
+        self.assertEqual(self.listener.poll(), [])
+        self.assertEqual(self.api.queries, [])
+        
+    def test_altered_table(self):
+        table = self.model.tables['table_00003']
+        table._columns['extra'] = Column('extra', 'integer')
+        self.connection.notify(kind='table column', schema='public', 
+                               name='extra', table='table_00003', 
+                               dropped=False)
+        del self.api.queries[:]
+        events = self.listener.poll()
+        self.assertEqual([str(event) for event in events], 
+                         ['altered table table_00003'])
+        self.assertIn('extra', self.db.tables['table_00003'].columns)
+        # only the notified table is reloaded
+        self.assertTrue(all('table_00003' in sql 
+                            for sql in self.api.queries))
+                            
+    def test_dropped_index(self):
+        simulator = self.api._simulator
+        simulator.indices['table_00004'] = [
+            index for index in simulator.indices['table_00004']
+            if index.name != 'table_00004_index_0']
+        self.connection.notify(kind='index', schema='public', 
+                               name='table_00004_index_0', table=None, 
+                               dropped=True)
+        events = self.listener.poll()
+        self.assertEqual([str(event) for event in events], 
+                         ['removed index table_00004: table_00004_index_0'])
+        self.assertNotIn('table_00004: table_00004_index_0', self.db.indices)
+        
+    def test_created_partition(self):
+        table = self.model.tables['measurement']
+        table._partitions['measurement_2'] = Partition(
+            'measurement_2', table, bound='FOR VALUES IN (2)')
+        # event trigger reports objects of partitions with their root table
+        self.connection.notify(kind='table', schema='public', 
+                               name='measurement_2', table='measurement',
+                               dropped=False)
+        self.assertEqual(self.listener.poll(), [])
+        self.assertNotIn('measurement_2', self.db.tables)
+        table = self.db.tables['measurement']
+        self.assertIsInstance(table, PartitionedTable)
+        self.assertEqual(set(table.partitions), 
+                         {'measurement_1', 'measurement_2'})
+        
+    def test_dropped_partition(self):
+        self.assertEqual(set(self.db.tables['measurement'].partitions),
+                         {'measurement_1'})
+        del self.model.tables['measurement']._partitions['measurement_1']
+        # dropped partition is not in the catalog to find its parent
+        self.connection.notify(kind='table', schema='public', 
+                               name='measurement_1', table='measurement_1',
+                               dropped=True)
+        self.assertEqual(self.listener.poll(), [])
+        self.assertIn('measurement', self.db.tables)
+        self.assertNotIn('measurement_1', self.db.tables)
+        self.assertEqual(self.db.tables['measurement'].partitions, {})
+        
+    def test_dropped_table_with_trigger(self):
+        name = next(trigger.table for trigger in self.model.triggers.values())
+        self.api._simulator.tables.pop(name)
+        self.api._simulator._sorted_tables = sorted(
+            self.api._simulator.tables.items())
+        self.connection.notify(kind='table', schema='public', name=name, 
+                               table=name, dropped=True)
+        self.connection.notify(kind='trigger', schema='public', 
+                               name='trigger', table=name, dropped=True)
+        events = self.listener.poll()
+        self.assertIn('removed table %s' % name, 
+                      [str(event) for event in events])
+        self.assertNotIn(name, self.db.tables)
+        
+    def test_ignored_notifications(self):
+        self.connection.notify(kind='table', schema='other', 
+                               name='table_00003', table='table_00003', 
+                               dropped=True)
+        self.connection.notify(channel='other', kind='table', 
+                               schema='public', name='table_00003', 
+                               table='table_00003', dropped=True)
+        self.assertEqual(self.listener.poll(), [])
+        self.assertIn('table_00003', self.db.tables)
+        
+    def test_dropped_table(self):
+        del self.api._simulator.tables['table_00005']
+        self.connection.notify(kind='table', schema='public', 
+                               name='table_00005', table='table_00005', 
+                               dropped=True)
+        events = self.listener.poll()
+        self.assertIn('removed table table_00005', 
+                      [str(event) for event in events])
+        self.assertNotIn('table_00005', self.db.tables)
+        self.assertFalse(any(index.table == 'table_00005' 
+                             for index in self.db.indices.values()))
+                             
+    def test_install_notifier(self):
+        api = Mock()
+        db = Database('mock', inspector=PostgresInspector('', api=api))
+        install_notifier(db, channel='changes')
+        connection = api.connect.return_value
+        sql = connection.cursor.return_value.execute.call_args[0][0]
+        self.assertIn("pg_notify('changes'", sql)
+        self.assertIn('ON ddl_command_end', sql)
+        self.assertIn('ON sql_drop', sql)
+        self.assertTrue(connection.commit.called)
+        self.assertTrue(connection.close.called)
+
+
+class GovernorTestCase(TestCase):
+    
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'target')
+        
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def test_concurrency(self):
+        active, peak = [0], [0]
+        lock = Lock()
+        model = generate_database(tables=10)
+        class Api(SimulatedApi):
+            def _execute(self, sql):
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                try:
+                    return SimulatedApi._execute(self, sql)
+                finally:
+                    with lock:
+                        active[0] -= 1
+        api = Api(PostgresInspector, model, latency=0.02)
+        db = Database('simulated', inspector=PostgresInspector('', api=api),
+                      governor=Governor(concurrency=2))
+        tables = list(db.tables.values())
+        threads = [Thread(target=lambda table=table: table.foreign_keys)
+                   for table in tables]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(peak[0], 2)
+        self.assertTrue(all(table._foreign_keys is not None 
+                            for table in tables))
+        
+    def test_rate(self):
+        governor = Governor(rate=20)
+        start = time()
+        for i in range(6):
+            governor.release(governor.acquire())
+        self.assertGreaterEqual(time() - start, 0.2)
+        
+    def test_rate_deadline(self):
+        governor = Governor(rate=1)
+        governor.release(governor.acquire())
+        self.assertRaises(FathomTimeoutError, governor.acquire, time() + 0.1)
+        
+    def test_lock_files(self):
+        # governors of different processes share only lock files
+        first = Governor(concurrency=1, path=self.path)
+        second = Governor(concurrency=1, path=self.path)
+        slot = first.acquire()
+        self.assertRaises(FathomTimeoutError, second.acquire, time() + 0.05)
+        first.release(slot)
+        second.release(second.acquire(time() + 0.05))
+        
+    def test_rate_file(self):
+        first = Governor(rate=20, path=self.path)
+        second = Governor(rate=20, path=self.path)
+        start = time()
+        for i in range(3):
+            first.release(first.acquire())
+            second.release(second.acquire())
+        self.assertGreaterEqual(time() - start, 0.2)
+
+    def test_timeout(self):
+        api = SimulatedApi(PostgresInspector, generate_database(tables=10))
+        governor = Governor(concurrency=1)
+        db = Database('simulated', inspector=PostgresInspector('', api=api),
+                      governor=governor, timeout=0.1)
+        slot = governor.acquire()
+        try:
+            self.assertRaises(FathomTimeoutError, lambda: db.tables)
+        finally:
+            governor.release(slot)
+
+
 if __name__ == "__main__":
     main()